@@ -1,178 +1,521 @@
+"""
+AI Agent
+Solves arithmetic problems ("123+456", "1000-1", "12*34", "144/12", "100%7",
+"(12+3)*4") and writes down every step of the work.
+
+The solving itself is done by the plain functions at the top of this file:
+solve(problem) gives back a SolveResult with the answer and a trace of its
+own, and keeps nothing between calls. So any number of threads can share
+them (free-threaded Python builds too) without locks. AIAgent wraps them
+with a scratchpad to show, metrics and a result cache.
+"""
+
+import operator
+import re
+import time
+from functools import partial
+
+import division
+from digit_engine import (
+    add_digits, subtract_digits, iter_add_digits, iter_subtract_digits, to_digits, from_digits,
+)
+from digit_batch import add_many, subtract_many
+from expression import compile_expression, is_expression, iter_evaluate
+from multiplication import STRATEGIES, multiply, iter_multiply
+from renderers import get_renderer
+from scratchpad import (
+    BoundedTrace, LEVELS, SolveResult, Step, Trace, Verbosity, INPUT, ERROR, FINAL_RESULT, MUL_FINAL_RESULT,
+    SET_CARRY, MUL_FINAL_CARRY, NEED_BORROW, run_steps,
+)
+from virtual_trace import VirtualAddition, VirtualMultiplication, VirtualSubtraction
+
+# What each operation comes to when no digit steps are wanted
+_NATIVE = {'+': operator.add, '-': operator.sub, '*': operator.mul,
+           '/': division.quotient, '%': division.remainder}
+
+# A plain "<number> <op> <number>" problem, the common case in batches
+_SIMPLE_PROBLEM = re.compile(r"\s*(\d+)\s*([-+*/%])\s*(\d+)\s*", re.ASCII)
+
+# Spaces around operators and brackets, which don't change a problem
+_SPACES_AROUND = re.compile(r"\s*([-+*/%()])\s*")
+
+
+def parse_problem(problem):
+    """Parse "<number> <op> <number>" into (num1, num2, operation)"""
+    if not problem or not isinstance(problem, str):
+        raise ValueError("Input must be a non-empty string")
+
+    # Find the operation
+    operation = None
+    for op in _NATIVE:
+        if op in problem:
+            if operation:  # Multiple operations found
+                raise ValueError("Only one operation allowed per problem")
+            operation = op
+
+    if not operation:
+        raise ValueError("No supported operation found")
+
+    # Split and convert numbers
+    try:
+        num1, num2 = map(str.strip, problem.split(operation))
+        return from_digits(num1), from_digits(num2), operation
+    except ValueError:
+        raise ValueError("Invalid number format")
+
+
+def solve_operation(operation, num1, num2, record=None, verbosity=Verbosity.DIGITS,
+                    multiplication_strategy="auto"):
+    """
+    Work out one addition, subtraction, multiplication, division or
+    remainder, handing each digit step to record(kind, *args); returns the
+    answer (the final step is left to the caller)
+    """
+    if operation == '-' and num2 > num1:
+        raise ValueError("First number must be greater than or equal to second number")
+    if verbosity < Verbosity.DIGITS:
+        return _NATIVE[operation](num1, num2)
+    if operation == '*':
+        return multiply(num1, num2, multiplication_strategy, record)
+    if operation in '/%':
+        quotient, remainder = division.divide(num1, num2, "auto", record)
+        return quotient if operation == '/' else remainder
+    digits = add_digits if operation == '+' else subtract_digits
+    return from_digits(digits(to_digits(num1), to_digits(num2), record))
+
+
+def iter_operation(operation, num1, num2, verbosity=Verbosity.DIGITS, multiplication_strategy="auto"):
+    """
+    The (kind, args) steps of one operation; returns the answer.
+    For + and - the numbers may also be given as digit strings.
+    """
+    if verbosity < Verbosity.DIGITS:
+        if operation == '-' and num2 > num1:
+            raise ValueError("First number must be greater than or equal to second number")
+        return _NATIVE[operation](num1, num2)
+    if operation == '*':
+        return (yield from iter_multiply(num1, num2, multiplication_strategy))
+    if operation in '/%':
+        quotient, remainder = yield from division.iter_divide(num1, num2)
+        return quotient if operation == '/' else remainder
+    steps = iter_add_digits if operation == '+' else iter_subtract_digits
+    return from_digits((yield from steps(to_digits(num1), to_digits(num2))))
+
+
+def iter_expression(plan, numbers, verbosity=Verbosity.DIGITS, multiplication_strategy="auto"):
+    """The (kind, args) steps of a compiled expression; returns the answer"""
+    operate = partial(iter_operation, verbosity=verbosity, multiplication_strategy=multiplication_strategy)
+    return iter_evaluate(plan, [from_digits(n) for n in numbers], operate)
+
+
+def _parse(problem):
+    """(operation, num1, num2) for one operation, or (None, plan, numbers) for an expression"""
+    if is_expression(problem):
+        return (None, *compile_expression(problem))
+    num1, num2, operation = parse_problem(problem)
+    return operation, num1, num2
+
+
+def _work_out(parsed, trace, multiplication_strategy):
+    """Solve a parsed problem onto trace, final step included; returns the answer"""
+    operation, a, b = parsed
+    if operation is None:
+        steps = iter_expression(a, b, trace.verbosity, multiplication_strategy)
+        result = run_steps(steps, trace.record)
+    else:
+        result = solve_operation(operation, a, b, trace.record, trace.verbosity, multiplication_strategy)
+    trace.record(MUL_FINAL_RESULT if operation == '*' else FINAL_RESULT, result)
+    return result
+
+
+def _error_message(error):
+    if isinstance(error, ValueError):
+        return str(error)
+    return f"Unexpected error occurred - {str(error)}"
+
+
+def solve_into(problem, trace, multiplication_strategy="auto"):
+    """
+    Solve a problem, writing its steps on trace (after the input step,
+    which is the caller's); returns (result, error message)
+    """
+    try:
+        return _work_out(_parse(problem), trace, multiplication_strategy), None
+    except Exception as e:
+        error = _error_message(e)
+    trace.record(ERROR, error)
+    return None, error
+
+
+def solve(problem, verbosity=Verbosity.DIGITS, multiplication_strategy="auto"):
+    """Solve one problem: a SolveResult with the answer (or error) and a new Trace of the work"""
+    trace = Trace(verbosity)
+    trace.record(INPUT, problem)
+    result, error = solve_into(problem, trace, multiplication_strategy)
+    return SolveResult(problem, result, error, trace)
+
+
+def iter_solve(problem, verbosity=Verbosity.DIGITS, multiplication_strategy="auto"):
+    """
+    Solve a problem and yield each Step the moment it is worked out, then
+    a SolveResult with the answer. Nothing is kept, so the steps can be
+    printed, forwarded or dropped as they come, and stopping early skips
+    the rest of the work. The verbosity level picks which steps are yielded.
+    """
+    if LEVELS[INPUT] <= verbosity:
+        yield Step(INPUT, (problem,))
+    result = error = None
+    try:
+        simple = isinstance(problem, str) and _SIMPLE_PROBLEM.fullmatch(problem)
+        if is_expression(problem):
+            operation = None
+        elif simple and simple.group(2) in '+-' and verbosity >= Verbosity.DIGITS:
+            # The digit engine works on digit strings: skip turning
+            # (possibly huge) numbers into ints and back before step one
+            num1, operation, num2 = simple.groups()
+            num1, num2 = num1.lstrip('0') or '0', num2.lstrip('0') or '0'
+        else:
+            num1, num2, operation = parse_problem(problem)
+        if operation is None:
+            steps = iter_expression(*compile_expression(problem), verbosity, multiplication_strategy)
+        else:
+            steps = iter_operation(operation, num1, num2, verbosity, multiplication_strategy)
+        while True:
+            try:
+                kind, args = next(steps)
+            except StopIteration as done:
+                result = done.value
+                break
+            if LEVELS[kind] <= verbosity:
+                yield Step(kind, args)
+        final = MUL_FINAL_RESULT if operation == '*' else FINAL_RESULT
+        if LEVELS[final] <= verbosity:
+            yield Step(final, (result,))
+    except Exception as e:
+        error = _error_message(e)
+    if error is not None and LEVELS[ERROR] <= verbosity:
+        yield Step(ERROR, (error,))
+    yield SolveResult(problem, result, error)
+
+
+def _solve_simple(problem, match):
+    """
+    The answer to a plain "<number> <op> <number>" problem without any steps,
+    or None when it needs the regular path (and its error message)
+    """
+    num1, operation, num2 = match.groups()
+    try:
+        num1, num2 = int(num1), int(num2)
+    except ValueError:  # Past Python's int() length limit
+        num1, num2 = from_digits(num1), from_digits(num2)
+    if (operation == '-' and num2 > num1) or (operation in '/%' and num2 == 0):
+        return None
+    return SolveResult(problem, _NATIVE[operation](num1, num2))
+
+
+def solve_many(problems, trace=False, verbosity=Verbosity.DIGITS, multiplication_strategy="auto",
+               solve_on=None):
+    """
+    Solve many problems and return a SolveResult for each, in order. Errors
+    are reported per problem instead of raised. With trace, every result
+    gets its own Trace (compact to keep or send to another process, and
+    turned into text only when read); without, plain problems skip the
+    steps entirely. solve_on(problem, trace) can take the place of
+    solve_into (AIAgent passes one that uses its cache and metrics).
+    """
+    if solve_on is None:
+        solve_on = partial(solve_into, multiplication_strategy=multiplication_strategy)
+    results = []
+    append = results.append
+    steps = Trace(Verbosity.OFF)  # Without trace, reused for every problem of this call
+    match = _SIMPLE_PROBLEM.fullmatch
+    for problem in problems:
+        simple = not trace and isinstance(problem, str) and match(problem)
+        if simple:
+            result = _solve_simple(problem, simple)
+            if result is not None:
+                append(result)
+                continue
+
+        # Everything else takes the regular path (and its error messages)
+        if trace:
+            steps = Trace(verbosity)
+        else:
+            steps.clear()
+        steps.record(INPUT, problem)
+        result, error = solve_on(problem, steps)
+        append(SolveResult(problem, result, error, steps if trace else None))
+    return results
+
+
 class AIAgent:
-    def __init__(self):
-        self.scratchpad = []
+    """
+    The solver with a scratchpad: receive_input, solve_problem and
+    show_scratchpad work on the agent's current problem. solve, solve_iter
+    (given a problem) and solve_batch keep everything they need to
+    themselves, so one agent can serve many threads at once.
+    """
+    def __init__(self, verbosity=Verbosity.DIGITS, multiplication_strategy="auto", metrics=None,
+                 result_cache=None, memory_budget=None):
+        if multiplication_strategy not in ("auto", "native", *STRATEGIES):
+            raise ValueError(f"Unknown multiplication strategy '{multiplication_strategy}'")
+        self.verbosity = Verbosity(verbosity)
+        self.multiplication_strategy = multiplication_strategy
+        self.metrics = metrics  # Optional instrumentation.Metrics
+        self.result_cache = result_cache  # Optional result_cache.ResultCache, shared on disk
+        self.memory_budget = memory_budget  # Bytes of steps kept in memory (None: no limit)
+        self.scratchpad = self._new_trace()
         self.input = None
         self.output = None
         self.supported_operations = {
             '+': self.solve_addition,
             '-': self.solve_subtraction,
-            '*': self.solve_multiplication
+            '*': self.solve_multiplication,
+            '/': self.solve_division,
+            '%': self.solve_remainder,
         }
 
+    def _new_trace(self):
+        """A scratchpad to write on: one that spills to a temporary file if there is a memory budget"""
+        if self.memory_budget is None:
+            return Trace(self.verbosity)
+        return BoundedTrace(self.verbosity, self.memory_budget)
+
     def receive_input(self, problem):
         """Step 1: Receive the input problem"""
         self.input = problem
-        self.scratchpad = []  # Reset scratchpad for new problem
-        self.scratchpad.append(f"Input received: {problem}")
+        self.scratchpad.clear()  # Reset scratchpad for new problem
+        self.scratchpad.record(INPUT, problem)
         return self
 
-    def show_scratchpad(self):
-        """Display the current contents of the scratchpad"""
-        print("\nScratchpad Contents:")
-        for idx, step in enumerate(self.scratchpad, 1):
-            print(f"Step {idx}: {step}")
+    def show_scratchpad(self, renderer=None, out=None):
+        """
+        Display the current contents of the scratchpad: as plain text on
+        the screen, or with a renderer (a renderers.Renderer, or "text",
+        "json", "markdown" or "latex") to `out` (any file-like object)
+        """
+        renderer = get_renderer(renderer, out)
+        measure = self.metrics is not None
+        start = time.perf_counter() if measure else 0.0
+        written = renderer.written
+        renderer.render_trace(self.scratchpad)
+        if measure:
+            self.metrics.add_time("format", time.perf_counter() - start)
+            self.metrics.count("trace_bytes", renderer.written - written)
 
     def parse_input(self, problem):
         """Parse input string into numbers and operation"""
-        if not problem or not isinstance(problem, str):
-            raise ValueError("Input must be a non-empty string")
-
-        # Find the operation
-        operation = None
-        for op in self.supported_operations:
-            if op in problem:
-                if operation:  # Multiple operations found
-                    raise ValueError("Only one operation allowed per problem")
-                operation = op
+        return parse_problem(problem)
 
-        if not operation:
-            raise ValueError("No supported operation found")
-
-        # Split and convert numbers
-        try:
-            num1, num2 = map(str.strip, problem.split(operation))
-            return int(num1), int(num2), operation
-        except ValueError:
-            raise ValueError("Invalid number format")
+    def _operate(self, operation, num1, num2):
+        result = solve_operation(operation, num1, num2, self.scratchpad.record,
+                                 self.scratchpad.verbosity, self.multiplication_strategy)
+        return self._finish(result, MUL_FINAL_RESULT if operation == '*' else FINAL_RESULT)
 
     def solve_addition(self, num1, num2):
         """Solve addition problems with step-by-step tracking"""
-        num1_str = str(num1)
-        num2_str = str(num2)
-        max_len = max(len(num1_str), len(num2_str))
-        num1_str = num1_str.zfill(max_len)
-        num2_str = num2_str.zfill(max_len)
-        
-        carry = 0
-        result = []
-        
-        for i in range(max_len - 1, -1, -1):
-            digit1 = int(num1_str[i])
-            digit2 = int(num2_str[i])
-            current_sum = digit1 + digit2 + carry
-            carry = current_sum // 10
-            current_digit = current_sum % 10
-            
-            position = "units" if i == max_len - 1 else f"position {max_len - i}"
-            self.scratchpad.append(
-                f"Adding {position}: {digit1} + {digit2} + carry({carry}) = {current_sum}"
-            )
-            if carry:
-                self.scratchpad.append(f"Set carry to {carry}")
-            
-            result.insert(0, str(current_digit))
-        
-        if carry:
-            result.insert(0, str(carry))
-            self.scratchpad.append(f"Final carry: {carry}")
-        
-        final_result = int(''.join(result))
-        self.output = final_result
-        self.scratchpad.append(f"Final result: {final_result}")
-        return final_result
+        return self._operate('+', num1, num2)
 
     def solve_subtraction(self, num1, num2):
         """Solve subtraction problems with step-by-step tracking"""
-        if num2 > num1:
-            raise ValueError("First number must be greater than or equal to second number")
-
-        num1_str = str(num1)
-        num2_str = str(num2).zfill(len(num1_str))
-        borrow = 0
-        result = []
-        
-        for i in range(len(num1_str) - 1, -1, -1):
-            digit1 = int(num1_str[i])
-            digit2 = int(num2_str[i])
-            
-            if borrow:
-                digit1 -= 1
-                self.scratchpad.append(f"Applied borrow: {int(num1_str[i])} becomes {digit1}")
-            
-            if digit1 < digit2:
-                digit1 += 10
-                borrow = 1
-                self.scratchpad.append(f"Need to borrow: {digit1-10} becomes {digit1}")
-            else:
-                borrow = 0
-            
-            current_diff = digit1 - digit2
-            position = "units" if i == len(num1_str) - 1 else f"position {len(num1_str) - i}"
-            self.scratchpad.append(f"Subtracting {position}: {digit1} - {digit2} = {current_diff}")
-            
-            result.insert(0, str(current_diff))
-        
-        final_result = int(''.join(result))
-        self.output = final_result
-        self.scratchpad.append(f"Final result: {final_result}")
-        return final_result
+        return self._operate('-', num1, num2)
 
     def solve_multiplication(self, num1, num2):
         """Solve multiplication problems with step-by-step tracking"""
-        num1_str = str(num1)
-        num2_str = str(num2)
-        
-        # Initialize the partial results
-        partial_results = []
-        
-        # Process each digit of num2 from right to left
-        for i in range(len(num2_str) - 1, -1, -1):
-            digit2 = int(num2_str[i])
-            carry = 0
-            current_result = []
-            zeros = '0' * (len(num2_str) - 1 - i)  # Add trailing zeros for position
-            
-            self.scratchpad.append(f"\nMultiplying by {digit2} at position {len(num2_str) - i - 1}:")
-            
-            # Multiply digit2 with each digit of num1
-            for j in range(len(num1_str) - 1, -1, -1):
-                digit1 = int(num1_str[j])
-                product = digit1 * digit2 + carry
-                carry = product // 10
-                current_digit = product % 10
-                
-                self.scratchpad.append(
-                    f"  {digit1} × {digit2} + carry({carry}) = {product}"
-                )
-                
-                current_result.insert(0, str(current_digit))
-            
-            if carry:
-                current_result.insert(0, str(carry))
-                self.scratchpad.append(f"  Final carry: {carry}")
-            
-            current_result.extend(zeros)
-            partial_result = int(''.join(current_result))
-            partial_results.append(partial_result)
-            self.scratchpad.append(f"Partial result: {partial_result}")
-        
-        # Sum all partial results
-        final_result = sum(partial_results)
+        return self._operate('*', num1, num2)
+
+    def solve_division(self, num1, num2):
+        """Solve division problems (the whole-number quotient) with long division steps"""
+        return self._operate('/', num1, num2)
+
+    def solve_remainder(self, num1, num2):
+        """Solve remainder problems (what is left after division) with long division steps"""
+        return self._operate('%', num1, num2)
+
+    def solve_expression(self, expression):
+        """
+        Solve a chained expression like "123*45+678-9" or "(12+3)*4".
+        Every operation is worked out with the same digit steps as a single
+        addition, subtraction, multiplication or division, in the order the
+        rules say (brackets, then ×, / and %, then + and - from left to right).
+        """
+        plan, numbers = compile_expression(expression)
+        steps = iter_expression(plan, numbers, self.scratchpad.verbosity, self.multiplication_strategy)
+        return self._finish(run_steps(steps, self.scratchpad.record))
+
+    def _finish(self, final_result, kind=FINAL_RESULT):
+        """Store the answer and write it down as the last step"""
         self.output = final_result
-        self.scratchpad.append(f"\nFinal result: {final_result}")
+        self.scratchpad.record(kind, final_result)
         return final_result
 
     def solve_problem(self):
-        """Generic problem-solving method"""
+        """
+        Generic problem-solving method. A single operation is handed to its
+        method in supported_operations, so replacing one there changes how
+        the agent works it out. Expressions, and every problem while there
+        is a result cache or metrics, are solved the way solve() does it.
+        """
+        if self.result_cache is None and self.metrics is None and not is_expression(self.input):
+            try:
+                num1, num2, operation = self.parse_input(self.input)
+                return self.supported_operations[operation](num1, num2)
+            except Exception as e:
+                self.output = None
+                self.scratchpad.record(ERROR, _error_message(e))
+                return None
+        result, error = self._solve_on(self.input, self.scratchpad)
+        self.output = result
+        return result
+
+    def solve(self, problem):
+        """
+        Solve one problem without touching the agent's current problem or
+        scratchpad: a SolveResult with the answer and a Trace of its own.
+        Safe to call from many threads at once.
+        """
+        trace = self._new_trace()
+        trace.record(INPUT, problem)
+        result, error = self._solve_on(problem, trace)
+        return SolveResult(problem, result, error, trace)
+
+    def _solve_on(self, problem, trace):
+        """Solve a problem onto a trace, returning (result, error message)"""
+        if self.result_cache is not None and isinstance(problem, str):
+            return self._solve_stored(problem, trace, self.result_cache)
+        return self._solve_fresh(problem, trace)
+
+    def _solve_stored(self, problem, trace, cache):
+        """
+        Look the problem up in the result cache; on a hit the answer and
+        its steps are copied from there, otherwise it is solved and stored
+        """
+        key = f"agent:{int(trace.verbosity)}:{self.multiplication_strategy}:"
+        key += _SPACES_AROUND.sub(r"\1", problem.strip())
+        cached = cache.get(key)
+        if cached is not None:
+            result, error, steps = cached
+            for kind, args in steps:
+                trace.record(kind, *args)
+            return result, error
+
+        first_step = len(trace)
+        result, error = self._solve_fresh(problem, trace)
+        steps = [(step.kind, step.args) for step in trace.steps(first_step)]
+        cache.put(key, (result, error, steps))
+        return result, error
+
+    def _solve_fresh(self, problem, trace):
+        if self.metrics is None:
+            return solve_into(problem, trace, self.multiplication_strategy)
         try:
-            num1, num2, operation = self.parse_input(self.input)
-            return self.supported_operations[operation](num1, num2)
-        except ValueError as e:
-            self.scratchpad.append(f"Error: {str(e)}")
-            return None
+            return self._solve_measured(problem, trace, self.metrics), None
         except Exception as e:
-            self.scratchpad.append(f"Error: Unexpected error occurred - {str(e)}")
-            return None
+            error = _error_message(e)
+        trace.record(ERROR, error)
+        self.metrics.count("errors")
+        return None, error
+
+    def _solve_measured(self, problem, trace, metrics):
+        """Solve a problem while timing each phase and counting the work"""
+        start = time.perf_counter()
+        try:
+            parsed = _parse(problem)
+        finally:
+            parse_end = time.perf_counter()
+            metrics.add_time("parse", parse_end - start)
+
+        first_step = len(trace)
+        result = _work_out(parsed, trace, self.multiplication_strategy)
+        metrics.add_time("solve", time.perf_counter() - parse_end)
+
+        metrics.count("problems")
+        metrics.count("digits_processed", sum(map(str.isdigit, problem)))
+        metrics.count("carries", trace.count(SET_CARRY, first_step)
+                      + trace.count(MUL_FINAL_CARRY, first_step))
+        metrics.count("borrows", trace.count(NEED_BORROW, first_step))
+        metrics.count("steps_logged", len(trace) - first_step)
+        return result
+
+    def solve_iter(self, problem=None):
+        """
+        Solve a problem (or the current input) and yield each Step the
+        moment it is worked out, then a SolveResult with the answer.
+        Steps are not kept on the scratchpad, so they can be printed,
+        forwarded or dropped as they come, and stopping early skips the
+        rest of the work. The verbosity level picks which steps are yielded.
+        Given a problem, the agent itself is left alone (thread-safe);
+        without one, the answer to the current input becomes the output.
+        """
+        steps = iter_solve(self.input if problem is None else problem, self.verbosity,
+                           self.multiplication_strategy)
+        if problem is not None:
+            return steps
+        return self._iter_current(steps)
+
+    def _iter_current(self, steps):
+        self.output = None
+        for item in steps:
+            if isinstance(item, SolveResult):
+                self.output = item.result
+            yield item
+
+    def solve_batch(self, problems, trace=False):
+        """
+        Solve many problems with this one agent and return a SolveResult
+        for each, in order. Errors are reported per problem instead of
+        raised. Without trace, plain problems skip the scratchpad entirely.
+        The agent's own scratchpad is left alone, so threads can share it.
+        """
+        plain = self.result_cache is None and self.metrics is None
+        return solve_many(problems, trace, self.verbosity, self.multiplication_strategy,
+                          None if plain else self._solve_on)
+
+    def solve_virtual(self, problem):
+        """
+        Like solve, but a plain addition, subtraction or schoolbook
+        multiplication gets a virtual_trace.VirtualTrace: nothing is written
+        down, and each step is worked out from the numbers when it is read,
+        so even million-step scratchpads can be paged through in constant
+        memory. Anything else is solved as usual.
+        """
+        simple = isinstance(problem, str) and _SIMPLE_PROBLEM.fullmatch(problem)
+        if simple and simple.group(2) in '+-*':
+            num1, operation, num2 = simple.groups()
+            num1, num2 = num1.lstrip('0') or '0', num2.lstrip('0') or '0'
+            try:
+                if operation == '*':
+                    trace = VirtualMultiplication(problem, num1, num2, self.multiplication_strategy,
+                                                  self.verbosity)
+                else:
+                    virtual = VirtualAddition if operation == '+' else VirtualSubtraction
+                    trace = virtual(problem, num1, num2, self.verbosity)
+            except ValueError:  # No virtual trace for it: solve it the usual way (and its error message)
+                return self.solve(problem)
+            return SolveResult(problem, trace.result, None, trace)
+        return self.solve(problem)
+
+    def solve_addition_many(self, num1s, num2s):
+        """
+        Add many pairs of numbers at once, a digit column at a time for all
+        of them (needs NumPy): a digit_batch.DigitBatch with the answers and
+        the carries, which can write out any one problem's steps on demand
+        """
+        return self._operate_many(add_many, num1s, num2s)
+
+    def solve_subtraction_many(self, num1s, num2s):
+        """Subtract many pairs of numbers at once (see solve_addition_many); too-small rows are marked negative"""
+        return self._operate_many(subtract_many, num1s, num2s)
+
+    def _operate_many(self, operate, num1s, num2s):
+        if self.metrics is None:
+            return operate(num1s, num2s)
+        with self.metrics.phase("solve"):
+            batch = operate(num1s, num2s)
+        self.metrics.count("problems", len(batch))
+        self.metrics.count("digits_processed", int(batch.widths.sum()))
+        self.metrics.count("carries" if batch.operation == '+' else "borrows", int(batch.carries.sum()))
+        return batch
 
 if __name__ == "__main__":
     # Create an instance of AIAgent
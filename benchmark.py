@@ -0,0 +1,337 @@
+"""
+Benchmarks
+Times every solver path over growing input sizes, trace verbosity levels
+and batch sizes, records peak memory with tracemalloc, and saves the
+numbers as JSON so later runs can be compared against them.
+
+Run it with:
+    python benchmark.py run -o results.json --max-digits 100000
+    python benchmark.py compare baseline.json results.json --threshold 0.2
+    python benchmark.py scaling --max-digits 1000000
+
+"scaling" prints time per digit for the digit engine: if the engine is
+linear it stays flat as the operands get longer, while the old
+insert(0, ...) loop gets slower and slower per digit.
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from functools import partial
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple
+
+from ai_agent import AIAgent
+from digit_engine import add_digits, subtract_digits, from_digits
+from math_solver import MathProblemSolver
+from scratchpad import Verbosity
+
+try:
+    import numpy as np  # Optional: the digit batch benchmarks need it
+except ImportError:
+    np = None
+
+
+class BenchmarkCase(NamedTuple):
+    """One thing to time: a name, its parameters, and a setup function
+    that prepares the inputs and returns the function to time"""
+    name: str
+    params: Dict[str, Any]
+    setup: Callable[[], Callable[[], Any]]
+
+    @property
+    def key(self) -> str:
+        return self.name + json.dumps(self.params, sort_keys=True)
+
+
+def legacy_addition(num1_str: str, num2_str: str) -> str:
+    """The original AIAgent addition loop, kept here to compare against"""
+    max_len = max(len(num1_str), len(num2_str))
+    num1_str = num1_str.zfill(max_len)
+    num2_str = num2_str.zfill(max_len)
+    carry = 0
+    result: List[str] = []
+    for i in range(max_len - 1, -1, -1):
+        current_sum = int(num1_str[i]) + int(num2_str[i]) + carry
+        carry = current_sum // 10
+        result.insert(0, str(current_sum % 10))
+    if carry:
+        result.insert(0, str(carry))
+    return ''.join(result)
+
+
+def random_digits(length: int, rng: random.Random) -> str:
+    """A random number with exactly `length` digits"""
+    return str(rng.randint(1, 9)) + ''.join(rng.choice('0123456789') for _ in range(length - 1))
+
+
+def time_call(func: Callable[[], object], repeats: int) -> float:
+    """Best wall time of a few runs, in seconds"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def digit_sizes(max_digits: int) -> List[int]:
+    """1, 10, 100, ... up to max_digits"""
+    sizes = []
+    size = 1
+    while size <= max_digits:
+        sizes.append(size)
+        size *= 10
+    return sizes
+
+
+def _arithmetic_case(operation: str, digits: int, verbosity: Verbosity) -> BenchmarkCase:
+    method = {"+": "solve_addition", "-": "solve_subtraction", "*": "solve_multiplication"}[operation]
+
+    def setup():
+        rng = random.Random(digits)
+        num1 = from_digits(random_digits(digits, rng))
+        num2 = from_digits(random_digits(digits, rng))
+        num1, num2 = max(num1, num2), min(num1, num2)
+        agent = AIAgent(verbosity=verbosity)
+        solve = getattr(agent, method)
+
+        def run():
+            agent.scratchpad.clear()
+            solve(num1, num2)
+        return run
+
+    return BenchmarkCase(method, {"digits": digits, "verbosity": verbosity.name}, setup)
+
+
+def _batch_case(name: str, batch_size: int, make_problem: Callable[[random.Random], Any],
+                solver_factory: Callable[[], Any], trace: bool) -> BenchmarkCase:
+    def setup():
+        rng = random.Random(batch_size)
+        problems = [make_problem(rng) for _ in range(batch_size)]
+        solver = solver_factory()
+        return lambda: solver.solve_batch(problems, trace)
+
+    return BenchmarkCase(name, {"batch_size": batch_size, "trace": trace}, setup)
+
+
+def _digit_batch_case(operation: str, batch_size: int) -> BenchmarkCase:
+    def setup():
+        rng = random.Random(batch_size)
+        num1s = [rng.randint(10 ** 11, 10 ** 12) for _ in range(batch_size)]
+        num2s = [rng.randint(0, 10 ** 11) for _ in range(batch_size)]
+        solve = getattr(AIAgent(), "solve_addition_many" if operation == "+" else "solve_subtraction_many")
+        return lambda: solve(num1s, num2s).answers()
+
+    return BenchmarkCase("agent_digit_batch", {"operation": operation, "batch_size": batch_size}, setup)
+
+
+def _linear_problem(rng: random.Random) -> str:
+    return f"{rng.randint(1, 99)}x + {rng.randint(0, 99)} = {rng.randint(0, 999)}"
+
+
+def _quadratic_problem(rng: random.Random) -> str:
+    return f"{rng.randint(1, 9)}x^2 - {rng.randint(10, 99)}x + {rng.randint(0, 9)} = 0"
+
+
+def _geometry_problem(rng: random.Random) -> tuple:
+    if rng.random() < 0.5:
+        return ("geometry", "circle_area", {"radius": rng.uniform(0.1, 10)})
+    return ("geometry", "triangle_area", {"base": rng.uniform(0.1, 10), "height": rng.uniform(0.1, 10)})
+
+
+def _agent_problem(rng: random.Random) -> str:
+    return f"{rng.randint(0, 99999)}{rng.choice('+-*')}{rng.randint(0, 9999)}"
+
+
+def build_cases(max_digits: int = 100_000, batch_sizes=(1, 100, 10_000),
+                max_traced_multiplication: int = 10_000) -> Iterator[BenchmarkCase]:
+    """Every benchmark, for every input size, verbosity and batch size"""
+    for operation in "+-*":
+        for digits in digit_sizes(max_digits):
+            for verbosity in Verbosity:
+                if operation == "*" and verbosity == Verbosity.DIGITS and digits > max_traced_multiplication:
+                    continue
+                yield _arithmetic_case(operation, digits, verbosity)
+
+    no_cache = partial(MathProblemSolver, cache_size=0)
+    for batch_size in batch_sizes:
+        for trace in (False, True):
+            yield _batch_case("agent_solve_batch", batch_size, _agent_problem, AIAgent, trace)
+            yield _batch_case("solve_equation", batch_size, _linear_problem, no_cache, trace)
+            yield _batch_case("solve_quadratic", batch_size, _quadratic_problem, no_cache, trace)
+            yield _batch_case("solve_geometry", batch_size, _geometry_problem, no_cache, trace)
+        if np is not None:
+            for operation in "+-":
+                yield _digit_batch_case(operation, batch_size)
+
+
+def measure(case: BenchmarkCase, warmup: int = 1, repeats: int = 5) -> Dict[str, Any]:
+    """Time one case (after warming up) and record its peak memory"""
+    run = case.setup()
+    for _ in range(warmup):
+        run()
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    # Memory is measured in its own run, since tracemalloc slows things down
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "name": case.name,
+        "params": case.params,
+        "key": case.key,
+        "best": min(times),
+        "median": statistics.median(times),
+        "repeats": repeats,
+        "peak_bytes": peak,
+    }
+
+
+def run_benchmarks(cases: List[BenchmarkCase], warmup: int = 1, repeats: int = 5,
+                   verbose: bool = True) -> Dict[str, Any]:
+    """Run all cases and collect the results in a JSON-ready dictionary"""
+    results = []
+    for case in cases:
+        result = measure(case, warmup, repeats)
+        results.append(result)
+        if verbose:
+            params = ", ".join(f"{k}={v}" for k, v in case.params.items())
+            print(f"{case.name:>22} {params:<40} {result['median'] * 1e3:10.3f} ms "
+                  f"{result['peak_bytes'] / 1024:10.1f} KiB", file=sys.stderr)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "warmup": warmup,
+            "repeats": repeats,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any],
+            threshold: float = 0.2, memory_threshold: float = 0.2) -> List[Dict[str, Any]]:
+    """
+    Find cases that got slower (median time) or hungrier (peak memory) by
+    more than the thresholds (0.2 = 20%) compared to the baseline run.
+    """
+    before = {result["key"]: result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = before.get(result["key"])
+        if old is None:
+            continue
+        for metric, limit in (("median", threshold), ("peak_bytes", memory_threshold)):
+            if old[metric] > 0 and result[metric] > old[metric] * (1 + limit):
+                regressions.append({
+                    "key": result["key"],
+                    "metric": metric,
+                    "baseline": old[metric],
+                    "current": result[metric],
+                    "change": result[metric] / old[metric] - 1,
+                })
+    return regressions
+
+
+def digit_engine_scaling(sizes: List[int], repeats: int = 3, legacy_limit: int = 100_000) -> None:
+    """Print time per digit for the engine (with and without a trace) and the old loop"""
+    rng = random.Random(0)
+    print(f"{'digits':>10} {'add ns/digit':>14} {'sub ns/digit':>14} "
+          f"{'traced ns/digit':>16} {'legacy ns/digit':>16}")
+    for size in sizes:
+        num1 = random_digits(size, rng)
+        num2 = random_digits(size, rng)
+        high, low = max(num1, num2), min(num1, num2)
+        steps: List[tuple] = []
+
+        def traced():
+            steps.clear()
+            add_digits(num1, num2, lambda *step: steps.append(step))
+
+        add_time = time_call(lambda: add_digits(num1, num2), repeats)
+        sub_time = time_call(lambda: subtract_digits(high, low), repeats)
+        traced_time = time_call(traced, repeats)
+        if size <= legacy_limit:
+            legacy = f"{time_call(lambda: legacy_addition(num1, num2), 1) / size * 1e9:16.1f}"
+        else:
+            legacy = f"{'(skipped)':>16}"
+        print(f"{size:>10} {add_time / size * 1e9:14.1f} {sub_time / size * 1e9:14.1f} "
+              f"{traced_time / size * 1e9:16.1f} {legacy}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Solver benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmark suite")
+    run_parser.add_argument("-o", "--output", help="Write results to this JSON file")
+    run_parser.add_argument("--max-digits", type=int, default=100_000)
+    run_parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 10_000])
+    run_parser.add_argument("--warmup", type=int, default=1)
+    run_parser.add_argument("--repeats", type=int, default=5)
+    run_parser.add_argument("--filter", default="", help="Only run cases whose name contains this")
+    run_parser.add_argument("--baseline", help="Compare against this JSON file when done")
+    run_parser.add_argument("--threshold", type=float, default=0.2)
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2,
+                                help="Allowed slowdown, 0.2 = 20%%")
+    compare_parser.add_argument("--memory-threshold", type=float, default=0.2)
+
+    scaling_parser = commands.add_parser("scaling", help="Digit engine time per digit")
+    scaling_parser.add_argument("--max-digits", type=int, default=100_000,
+                                help="Longest operand to try (sizes grow by 10x from 1000)")
+    scaling_parser.add_argument("--repeats", type=int, default=3)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "scaling":
+        digit_engine_scaling([size for size in digit_sizes(args.max_digits) if size >= 1000], args.repeats)
+        return 0
+
+    if args.command == "run":
+        cases = [case for case in build_cases(args.max_digits, args.batch_sizes)
+                 if args.filter in case.name]
+        current = run_benchmarks(cases, args.warmup, args.repeats)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(current, f, indent=2)
+        if not args.baseline:
+            return 0
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        threshold, memory_threshold = args.threshold, args.threshold
+    else:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+        threshold, memory_threshold = args.threshold, args.memory_threshold
+
+    regressions = compare(baseline, current, threshold, memory_threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression['key']} {regression['metric']}: "
+              f"{regression['baseline']:.6g} -> {regression['current']:.6g} "
+              f"(+{regression['change']:.0%})")
+    print(f"{len(regressions)} regression(s) found")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
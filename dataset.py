@@ -0,0 +1,268 @@
+"""
+Scratchpad Dataset Generator
+Makes (problem, scratchpad, answer) training examples with AIAgent, the way
+the "Show Your Work" paper trains models to write out intermediate steps.
+
+- Sampling is seeded per shard, so the same settings always give the same
+  examples, no matter how many workers there are or which shards are redone.
+- Shards are written by worker processes to compressed JSONL (or Parquet
+  when pyarrow is installed), each to a temporary name first and renamed
+  when complete - rerunning a half-finished job only writes missing shards.
+  The settings go to manifest.json before any shard is written, and a rerun
+  with different settings is refused unless told to overwrite.
+
+Usage:
+    python dataset.py data/ --examples 10000000 --shard-size 100000 --workers 32
+"""
+
+import argparse
+import glob
+import gzip
+import inspect
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from ai_agent import AIAgent
+from pipeline import jsonable
+from scratchpad import INPUT, Verbosity
+
+FORMATS = {"jsonl": ".jsonl.gz", "parquet": ".parquet"}
+
+
+def shard_path(out_dir: str, shard: int, fmt: str) -> str:
+    return os.path.join(out_dir, f"shard-{shard:05d}{FORMATS[fmt]}")
+
+
+def sample_examples(seed: int, shard: int, count: int, operations: Sequence[str] = "+-*",
+                    min_digits: int = 1, max_digits: int = 8,
+                    verbosity: Verbosity = Verbosity.DIGITS) -> Iterator[Dict[str, Any]]:
+    """
+    Yield `count` examples for one shard. The operation and the length of
+    each operand are drawn uniformly; subtraction puts the bigger number first.
+    """
+    rng = random.Random(f"{seed}:{shard}")
+    agent = AIAgent(verbosity=verbosity)
+    scratchpad = agent.scratchpad
+    solvers = {op: agent.supported_operations[op] for op in operations}
+    lows = [0] + [10 ** (digits - 1) for digits in range(1, max_digits + 1)]
+    choice, randint, randrange = rng.choice, rng.randint, rng.randrange
+
+    for _ in range(count):
+        operation = choice(operations)
+        length1 = randint(min_digits, max_digits)
+        length2 = randint(min_digits, max_digits)
+        num1 = randrange(lows[length1], 10 ** length1)
+        num2 = randrange(lows[length2], 10 ** length2)
+        if operation == "-" and num2 > num1:
+            num1, num2 = num2, num1
+        problem = f"{num1}{operation}{num2}"
+
+        # Skip parsing: we already have the numbers
+        agent.input = problem
+        scratchpad.clear()
+        scratchpad.record(INPUT, problem)
+        answer = solvers[operation](num1, num2)
+        yield {"problem": problem, "scratchpad": scratchpad.to_text(), "answer": jsonable(answer)}
+
+
+def _write_jsonl(path: str, examples: Iterator[Dict[str, Any]], compresslevel: int) -> int:
+    count = 0
+    dumps = json.dumps
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=compresslevel) as f:
+        buffer = []
+        for example in examples:
+            buffer.append(dumps(example, ensure_ascii=False))
+            count += 1
+            if len(buffer) >= 1000:
+                buffer.append("")
+                f.write("\n".join(buffer))
+                buffer.clear()
+        if buffer:
+            buffer.append("")
+            f.write("\n".join(buffer))
+    return count
+
+
+def _write_parquet(path: str, examples: Iterator[Dict[str, Any]], compresslevel: int) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+    columns: Dict[str, List[Any]] = {"problem": [], "scratchpad": [], "answer": []}
+    for example in examples:
+        columns["problem"].append(example["problem"])
+        columns["scratchpad"].append(example["scratchpad"])
+        columns["answer"].append(str(example["answer"]))
+    pq.write_table(pa.table(columns), path, compression="zstd")
+    return len(columns["problem"])
+
+
+WRITERS = {"jsonl": _write_jsonl, "parquet": _write_parquet}
+
+
+def _count_jsonl(path: str) -> int:
+    with gzip.open(path, "rb") as f:
+        return sum(1 for _ in f)
+
+
+def _count_parquet(path: str) -> int:
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(path).metadata.num_rows
+
+
+COUNTERS = {"jsonl": _count_jsonl, "parquet": _count_parquet}
+
+
+def _shard_complete(path: str, count: int, fmt: str) -> bool:
+    """Whether a shard on disk holds exactly `count` examples (and can be read)"""
+    try:
+        return COUNTERS[fmt](path) == count
+    except (OSError, EOFError, ImportError):
+        return False
+
+
+def write_shard(out_dir: str, shard: int, count: int, seed: int, fmt: str = "jsonl",
+                compresslevel: int = 1, **sampling: Any) -> Dict[str, Any]:
+    """Write one shard (unless it is already there, complete) and report what was done"""
+    path = shard_path(out_dir, shard, fmt)
+    if os.path.exists(path) and _shard_complete(path, count, fmt):
+        return {"shard": shard, "path": path, "examples": count, "skipped": True}
+    start = time.perf_counter()
+    temp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        written = WRITERS[fmt](temp_path, sample_examples(seed, shard, count, **sampling), compresslevel)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return {"shard": shard, "path": path, "examples": written, "skipped": False,
+            "seconds": time.perf_counter() - start}
+
+
+def _settings(shard_size: int, seed: int, fmt: str, sampling: Dict[str, Any]) -> Dict[str, Any]:
+    """What decides the examples in every shard, as manifest.json keeps it"""
+    defaults = {name: parameter.default for name, parameter in inspect.signature(sample_examples).parameters.items()
+                if parameter.default is not inspect.Parameter.empty}
+    sampling = {**defaults, **sampling}
+    return json.loads(json.dumps({
+        "shard_size": shard_size,
+        "seed": seed,
+        "format": fmt,
+        "sampling": {key: (list(value) if isinstance(value, str) else value)
+                     for key, value in sorted(sampling.items())},
+    }))
+
+
+def _write_manifest(out_dir: str, manifest: Dict[str, Any]) -> None:
+    with open(os.path.join(out_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def _check_settings(out_dir: str, settings: Dict[str, Any], overwrite: bool) -> None:
+    """Make sure the shards already in out_dir were made with the same settings (or remove them)"""
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    shards = [path for ext in FORMATS.values() for path in glob.glob(os.path.join(out_dir, f"shard-*{ext}*"))]
+    previous = None
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            previous = json.load(f)
+        previous = {key: previous.get(key) for key in settings}
+    if previous == settings or (previous is None and not shards):
+        return
+    if not overwrite:
+        if previous is None:
+            raise ValueError(f"'{out_dir}' has shards but no manifest.json; "
+                             f"use overwrite=True (--overwrite) to replace them")
+        changed = [key for key in settings if key != "sampling" and previous[key] != settings[key]]
+        sampling = previous["sampling"] or {}
+        changed += [key for key in settings["sampling"] if sampling.get(key) != settings["sampling"][key]]
+        changed = ", ".join(changed)
+        raise ValueError(f"'{out_dir}' was generated with different settings ({changed}); "
+                         f"use overwrite=True (--overwrite) to replace it")
+    for path in shards:
+        os.remove(path)
+
+
+def generate(out_dir: str, examples: int, shard_size: int = 100_000, seed: int = 0,
+             workers: Optional[int] = None, fmt: str = "jsonl", compresslevel: int = 1,
+             overwrite: bool = False, **sampling: Any) -> Dict[str, Any]:
+    """
+    Generate `examples` examples into `out_dir`, split into shards of
+    `shard_size`. Complete shards already on disk are kept, as long as
+    they were made with the same settings (seed, shard size, format and
+    sampling options, see manifest.json); otherwise this raises ValueError,
+    or with overwrite, starts over. Sampling options (operations,
+    min_digits, max_digits, verbosity) go to sample_examples.
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown format '{fmt}'. Supported formats: {', '.join(WRITERS)}")
+    os.makedirs(out_dir, exist_ok=True)
+    settings = _settings(shard_size, seed, fmt, sampling)
+    _check_settings(out_dir, settings, overwrite)
+    counts = [min(shard_size, examples - start) for start in range(0, examples, shard_size)]
+    names = [os.path.basename(shard_path(out_dir, shard, fmt)) for shard in range(len(counts))]
+    # Written first, so a rerun of a half-finished job knows what it was making
+    manifest = {"examples": examples, **settings, "shards": names, "complete": False}
+    _write_manifest(out_dir, manifest)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    start = time.perf_counter()
+    jobs = [(out_dir, shard, count, seed, fmt, compresslevel) for shard, count in enumerate(counts)]
+    if workers <= 1:
+        shards = [write_shard(*job, **sampling) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(write_shard, *job, **sampling) for job in jobs]
+            shards = [future.result() for future in futures]
+    seconds = time.perf_counter() - start
+
+    written = sum(s["examples"] for s in shards if not s["skipped"])
+    manifest["complete"] = True
+    _write_manifest(out_dir, manifest)
+    return {
+        "written": written,
+        "skipped_shards": sum(s["skipped"] for s in shards),
+        "seconds": seconds,
+        "examples_per_minute": written / seconds * 60 if seconds else 0.0,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate scratchpad training examples")
+    parser.add_argument("out_dir")
+    parser.add_argument("--examples", type=int, required=True)
+    parser.add_argument("--shard-size", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="Default: all cores")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="jsonl")
+    parser.add_argument("--compresslevel", type=int, default=1, help="gzip level for jsonl")
+    parser.add_argument("--operations", default="+-*")
+    parser.add_argument("--min-digits", type=int, default=1)
+    parser.add_argument("--max-digits", type=int, default=8)
+    parser.add_argument("--verbosity", choices=[v.name.lower() for v in Verbosity], default="digits")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="Replace shards made with different settings instead of refusing")
+    args = parser.parse_args(argv)
+
+    try:
+        stats = generate(args.out_dir, args.examples, args.shard_size, args.seed, args.workers,
+                         args.format, args.compresslevel, args.overwrite, operations=args.operations,
+                         min_digits=args.min_digits, max_digits=args.max_digits,
+                         verbosity=Verbosity[args.verbosity.upper()])
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Wrote {stats['written']} examples in {stats['seconds']:.2f}s "
+          f"({stats['examples_per_minute']:.0f} examples/min, "
+          f"{stats['skipped_shards']} shards already done)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
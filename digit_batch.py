@@ -0,0 +1,198 @@
+"""
+Digit Batches
+Column-by-column addition and subtraction for many problems at once.
+The operands are laid out as digit matrices (one row per problem, one
+column per digit position, units in the last column) and NumPy works out
+one column for every problem at a time, so the Python loop runs once per
+digit position instead of once per digit of every problem.
+
+The batch's scratchpad is the carry (or borrow) out of every column of
+every problem. Those are enough to rebuild the steps of any one problem
+when someone asks for them - the same steps add_digits and subtract_digits
+write down - so nothing per problem is written while solving.
+"""
+
+from typing import Any, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy as np  # Optional: only needed for batches
+except ImportError:
+    np = None
+
+from digit_engine import from_digits, to_digits
+from scratchpad import (
+    ADD_DIGIT, SET_CARRY, FINAL_CARRY, APPLY_BORROW, NEED_BORROW, SUB_DIGIT, INPUT, ERROR,
+    FINAL_RESULT, Trace, Verbosity, run_steps,
+)
+
+_ZERO = ord("0")
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("Solving batches of digit problems needs NumPy: pip install numpy")
+
+
+class DigitBatch(NamedTuple):
+    """The work of a whole batch of additions or subtractions"""
+    operation: str  # "+" or "-"
+    num1: Any       # First numbers as a digit matrix (problems × positions)
+    num2: Any       # Second numbers, the same way
+    widths: Any     # How many columns each problem really has (the rest is zero padding)
+    carries: Any    # Carry (for -: borrow) out of every column, the batch's scratchpad
+    result: Any     # The answers as a digit matrix (one more column for +)
+    negative: Any   # True where num1 < num2 in a subtraction (no answer)
+
+    def __len__(self) -> int:
+        return len(self.widths)
+
+    def digits(self, row: int) -> Optional[str]:
+        """One answer as a digit string (None where there is none)"""
+        if self.negative[row]:
+            return None
+        return (self.result[row] + _ZERO).tobytes().decode("ascii").lstrip("0") or "0"
+
+    def answers(self) -> List[Optional[int]]:
+        """Every answer as a number, in order (None where there is none)"""
+        width = self.result.shape[1]
+        if width <= 18:
+            # Short answers fit in 64-bit ints: let NumPy put the digits together
+            values = self.result @ 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+            answers = values.tolist()
+        else:
+            text = (np.ascontiguousarray(self.result) + _ZERO).tobytes().decode("ascii")
+            # int() stops at Python's digit limit; the digit engine doesn't
+            number = int if width <= 4000 else from_digits
+            answers = [number(text[start:start + width]) for start in range(0, len(text), width)]
+        if self.negative.any():
+            answers = [None if negative else answer for answer, negative in zip(answers, self.negative.tolist())]
+        return answers
+
+    def steps(self, row: int) -> Iterator[Tuple[int, tuple]]:
+        """
+        The (kind, args) steps of one problem, rebuilt from the batch's
+        carries - the same steps iter_add_digits or iter_subtract_digits
+        yield - and its answer's digit string at the end
+        """
+        width = int(self.widths[row])
+        first = self.num1.shape[1] - width  # The problem's leftmost column
+        digits1 = self.num1[row, first:].tolist()
+        digits2 = self.num2[row, first:].tolist()
+        carries = self.carries[row, first:].tolist()
+        if self.operation == "+":
+            carry = 0
+            for i in range(width - 1, -1, -1):
+                current_sum = digits1[i] + digits2[i] + carry
+                carry = carries[i]
+                yield ADD_DIGIT, (width - i, digits1[i], digits2[i], carry, current_sum)
+                if carry:
+                    yield SET_CARRY, (carry,)
+            if carry:
+                yield FINAL_CARRY, (carry,)
+        else:
+            if self.negative[row]:
+                raise ValueError("First number must be greater than or equal to second number")
+            borrow = 0
+            for i in range(width - 1, -1, -1):
+                digit1 = digits1[i]
+                if borrow:
+                    digit1 -= 1
+                    yield APPLY_BORROW, (digit1 + 1, digit1)
+                borrow = carries[i]
+                if borrow:
+                    digit1 += 10
+                    yield NEED_BORROW, (digit1 - 10, digit1)
+                yield SUB_DIGIT, (width - i, digit1, digits2[i], digit1 - digits2[i])
+        return self.digits(row)
+
+    def trace(self, row: int, verbosity: int = Verbosity.DIGITS) -> Trace:
+        """
+        One problem's scratchpad, as AIAgent would have written it for
+        "<num1><operation><num2>": input, digit steps and final result
+        """
+        trace = Trace(verbosity)
+        num1, num2 = (self._number(matrix, row) for matrix in (self.num1, self.num2))
+        trace.record(INPUT, f"{num1}{self.operation}{num2}")
+        try:
+            trace.record(FINAL_RESULT, from_digits(run_steps(self.steps(row), trace.record)))
+        except ValueError as e:
+            trace.record(ERROR, str(e))
+        return trace
+
+    def _number(self, matrix: Any, row: int) -> str:
+        return (matrix[row] + _ZERO).tobytes().decode("ascii").lstrip("0") or "0"
+
+
+def _digit_strings(numbers: Sequence[Union[int, str]]) -> List[str]:
+    """Every number as a digit string without leading zeros (anything else fails in _digit_matrix)"""
+    try:
+        strings = map(str, numbers)
+        return [s.strip().lstrip("0") or "0" for s in strings]
+    except ValueError:  # Past Python's str() limit
+        return [to_digits(n).strip().lstrip("0") or "0" for n in numbers]
+
+
+def _digit_matrix(strings: List[str], width: int) -> Any:
+    """Right-aligned, zero-padded digit values, one row per number, stored a column at a time"""
+    text = "".join([s.rjust(width, "0") for s in strings]).encode("ascii")
+    matrix = np.frombuffer(text, np.uint8).reshape(len(strings), width) - np.uint8(_ZERO)
+    if matrix.size and matrix.max() > 9:
+        raise ValueError("Invalid number format")
+    return np.asfortranarray(matrix)
+
+
+def _prepare(num1s: Sequence[Union[int, str]], num2s: Sequence[Union[int, str]]) -> Tuple[Any, ...]:
+    _require_numpy()
+    if len(num1s) != len(num2s):
+        raise ValueError("Both lists of numbers must be the same length")
+    strings1, strings2 = _digit_strings(num1s), _digit_strings(num2s)
+    lengths1 = np.fromiter(map(len, strings1), np.int64, len(strings1))
+    lengths2 = np.fromiter(map(len, strings2), np.int64, len(strings2))
+    width = int(max(lengths1.max(initial=1), lengths2.max(initial=1)))
+    return _digit_matrix(strings1, width), _digit_matrix(strings2, width), lengths1, lengths2
+
+
+def add_many(num1s: Sequence[Union[int, str]], num2s: Sequence[Union[int, str]]) -> DigitBatch:
+    """
+    Add num1s[i] + num2s[i] for every i (numbers or digit strings), a
+    column at a time for the whole batch. Per-problem steps come from
+    DigitBatch.steps or DigitBatch.trace afterwards.
+    """
+    digits1, digits2, lengths1, lengths2 = _prepare(num1s, num2s)
+    count, width = digits1.shape
+    carries = np.empty((count, width), np.uint8, order="F")
+    result = np.empty((count, width + 1), np.uint8, order="F")
+    carry = np.zeros(count, np.uint8)
+    total = np.empty(count, np.uint8)
+    for i in range(width - 1, -1, -1):
+        np.add(digits1[:, i], digits2[:, i], out=total)
+        total += carry
+        np.greater_equal(total, 10, out=carry, casting="unsafe")
+        carries[:, i] = carry
+        result[:, i + 1] = total - carry * np.uint8(10)
+    result[:, 0] = carry
+    return DigitBatch("+", digits1, digits2, np.maximum(lengths1, lengths2), carries, result,
+                      np.zeros(count, bool))
+
+
+def subtract_many(num1s: Sequence[Union[int, str]], num2s: Sequence[Union[int, str]]) -> DigitBatch:
+    """
+    Subtract num1s[i] - num2s[i] for every i, a column at a time for the
+    whole batch. Problems where the first number is smaller have no answer
+    and are marked in `negative` instead of stopping the batch.
+    """
+    digits1, digits2, lengths1, _ = _prepare(num1s, num2s)
+    count, width = digits1.shape
+    borrows = np.empty((count, width), np.uint8, order="F")
+    result = np.empty((count, width), np.uint8, order="F")
+    borrow = np.zeros(count, np.uint8)
+    difference = np.empty(count, np.uint8)
+    for i in range(width - 1, -1, -1):
+        # Digits are unsigned: a column that needs a borrow wraps past 245
+        np.subtract(digits1[:, i], digits2[:, i], out=difference)
+        difference -= borrow
+        np.greater(difference, 9, out=borrow, casting="unsafe")
+        borrows[:, i] = borrow
+        result[:, i] = difference + borrow * np.uint8(10)
+    # A borrow out of the leftmost column means num2 was bigger
+    return DigitBatch("-", digits1, digits2, lengths1, borrows, result, borrow.astype(bool))
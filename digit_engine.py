@@ -0,0 +1,188 @@
+"""
+Digit Engine
+Column-by-column addition and subtraction on long digit strings.
+The digits live in preallocated bytearrays and the answer is filled in from
+the right, so the work (and the memory) grows linearly with the number of
+digits - even for operands with hundreds of thousands of digits.
+"""
+
+import math
+import sys
+from typing import Callable, Iterator, Optional, Tuple, Union
+
+from scratchpad import (
+    ADD_DIGIT, SET_CARRY, FINAL_CARRY, APPLY_BORROW, NEED_BORROW, SUB_DIGIT,
+    run_steps,
+)
+
+# Translation tables between ASCII digits and digit values (0-9)
+_TO_VALUES = bytes.maketrans(b"0123456789", bytes(range(10)))
+_TO_ASCII = bytes.maketrans(bytes(range(10)), b"0123456789")
+
+Recorder = Optional[Callable[..., None]]
+
+
+def _max_str_digits() -> int:
+    """Longest number Python will convert between int and str in one go"""
+    limit = sys.get_int_max_str_digits() if hasattr(sys, "get_int_max_str_digits") else 0
+    return limit - 1 if limit else sys.maxsize
+
+
+def to_digits(value: Union[int, str]) -> str:
+    """Decimal digits of a number, also for numbers past Python's str() limit"""
+    if isinstance(value, str):
+        return value
+    if value < 0:
+        return "-" + to_digits(-value)
+    if value.bit_length() * 0.30103 < _max_str_digits():
+        return str(value)
+    return _int_to_str(value, 0, _max_str_digits())
+
+
+def _int_to_str(value: int, width: int, limit: int) -> str:
+    # Split the number in two halves of decimal digits and convert each half
+    if value.bit_length() * 0.30103 < limit:
+        text = str(value)
+        return text.zfill(width) if width else text
+    half = (int(value.bit_length() * 0.30103) + 1) // 2
+    high, low = divmod(value, 10 ** half)
+    return _int_to_str(high, max(width - half, 0), limit) + _int_to_str(low, half, limit)
+
+
+def from_digits(digits: str) -> int:
+    """Turn a digit string into an int, also past Python's int() limit"""
+    limit = _max_str_digits()
+    if len(digits) <= limit:
+        return int(digits)
+    digits = digits.strip()
+    if not (digits.isascii() and digits.isdigit()):
+        raise ValueError("Invalid number format")
+    return _str_to_int(digits, limit)
+
+
+def digit_count(value: int) -> int:
+    """How many decimal digits a non-negative number has, without writing it out"""
+    if value.bit_length() < 4000:
+        return len(str(value))
+    digits = int(value.bit_length() * math.log10(2))  # Right, or one short
+    return digits + (value >= 10 ** digits)
+
+
+def _str_to_int(digits: str, limit: int) -> int:
+    if len(digits) <= limit:
+        return int(digits)
+    half = len(digits) // 2
+    return _str_to_int(digits[:-half], limit) * 10 ** half + _str_to_int(digits[-half:], limit)
+
+
+def _digit_buffer(digits: str, width: int) -> bytearray:
+    """Right-aligned, zero-padded digit values in a buffer of the given width"""
+    buffer = bytearray(width)
+    buffer[width - len(digits):] = digits.encode("ascii").translate(_TO_VALUES)
+    return buffer
+
+
+def _buffer_to_digits(buffer: bytearray) -> str:
+    return buffer.translate(_TO_ASCII).decode("ascii").lstrip("0") or "0"
+
+
+def add_digits(num1: str, num2: str, record: Recorder = None) -> str:
+    """
+    Add two digit strings column by column, right to left.
+    If a record function is given, every column is written down with the
+    same steps as AIAgent.solve_addition (digit sums, carries, final carry).
+    """
+    if record is not None:
+        return run_steps(iter_add_digits(num1, num2), record)
+    width = max(len(num1), len(num2))
+    digits1 = _digit_buffer(num1, width)
+    digits2 = _digit_buffer(num2, width)
+    result = bytearray(width + 1)
+    carry = 0
+    for i in range(width - 1, -1, -1):
+        current_sum = digits1[i] + digits2[i] + carry
+        carry = 1 if current_sum >= 10 else 0
+        result[i + 1] = current_sum - 10 * carry
+    result[0] = carry
+    return _buffer_to_digits(result)
+
+
+def iter_add_digits(num1: str, num2: str) -> Iterator[Tuple[int, tuple]]:
+    """
+    Step-by-step addition: yields each (kind, args) step as soon as its
+    column is done, and returns the sum's digit string at the end.
+    """
+    width = max(len(num1), len(num2))
+    digits1 = _digit_buffer(num1, width)
+    digits2 = _digit_buffer(num2, width)
+    result = bytearray(width + 1)
+    carry = 0
+    for i in range(width - 1, -1, -1):
+        digit1 = digits1[i]
+        digit2 = digits2[i]
+        current_sum = digit1 + digit2 + carry
+        carry = 1 if current_sum >= 10 else 0
+        result[i + 1] = current_sum - 10 * carry
+        yield ADD_DIGIT, (width - i, digit1, digit2, carry, current_sum)
+        if carry:
+            yield SET_CARRY, (carry,)
+    if carry:
+        yield FINAL_CARRY, (carry,)
+    result[0] = carry
+    return _buffer_to_digits(result)
+
+
+def _check_order(num1: str, num2: str) -> None:
+    if len(num2) > len(num1) or (len(num2) == len(num1) and num2 > num1):
+        raise ValueError("First number must be greater than or equal to second number")
+
+
+def subtract_digits(num1: str, num2: str, record: Recorder = None) -> str:
+    """
+    Subtract two digit strings column by column, right to left.
+    The first number must not be smaller than the second. If a record
+    function is given, every column is written down with the same steps as
+    AIAgent.solve_subtraction (applied borrows, needed borrows, differences).
+    """
+    _check_order(num1, num2)
+    if record is not None:
+        return run_steps(iter_subtract_digits(num1, num2), record)
+    width = len(num1)
+    digits1 = _digit_buffer(num1, width)
+    digits2 = _digit_buffer(num2, width)
+    result = bytearray(width)
+    borrow = 0
+    for i in range(width - 1, -1, -1):
+        current_diff = digits1[i] - digits2[i] - borrow
+        borrow = 1 if current_diff < 0 else 0
+        result[i] = current_diff + 10 * borrow
+    return _buffer_to_digits(result)
+
+
+def iter_subtract_digits(num1: str, num2: str) -> Iterator[Tuple[int, tuple]]:
+    """
+    Step-by-step subtraction: yields each (kind, args) step as soon as its
+    column is done, and returns the difference's digit string at the end.
+    """
+    _check_order(num1, num2)
+    width = len(num1)
+    digits1 = _digit_buffer(num1, width)
+    digits2 = _digit_buffer(num2, width)
+    result = bytearray(width)
+    borrow = 0
+    for i in range(width - 1, -1, -1):
+        digit1 = digits1[i]
+        digit2 = digits2[i]
+        if borrow:
+            digit1 -= 1
+            yield APPLY_BORROW, (digit1 + 1, digit1)
+        if digit1 < digit2:
+            digit1 += 10
+            borrow = 1
+            yield NEED_BORROW, (digit1 - 10, digit1)
+        else:
+            borrow = 0
+        current_diff = digit1 - digit2
+        result[i] = current_diff
+        yield SUB_DIGIT, (width - i, digit1, digit2, current_diff)
+    return _buffer_to_digits(result)
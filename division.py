@@ -0,0 +1,214 @@
+"""
+Division Strategies
+Different ways to divide two numbers while showing the work:
+- digits: the classic long division, bringing down one digit at a time
+- limbs: the same long division on chunks ("limbs") of several digits,
+  so every step works out several digits of the quotient
+- newton: work out the divisor's reciprocal with Newton's method and
+  multiply by it; only the Newton steps and the final correction are
+  written down
+- native: let Python's big integers do it and only write down the answer
+
+Long division writes a step per digit (or limb) of the dividend and every
+step works on a number as long as the divisor, so its work grows with the
+square of the length. Newton's method only needs multiplications, which is
+what keeps million-digit quotients fast. The agent picks a strategy from
+the dividend's length.
+"""
+
+import math
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from digit_engine import digit_count, to_digits, from_digits
+from scratchpad import (
+    DIV_STRATEGY, DIV_DIGIT, DIV_LIMB, DIV_RECIPROCAL, DIV_NEWTON, DIV_ESTIMATE, DIV_CORRECT,
+    DIV_RESULT, run_steps,
+)
+
+Recorder = Optional[Callable[..., None]]
+
+# Longest dividend (in digits) each strategy is picked for in "auto" mode
+DIGITS_MAX = 40
+LIMBS_MAX = 2000
+
+LIMB_DIGITS = 8           # Dividend digits brought down per step by the limb strategy
+NEWTON_LEAF_BITS = 1024   # Reciprocals this short are worked out directly
+NEWTON_GUARD_BITS = 32    # Extra bits that keep Newton's rounding errors out of the answer
+NATIVE_MAX_BITS = 100000  # Past this (quotient and divisor), Newton's method beats divmod
+
+_DIGITS_PER_BIT = math.log10(2)
+
+
+def choose_strategy(num1_digits: int) -> str:
+    """Pick a division strategy from the dividend's length"""
+    if num1_digits <= DIGITS_MAX:
+        return "digits"
+    if num1_digits <= LIMBS_MAX:
+        return "limbs"
+    return "newton"
+
+
+def _check_divisor(num2: int) -> None:
+    if num2 == 0:
+        raise ValueError("Cannot divide by zero")
+
+
+def divide_digits(num1: str, num2: int, record: Recorder = None) -> Tuple[int, int]:
+    """Long division, one digit of the dividend per step; returns (quotient, remainder)"""
+    return run_steps(iter_divide_digits(num1, num2), record)
+
+
+def iter_divide_digits(num1: str, num2: int) -> Iterator[Tuple[int, tuple]]:
+    """divide_digits, yielding each (kind, args) step as it is worked out"""
+    quotient = []
+    remainder = 0
+    for digit in num1:
+        digit = int(digit)
+        current = remainder * 10 + digit
+        quotient_digit, remainder = divmod(current, num2)
+        quotient.append(str(quotient_digit))
+        yield DIV_DIGIT, (digit, current, num2, quotient_digit, remainder)
+    return from_digits(''.join(quotient)), remainder
+
+
+def divide_limbs(num1: str, num2: int, record: Recorder = None,
+                 limb_digits: int = LIMB_DIGITS) -> Tuple[int, int]:
+    """Long division bringing down `limb_digits` digits per step; returns (quotient, remainder)"""
+    return run_steps(iter_divide_limbs(num1, num2, limb_digits), record)
+
+
+def iter_divide_limbs(num1: str, num2: int,
+                      limb_digits: int = LIMB_DIGITS) -> Iterator[Tuple[int, tuple]]:
+    """divide_limbs, yielding each (kind, args) step as it is worked out"""
+    base = 10 ** limb_digits
+    first = len(num1) % limb_digits or limb_digits  # The leading limb may be shorter
+    quotient: List[str] = []
+    remainder = 0
+    start = 0
+    for end in range(first, len(num1) + 1, limb_digits):
+        limb = int(num1[start:end])
+        current = remainder * base + limb
+        quotient_limb, remainder = divmod(current, num2)
+        quotient.append(str(quotient_limb) if start == 0 else f"{quotient_limb:0{limb_digits}d}")
+        yield DIV_LIMB, (limb, current, num2, quotient_limb, remainder, limb_digits)
+        start = end
+    return from_digits(''.join(quotient)), remainder
+
+
+def _digits(bits: int) -> int:
+    """About how many decimal digits `bits` bits are worth"""
+    return max(int(bits * _DIGITS_PER_BIT), 1)
+
+
+def _iter_reciprocal(divisor: int, shift: int) -> Iterator[Tuple[int, tuple]]:
+    """
+    About 2**shift / divisor (off by a few units at most). Half as many
+    bits are worked out first, for the divisor's leading bits only, and
+    one Newton step doubles them: x + x·(1 - divisor·x).
+    """
+    size = divisor.bit_length()
+    bits = shift - size + 1  # How long the reciprocal is
+    if bits <= NEWTON_LEAF_BITS:
+        yield DIV_RECIPROCAL, (_digits(bits),)
+        return (1 << shift) // divisor
+
+    half = bits // 2 + NEWTON_GUARD_BITS
+    cut = max(size - half - NEWTON_GUARD_BITS, 0)  # Trailing divisor bits too small to matter yet
+    top = divisor >> cut
+    half_shift = top.bit_length() + half - 1
+    estimate = yield from _iter_reciprocal(top, half_shift)
+    estimate <<= bits - half
+
+    error = (1 << shift) - divisor * estimate
+    reciprocal = estimate + ((estimate * error) >> shift)
+    yield DIV_NEWTON, (_digits(bits),)
+    return reciprocal
+
+
+def divide_newton(num1: int, num2: int, record: Recorder = None) -> Tuple[int, int]:
+    """
+    Division by multiplying with the divisor's reciprocal. The quotient
+    that gives can be off by a little, so it is corrected with the
+    remainder; returns (quotient, remainder).
+    """
+    return run_steps(iter_divide_newton(num1, num2), record)
+
+
+def iter_divide_newton(num1: int, num2: int) -> Iterator[Tuple[int, tuple]]:
+    """divide_newton, yielding each (kind, args) step as it is worked out"""
+    quotient_bits = num1.bit_length() - num2.bit_length() + 1
+    if quotient_bits <= 0:
+        estimate = 0
+    else:
+        # The quotient only depends on the leading bits of both numbers
+        cut = max(num2.bit_length() - quotient_bits - NEWTON_GUARD_BITS, 0)
+        top, dividend = num2 >> cut, num1 >> cut
+        shift = dividend.bit_length() + NEWTON_GUARD_BITS
+        reciprocal = yield from _iter_reciprocal(top, shift)
+        estimate = (dividend * reciprocal) >> shift
+    yield DIV_ESTIMATE, (estimate,)
+
+    quotient = estimate
+    remainder = num1 - quotient * num2
+    while remainder < 0:
+        quotient -= 1
+        remainder += num2
+    while remainder >= num2:
+        quotient += 1
+        remainder -= num2
+    if quotient != estimate:
+        yield DIV_CORRECT, (quotient - estimate, quotient)
+    return quotient, remainder
+
+
+def divmod_fast(num1: int, num2: int) -> Tuple[int, int]:
+    """divmod without any steps, with Newton's method for long quotients of long divisors"""
+    _check_divisor(num2)
+    if min(num1.bit_length() - num2.bit_length(), num2.bit_length()) <= NATIVE_MAX_BITS:
+        return divmod(num1, num2)
+    return run_steps(iter_divide_newton(num1, num2))
+
+
+def quotient(num1: int, num2: int) -> int:
+    """num1 // num2, for problems solved without any steps"""
+    return divmod_fast(num1, num2)[0]
+
+
+def remainder(num1: int, num2: int) -> int:
+    """num1 % num2, for problems solved without any steps"""
+    return divmod_fast(num1, num2)[1]
+
+
+STRATEGIES: Dict[str, Callable[..., Iterator[Tuple[int, tuple]]]] = {
+    "digits": iter_divide_digits,
+    "limbs": iter_divide_limbs,
+    "newton": iter_divide_newton,
+}
+
+
+def divide(num1: int, num2: int, strategy: str = "auto", record: Recorder = None) -> Tuple[int, int]:
+    """Divide two non-negative numbers with the chosen (or automatic) strategy: (quotient, remainder)"""
+    if strategy == "native" and record is None:
+        return divmod_fast(num1, num2)
+    return run_steps(iter_divide(num1, num2, strategy), record)
+
+
+def iter_divide(num1: int, num2: int, strategy: str = "auto") -> Iterator[Tuple[int, tuple]]:
+    """divide, yielding each (kind, args) step as it is worked out"""
+    _check_divisor(num2)
+    num1_digits = digit_count(num1)  # Long numbers are slow to write out: only count their digits
+    if strategy == "auto":
+        strategy = choose_strategy(num1_digits)
+    elif strategy != "native" and strategy not in STRATEGIES:
+        raise ValueError(f"Unknown division strategy '{strategy}'")
+
+    if strategy != "digits":
+        yield DIV_STRATEGY, (num1_digits, digit_count(num2), strategy)
+    if strategy == "native":
+        quotient, remainder = divmod_fast(num1, num2)
+    elif strategy == "newton":
+        quotient, remainder = yield from iter_divide_newton(num1, num2)
+    else:
+        quotient, remainder = yield from STRATEGIES[strategy](to_digits(num1), num2)
+    yield DIV_RESULT, (quotient, remainder)
+    return quotient, remainder
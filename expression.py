@@ -0,0 +1,132 @@
+"""
+Expression Engine
+Solves chained expressions like "123*45+678-9", "(12+3)*4" or "100/7%3"
+with the usual rules: brackets first, then multiplication, division and
+remainders, then addition and subtraction, each from left to right.
+
+An expression is compiled into a plan: a list of single operations, each
+working on two numbered slots (the numbers of the expression come first,
+then the result of every operation in turn). A plan only depends on the
+expression's shape - where the numbers, operators and brackets are - not
+on the numbers themselves, so plans are cached by shape: "12*3+4" and
+"98*76+54" share one plan, and only the first of them is parsed.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Callable, Iterator, List, NamedTuple, Tuple
+
+from scratchpad import EXPR_NODE, EXPR_VALUE
+
+OPERATORS = "+-*/%"
+PRECEDENCE = {"+": 1, "-": 1, "*": 2, "/": 2, "%": 2}
+PLAN_CACHE_SIZE = 4096
+
+_NUMBER = re.compile(r"\d+", re.ASCII)
+
+
+class Plan(NamedTuple):
+    """A compiled expression shape"""
+    shape: str                               # e.g. "#*#+#-#"
+    numbers: int                             # How many numbers go in
+    steps: Tuple[Tuple[str, int, int], ...]  # (operator, left slot, right slot)
+
+    @property
+    def result(self) -> int:
+        """The slot that holds the answer"""
+        return self.numbers + len(self.steps) - 1 if self.steps else 0
+
+
+def is_expression(problem: Any) -> bool:
+    """True for problems with brackets or more than one operator"""
+    if not isinstance(problem, str):
+        return False
+    return "(" in problem or ")" in problem or sum(map(problem.count, OPERATORS)) > 1
+
+
+def shape_of(expression: str) -> Tuple[str, List[str]]:
+    """Split an expression into its shape and its numbers (as digit strings)"""
+    numbers = _NUMBER.findall(expression)
+    shape = "".join(_NUMBER.sub("#", expression).split())
+    return shape, numbers
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def compile_shape(shape: str) -> Plan:
+    """Turn a shape like "(#+#)*#" into a plan (shunting-yard, no recursion)"""
+    numbers = shape.count("#")
+    steps: List[Tuple[str, int, int]] = []
+    slots: List[int] = []      # Slots waiting to be used
+    operators: List[str] = []  # Operators and open brackets waiting to be applied
+    next_number = 0
+    expect_number = True
+
+    def apply(operator: str) -> None:
+        right = slots.pop()
+        left = slots.pop()
+        steps.append((operator, left, right))
+        slots.append(numbers + len(steps) - 1)
+
+    for char in shape:
+        if char == "#" or char == "(":
+            if not expect_number:
+                raise ValueError("Invalid expression - missing operator")
+            if char == "#":
+                slots.append(next_number)
+                next_number += 1
+                expect_number = False
+            else:
+                operators.append(char)
+        elif char == ")":
+            if expect_number:
+                raise ValueError("Invalid expression - missing number")
+            while operators and operators[-1] != "(":
+                apply(operators.pop())
+            if not operators:
+                raise ValueError("Invalid expression - unbalanced brackets")
+            operators.pop()
+        elif char in PRECEDENCE:
+            if expect_number:
+                raise ValueError("Invalid expression - missing number")
+            while operators and operators[-1] != "(" and PRECEDENCE[operators[-1]] >= PRECEDENCE[char]:
+                apply(operators.pop())
+            operators.append(char)
+            expect_number = True
+        else:
+            raise ValueError(f"Invalid expression - unexpected '{char}'")
+
+    if expect_number:
+        raise ValueError("Invalid expression - missing number")
+    while operators:
+        operator = operators.pop()
+        if operator == "(":
+            raise ValueError("Invalid expression - unbalanced brackets")
+        apply(operator)
+    return Plan(shape, numbers, tuple(steps))
+
+
+def compile_expression(expression: str) -> Tuple[Plan, List[str]]:
+    """The (cached) plan for an expression, plus its numbers"""
+    shape, numbers = shape_of(expression)
+    return compile_shape(shape), numbers
+
+
+def iter_evaluate(plan: Plan, numbers: List[Any],
+                  operate: Callable[[str, Any, Any], Iterator[Tuple[int, tuple]]]
+                  ) -> Iterator[Tuple[int, tuple]]:
+    """
+    Work through a plan one operation at a time. operate(operator, left,
+    right) is a step generator that returns the operation's answer, like
+    ai_agent.iter_operation; its steps are passed on between an EXPR_NODE
+    step (what is worked out next) and an EXPR_VALUE step (what it came to).
+    Returns the answer to the whole expression.
+    """
+    values = list(numbers)
+    for operator, left, right in plan.steps:
+        a, b = values[left], values[right]
+        yield EXPR_NODE, (a, operator, b)
+        value = yield from operate(operator, a, b)
+        yield EXPR_VALUE, (a, operator, b, value)
+        values.append(value)
+    return values[plan.result]
+
@@ -0,0 +1,203 @@
+"""
+Geometry Shapes
+Every shape MathProblemSolver knows, with the formula for its area, length
+or volume. Formulas are plain arithmetic, so the same definition works on
+one number (solve_geometry) and on whole NumPy columns (solve_geometry_many,
+for millions of shapes from a CAD export at once).
+
+Teach the solver a new shape with register_shape:
+
+    register_shape(Shape("kite_area", ("p", "q"), lambda p, q: 0.5 * p * q,
+                         "Calculating kite area", "Area = ½ × p × q = ½ × {p} × {q}"))
+"""
+
+import math
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import numpy as np  # Optional: only needed for whole columns of shapes
+except ImportError:
+    np = None
+
+
+def _join(names: Sequence[str]) -> str:
+    """["a"] -> "a", ["a", "b", "c"] -> "a, b and c" """
+    return names[0] if len(names) == 1 else ", ".join(names[:-1]) + " and " + names[-1]
+
+
+class Shape(NamedTuple):
+    """One kind of geometry problem, like "triangle_area" """
+    name: str
+    params: Tuple[str, ...]      # The values it needs, like ("base", "height")
+    formula: Callable[..., Any]  # Takes the values in params order; numbers or arrays
+    description: str             # Step title, like "Calculating triangle area"
+    work: str                    # The formula as the step shows it, with {base} etc. filled in
+    positive: bool = True        # Values must be more than 0 (not just numbers)
+    polygon: bool = False        # Values are lists of corner coordinates
+    formula_many: Optional[Callable[..., Any]] = None  # For arrays, if formula can't do them
+
+    @property
+    def label(self) -> str:
+        """"Triangle area" for "Calculating triangle area" """
+        return self.description.replace("Calculating ", "", 1).capitalize()
+
+    @property
+    def rule(self) -> str:
+        """The formula without the numbers: "Area = ½ × base × height" """
+        return " = ".join(self.work.split(" = ")[:2])
+
+    def check(self, values: Dict[str, Any]) -> Optional[str]:
+        """The error message for values this shape can't use, or None if they're fine"""
+        quoted = [f"'{name}'" for name in self.params]
+        if not all(name in values for name in self.params):
+            needs = f"a {quoted[0]} value" if len(quoted) == 1 else (
+                f"both {quoted[0]} and {quoted[1]} values" if len(quoted) == 2 else f"{_join(quoted)} values")
+            return f"Error: {self.label} calculation requires {needs}"
+        names = _join(list(self.params)).capitalize()
+        if self.polygon:
+            columns = [values[name] for name in self.params]
+            if not all(isinstance(column, (list, tuple)) for column in columns) or not all(
+                    isinstance(v, (int, float)) for column in columns for v in column):
+                return f"Error: {names} must be lists of numbers"
+            if len(set(map(len, columns))) != 1 or len(columns[0]) < 3:
+                return f"Error: {names} must have the same number of corners, at least 3"
+            return None
+        if not all(isinstance(values[name], (int, float)) for name in self.params):
+            return f"Error: {names} must be {'a number' if len(self.params) == 1 else 'numbers'}"
+        if self.positive and any(values[name] <= 0 for name in self.params):
+            return f"Error: {names} must be {'a positive number' if len(self.params) == 1 else 'positive numbers'}"
+        return None
+
+    def show(self, values: Dict[str, Any]) -> str:
+        """The work column of the step: the formula with the values put in"""
+        if self.polygon:
+            return self.work.format(corners=len(values[self.params[0]]))
+        return self.work.format(**{name: values[name] for name in self.params})
+
+
+# Every shape, by name, in the order they were registered
+SHAPES: Dict[str, Shape] = {}
+
+
+def register_shape(shape: Shape) -> Shape:
+    """Adds a shape (or replaces the one with the same name)"""
+    SHAPES[shape.name] = shape
+    return shape
+
+
+def _shoelace(x: Sequence[float], y: Sequence[float]) -> float:
+    """Area of a polygon from its corners, in order (the shoelace formula)"""
+    # Measure from the first corner: far-off coordinates don't lose precision
+    x0, y0 = x[0], y[0]
+    x = [v - x0 for v in x]
+    y = [v - y0 for v in y]
+    twice_area = 0.0
+    for i in range(len(x)):
+        j = (i + 1) % len(x)
+        twice_area += x[i] * y[j] - x[j] * y[i]
+    return abs(twice_area) / 2
+
+
+def _shoelace_many(x: Any, y: Any, offsets: Any) -> Any:
+    """
+    Areas of many polygons whose corners are stored one after another:
+    polygon i has corners offsets[i] up to (not including) offsets[i + 1].
+    """
+    starts, counts = offsets[:-1], np.diff(offsets)
+    filled = counts > 0
+    # Each corner with the next one, the last corner going back to the first
+    following = np.arange(1, len(x) + 1)
+    following[offsets[1:][filled] - 1] = starts[filled]
+    x = x - np.repeat(x[starts[filled]], counts[filled])
+    y = y - np.repeat(y[starts[filled]], counts[filled])
+    cross = x * y[following] - x[following] * y
+    twice_area = np.zeros(len(counts))
+    if filled.any():
+        twice_area[filled] = np.add.reduceat(cross, starts[filled])
+    return np.abs(twice_area) / 2
+
+
+for _shape in (
+    Shape("triangle_area", ("base", "height"), lambda base, height: 0.5 * base * height,
+          "Calculating triangle area", "Area = ½ × base × height = ½ × {base} × {height}"),
+    Shape("circle_area", ("radius",), lambda radius: math.pi * radius**2,
+          "Calculating circle area", "Area = πr² = π × {radius}²"),
+    Shape("rectangle_area", ("width", "height"), lambda width, height: width * height,
+          "Calculating rectangle area", "Area = width × height = {width} × {height}"),
+    Shape("parallelogram_area", ("base", "height"), lambda base, height: base * height,
+          "Calculating parallelogram area", "Area = base × height = {base} × {height}"),
+    Shape("trapezoid_area", ("a", "b", "height"), lambda a, b, height: 0.5 * (a + b) * height,
+          "Calculating trapezoid area", "Area = ½ × (a + b) × height = ½ × ({a} + {b}) × {height}"),
+    Shape("ellipse_area", ("a", "b"), lambda a, b: math.pi * a * b,
+          "Calculating ellipse area", "Area = πab = π × {a} × {b}"),
+    Shape("polygon_area", ("x", "y"), _shoelace,
+          "Calculating polygon area", "Area = ½ × |Σ(xᵢyᵢ₊₁ - xᵢ₊₁yᵢ)| = shoelace formula over {corners} corners",
+          positive=False, polygon=True, formula_many=_shoelace_many),
+    Shape("circle_circumference", ("radius",), lambda radius: 2 * math.pi * radius,
+          "Calculating circle circumference", "Circumference = 2πr = 2π × {radius}"),
+    Shape("rectangle_perimeter", ("width", "height"), lambda width, height: 2 * (width + height),
+          "Calculating rectangle perimeter", "Perimeter = 2 × (width + height) = 2 × ({width} + {height})"),
+    Shape("box_volume", ("length", "width", "height"), lambda length, width, height: length * width * height,
+          "Calculating box volume", "Volume = length × width × height = {length} × {width} × {height}"),
+    Shape("cylinder_volume", ("radius", "height"), lambda radius, height: math.pi * radius**2 * height,
+          "Calculating cylinder volume", "Volume = πr²h = π × {radius}² × {height}"),
+    Shape("cone_volume", ("radius", "height"), lambda radius, height: math.pi * radius**2 * height / 3,
+          "Calculating cone volume", "Volume = ⅓πr²h = ⅓ × π × {radius}² × {height}"),
+    Shape("sphere_volume", ("radius",), lambda radius: 4 / 3 * math.pi * radius**3,
+          "Calculating sphere volume", "Volume = ⁴⁄₃πr³ = ⁴⁄₃ × π × {radius}³"),
+    Shape("sphere_surface_area", ("radius",), lambda radius: 4 * math.pi * radius**2,
+          "Calculating sphere surface area", "Area = 4πr² = 4π × {radius}²"),
+):
+    register_shape(_shape)
+
+
+def polygon_columns(x: Any, y: Any, offsets: Any = None) -> Dict[str, Any]:
+    """
+    Corner coordinates of many polygons as three flat arrays. Takes either
+    flat x and y arrays with offsets (polygon i is offsets[i]:offsets[i + 1]),
+    or one list of x values and one list of y values per polygon.
+    """
+    if offsets is None:
+        counts = [len(corners) for corners in x]
+        if counts != [len(corners) for corners in y]:
+            raise ValueError("x and y must have the same number of corners for every polygon")
+        offsets = np.concatenate(([0], np.cumsum(counts, dtype=np.int64)))
+        x = np.concatenate([np.asarray(corners, dtype=float) for corners in x]) if counts else np.zeros(0)
+        y = np.concatenate([np.asarray(corners, dtype=float) for corners in y]) if counts else np.zeros(0)
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if x.shape != y.shape or x.ndim != 1 or offsets[0] != 0 or offsets[-1] != len(x) or (np.diff(offsets) < 0).any():
+        raise ValueError("x and y must be flat arrays of the same length, split up by offsets")
+    return {"x": x, "y": y, "offsets": offsets}
+
+
+def evaluate_many(shape: Shape, columns: Dict[str, Any]) -> Tuple[Dict[str, Any], Any, Any, Any]:
+    """
+    Works out a shape for whole columns of values. Gives back the columns
+    (as float arrays), the results, and masks of the rows that aren't
+    numbers and the rows with sizes that aren't positive (polygons: fewer
+    than 3 corners). Those rows get NaN results.
+    """
+    if not all(name in columns for name in shape.params):
+        raise ValueError(shape.check({})[len("Error: "):])
+    if shape.polygon:
+        columns = polygon_columns(columns["x"], columns["y"], columns.get("offsets"))
+        finite = np.isfinite(columns["x"]) & np.isfinite(columns["y"])
+        counts = np.diff(columns["offsets"])
+        not_numbers = np.zeros(len(counts), bool)
+        bad_corners = np.flatnonzero(~finite)
+        not_numbers[np.searchsorted(columns["offsets"], bad_corners, "right") - 1] = True
+        not_positive = (counts < 3) & ~not_numbers
+        with np.errstate(invalid="ignore"):
+            result = shape.formula_many(columns["x"], columns["y"], columns["offsets"])
+    else:
+        arrays = np.broadcast_arrays(*[np.asarray(columns[name], dtype=float) for name in shape.params])
+        columns = dict(zip(shape.params, arrays))
+        not_numbers = ~np.logical_and.reduce([np.isfinite(array) for array in arrays])
+        not_positive = np.zeros(not_numbers.shape, bool)
+        if shape.positive:
+            not_positive = np.logical_or.reduce([array <= 0 for array in arrays]) & ~not_numbers
+        with np.errstate(invalid="ignore", over="ignore"):
+            result = (shape.formula_many or shape.formula)(*arrays)
+    result = np.where(not_numbers | not_positive, np.nan, result)
+    return columns, result, not_numbers, not_positive
@@ -0,0 +1,97 @@
+"""
+Instrumentation
+Opt-in timers and counters for the solvers. Hand a Metrics object to
+AIAgent(metrics=...) or MathProblemSolver(metrics=...) to see where the
+time goes (parsing, solving, formatting the trace) and how much work was
+done (digits, carries, steps, trace bytes). Without one, the solvers skip
+all of this and pay only an `is None` check. One Metrics can be shared by
+solvers in many threads.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Called as callback(event, name, value) where event is "phase" (value is
+# seconds spent) or "count" (value is the amount added)
+MetricsCallback = Callable[[str, str, float], None]
+
+
+class Metrics:
+    """Per-phase timers and named counters, with optional live callback"""
+
+    def __init__(self, callback: Optional[MetricsCallback] = None):
+        self.callback = callback
+        self.phase_seconds: Dict[str, float] = defaultdict(float)
+        self.phase_calls: Dict[str, int] = defaultdict(int)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()  # `+=` on a dictionary entry isn't atomic
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        """Add time spent in one phase"""
+        with self._lock:
+            self.phase_seconds[phase] += seconds
+            self.phase_calls[phase] += 1
+        if self.callback is not None:
+            self.callback("phase", phase, seconds)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time a block of code: `with metrics.phase("parse"): ...`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """Add to a counter"""
+        with self._lock:
+            self.counters[name] += amount
+        if self.callback is not None:
+            self.callback("count", name, amount)
+
+    def reset(self) -> None:
+        """Start counting from zero again"""
+        with self._lock:
+            self.phase_seconds.clear()
+            self.phase_calls.clear()
+            self.counters.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """A plain-dictionary copy of everything measured so far"""
+        with self._lock:
+            return {
+                "phases": {
+                    phase: {"seconds": seconds, "calls": self.phase_calls[phase]}
+                    for phase, seconds in self.phase_seconds.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def to_prometheus(self, prefix: str = "showwork") -> str:
+        """Everything measured so far, in Prometheus text exposition format"""
+        with self._lock:
+            phase_seconds = sorted(self.phase_seconds.items())
+            phase_calls = sorted(self.phase_calls.items())
+            counters = sorted(self.counters.items())
+        lines = [
+            f"# HELP {prefix}_phase_seconds_total Time spent in each solver phase.",
+            f"# TYPE {prefix}_phase_seconds_total counter",
+        ]
+        for phase, seconds in phase_seconds:
+            lines.append(f'{prefix}_phase_seconds_total{{phase="{phase}"}} {seconds!r}')
+        lines += [
+            f"# HELP {prefix}_phase_calls_total Times each solver phase ran.",
+            f"# TYPE {prefix}_phase_calls_total counter",
+        ]
+        for phase, calls in phase_calls:
+            lines.append(f'{prefix}_phase_calls_total{{phase="{phase}"}} {calls}')
+        for name, value in counters:
+            lines += [
+                f"# TYPE {prefix}_{name}_total counter",
+                f"{prefix}_{name}_total {value}",
+            ]
+        return "\n".join(lines) + "\n"
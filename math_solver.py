@@ -6,232 +6,901 @@ It not only gives you the answer but also shows you how it got there, step by st
 
 # Import the tools we need
 import math  # For mathematical operations like square root
-from typing import List, Dict, Any, Union  # These help us organize our code better
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Tuple, Union  # These help us organize our code better
 import re  # This helps us work with equations written as text
+import sys  # To see how much memory the steps take
+import threading  # So one cache can be shared by many threads
+from array import array  # Compact lists of plain numbers
+from collections import OrderedDict  # Remembers the order things were used in
+
+try:
+    import numpy as np  # Optional: lets us solve whole arrays of equations at once
+except ImportError:
+    np = None
+
+from geometry import SHAPES, Shape, evaluate_many  # Shape formulas, for one shape or whole columns
+from renderers import get_renderer  # Writing the steps out as text, JSON, Markdown or LaTeX
+from scratchpad import MEMORY_BUDGET, SolveResult, SpilledBlocks  # Batch answers; steps kept within a memory budget
+
+# Patterns for reading equations, compiled once and reused for every equation
+# A linear term like "2x", "-x" or "+7", or the equals sign
+_LINEAR_TERM = re.compile(r'=|(?P<sign>[+-]?)(?P<digits>\d*)(?P<x>x?)')
+# A quadratic term like "3x^2", "-5x" or "+6"
+_QUADRATIC_TERM = re.compile(r'(?P<sign>[+-]?)(?:(?P<digits>\d*)(?P<power>x\^2|x)|(?P<number>\d+))')
+
+
+def _coefficient(sign: str, digits: str) -> str:
+    """The number in front of x: "" -> "1", "-" -> "-1", "-3" -> "-3" """
+    return ("-" if sign == "-" else "") + (digits or "1")
+
+
+def _run(steps: Iterator[Any]) -> Any:
+    """Run a step generator to the end and give back what it returns"""
+    while True:
+        try:
+            next(steps)
+        except StopIteration as done:
+            return done.value
+
+
+def _remember(steps: Iterator[Any], seen: List[Any]) -> Iterator[Any]:
+    """Pass the steps of a generator on, keeping a copy of each in `seen`"""
+    while True:
+        try:
+            step = next(steps)
+        except StopIteration as done:
+            return done.value
+        seen.append(step)
+        yield step
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("Solving arrays of equations needs NumPy: pip install numpy")
+
+
+class QuadraticBatch(NamedTuple):
+    """The answers to a whole array of quadratic equations"""
+    a: Any
+    b: Any
+    c: Any
+    discriminant: Any
+    x1: Any             # (-b + √discriminant) / (2a), NaN if there is none
+    x2: Any             # (-b - √discriminant) / (2a), NaN if there is none
+    no_real_roots: Any  # True where the discriminant is negative
+    not_quadratic: Any  # True where a is 0
+
+    def summary(self, row: int) -> str:
+        """A one-line description of how one row was solved"""
+        a, b, c, d = self.a[row], self.b[row], self.c[row], self.discriminant[row]
+        if self.not_quadratic[row]:
+            return f"a={a}, b={b}, c={c}: not a quadratic equation (a is 0)"
+        if self.no_real_roots[row]:
+            return f"a={a}, b={b}, c={c}: discriminant {d} < 0, no real solutions"
+        return f"a={a}, b={b}, c={c}: discriminant {d}, x₁ = {self.x1[row]}, x₂ = {self.x2[row]}"
+
+
+class LinearBatch(NamedTuple):
+    """The answers to a whole array of equations coef·x = const"""
+    coef: Any
+    const: Any
+    x: Any                   # const / coef, NaN where coef is 0
+    infinite_solutions: Any  # True where 0·x = 0
+    no_solution: Any         # True where 0·x = something else
+
+    def summary(self, row: int) -> str:
+        """A one-line description of how one row was solved"""
+        coef, const = self.coef[row], self.const[row]
+        if self.infinite_solutions[row]:
+            return f"{coef}x = {const}: infinite solutions"
+        if self.no_solution[row]:
+            return f"{coef}x = {const}: no solution"
+        return f"{coef}x = {const}: x = {self.x[row]}"
+
+
+class GeometryBatch(NamedTuple):
+    """The answers to a whole column of one kind of shape"""
+    shape: Shape
+    values: Dict[str, Any]  # The input columns as float arrays (polygons: x, y and offsets)
+    result: Any             # Area, length or volume; NaN where the row isn't valid
+    not_numbers: Any        # True where a value is NaN or infinite
+    not_positive: Any       # True where a size is 0 or less (polygons: fewer than 3 corners)
+
+    def summary(self, row: int) -> str:
+        """A one-line description of how one row was worked out"""
+        if self.shape.polygon:
+            start, end = self.values["offsets"][row], self.values["offsets"][row + 1]
+            values = {"x": list(self.values["x"][start:end])}
+        else:
+            values = {name: self.values[name][row] for name in self.shape.params}
+        work = self.shape.show(values)
+        if self.not_numbers[row]:
+            return f"{work}: not all values are numbers"
+        if self.not_positive[row]:
+            return f"{work}: {'fewer than 3 corners' if self.shape.polygon else 'sizes must be positive'}"
+        return f"{work} = {self.result[row]}"
+
+
+class EquationCache:
+    """
+    Remembers the answers (and steps) of equations we've already solved.
+    When it gets full, the equation that was used longest ago is forgotten.
+    Safe to share between threads: only the lookups take a lock.
+    """
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0    # How many times we already knew the answer
+        self.misses = 0  # How many times we had to work it out
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        """Gives back what we stored for this equation, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, value: Any) -> None:
+        """Stores an answer, forgetting the oldest one if we're full"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """How well the cache is doing"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+class StepLog:
+    """
+    The steps we've written down. It works like a list of
+    {"description", "work", "result"} dictionaries, but stores them much
+    more compactly: each different description is kept only once, and a
+    step just remembers its number in an array of small integers.
+    The dictionaries are made when you look at a step.
+    """
+    def __init__(self):
+        self.descriptions: List[str] = []  # Every description used so far, once
+        self._description_ids: Dict[str, int] = {}
+        self._ids = array("I")  # Which description each step has
+        self._work: List[str] = []
+        self._results: List[str] = []
+
+    def add(self, description: str, work: str = "", result: str = "") -> None:
+        """Writes down one step"""
+        number = self._description_ids.get(description)
+        if number is None:
+            number = self._description_ids[description] = len(self.descriptions)
+            self.descriptions.append(description)
+        self._ids.append(number)
+        self._work.append(work)
+        self._results.append(result)
+
+    def append(self, step: Dict[str, str]) -> None:
+        self.add(step["description"], step["work"], step["result"])
+
+    def clear(self) -> None:
+        """Throws the steps away (the descriptions are kept for next time)"""
+        del self._ids[:]
+        self._work.clear()
+        self._results.clear()
+
+    def _step(self, index: int) -> Dict[str, str]:
+        return {
+            "description": self.descriptions[self._ids[index]],  # What we're doing
+            "work": self._work[index],                          # How we're doing it
+            "result": self._results[index],                     # What we got
+        }
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        for index in range(len(self)):
+            yield self._step(index)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._step(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("step index out of range")
+        return self._step(index)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (StepLog, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"StepLog({len(self)} steps, {len(self.descriptions)} descriptions)"
+
+    def notes(self) -> "Notes":
+        """The same steps as one line of text each"""
+        return Notes(self)
+
+    def to_columns(self) -> Dict[str, Any]:
+        """
+        The steps as columns, for looking at lots of them at once:
+        description_id (an array, numbers into descriptions), descriptions,
+        work and result
+        """
+        return {
+            "description_id": array("I", self._ids),
+            "descriptions": list(self.descriptions),
+            "work": list(self._work),
+            "result": list(self._results),
+        }
+
+
+class BoundedStepLog(StepLog):
+    """
+    A StepLog that keeps to a memory budget, for solvers that keep
+    solving for a long time. Steps are kept in blocks of `block_steps`;
+    as many of the newest as the budget allows stay in memory (the first
+    one too, while there is room), and older blocks go to a temporary file
+    (see scratchpad.SpilledBlocks). Reading the steps works just the same.
+    """
+    def __init__(self, memory_budget: int = MEMORY_BUDGET, block_steps: int = 4096, directory: Any = None):
+        super().__init__()
+        self.block_steps = block_steps
+        self.blocks = SpilledBlocks(memory_budget, directory)
+
+    def add(self, description: str, work: str = "", result: str = "") -> None:
+        if len(self._ids) >= self.block_steps:
+            # The steps so far become a full block; start a new one
+            block = (self._ids, self._work, self._results)
+            self._ids, self._work, self._results = array("I"), [], []
+            self.blocks.add(block, _block_bytes(block))
+        super().add(description, work, result)
+
+    def clear(self) -> None:
+        super().clear()
+        self.blocks.clear()
+
+    def _step(self, index: int) -> Dict[str, str]:
+        number, index = divmod(index, self.block_steps)
+        ids, work, results = (self._ids, self._work, self._results) if number == len(self.blocks) else self.blocks[number]
+        return {"description": self.descriptions[ids[index]], "work": work[index], "result": results[index]}
+
+    def __len__(self) -> int:
+        return len(self.blocks) * self.block_steps + len(self._ids)
+
+    def __repr__(self) -> str:
+        return f"BoundedStepLog({len(self)} steps, {self.blocks.spilled} blocks on disk)"
+
+    def to_columns(self) -> Dict[str, Any]:
+        columns = {"description_id": array("I"), "descriptions": list(self.descriptions), "work": [], "result": []}
+        for number in range(len(self.blocks) + 1):
+            ids, work, results = (self._ids, self._work, self._results) if number == len(self.blocks) else self.blocks[number]
+            columns["description_id"].extend(ids)
+            columns["work"].extend(work)
+            columns["result"].extend(results)
+        return columns
+
+
+def _block_bytes(block: Tuple[array, List[str], List[str]]) -> int:
+    """About how much memory a block of steps takes"""
+    ids, work, results = block
+    return (ids.itemsize * len(ids) + sys.getsizeof(work) + sys.getsizeof(results)
+            + sum(map(sys.getsizeof, work)) + sum(map(sys.getsizeof, results)))
+
+
+class Notes:
+    """
+    The scratchpad: every step of a StepLog as one line like
+    "Solving for x: 2.0x = 4.0 => x = 2.0", written out only when read
+    """
+    def __init__(self, log: StepLog):
+        self._log = log
+
+    @staticmethod
+    def _note(step: Dict[str, str]) -> str:
+        return f"{step['description']}: {step['work']} => {step['result']}"
+
+    def clear(self) -> None:
+        self._log.clear()
+
+    def __len__(self) -> int:
+        return len(self._log)
+
+    def __iter__(self) -> Iterator[str]:
+        for step in self._log:
+            yield self._note(step)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._note(step) for step in self._log[index]]
+        return self._note(self._log[index])
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (Notes, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"Notes({len(self)} lines)"
+
+
+# The solving itself: generators that hand over (description, work, result)
+# steps and return the answer. They keep nothing between calls, so any
+# number of threads can use them at once.
+
+def iter_equation(equation: str, cached: Any = None) -> Iterator[Tuple[str, str, str]]:
+    """
+    The steps of solving an equation like 2x + 3 = 7; the answer is what the
+    generator returns. cached(kind, equation, solve) can look the cleaned-up
+    equation up first (MathProblemSolver passes its caches in this way).
+    """
+    if not isinstance(equation, str):
+        return "Error: Please provide the equation as a string"
+        
+    yield "[START] Solving equation", equation, ""
+    
+    # Clean up the equation by removing spaces
+    equation = equation.replace(" ", "")
+    if cached is None:
+        return (yield from _solve_linear(equation))
+    return (yield from cached("linear", equation, _solve_linear))
+
+
+def _solve_linear(equation: str) -> Iterator[Tuple[str, str, str]]:
+    """The work behind solve_equation, once the spaces are gone"""
+    yield "Making equation easier to read", f"Original: {equation}", ""
+
+    # Split into left and right sides of the equals sign
+    if "=" not in equation:
+        return "Error: Invalid equation format - missing equals sign (=)"
+    if equation.count("=") > 1:
+        return "Error: Invalid equation format - more than one equals sign (=)"
+
+    left, right = equation.split("=")
+    if not left or not right:
+        return "Error: Invalid equation format - empty side of equation"
+
+    yield "Breaking equation into two parts", f"Left: {left}, Right: {right}", ""
+
+    # Sort terms: put x terms on left, numbers on right
+    left_terms = []   # Will hold coefficients of x terms
+    right_terms = []  # Will hold regular numbers
+
+    # Read both sides in one go, term by term
+    on_right = False
+    for match in _LINEAR_TERM.finditer(equation):
+        term = match.group()
+        if term == "=":
+            on_right = True
+            continue
+        if not term:
+            continue
+        sign, digits, x = match.group("sign", "digits", "x")
+        if not digits and not x:
+            return f"Error: Invalid equation format - dangling sign '{term}'"
+        value = float(sign + (digits or "1"))
+        if x and not on_right:  # An x term on the left stays there
+            left_terms.append(value)
+            yield "Found an x term", f"Term: {term}", f"Coefficient: {_coefficient(sign, digits)}"
+        elif x:  # An x term on the right moves to the left
+            left_terms.append(-value)
+            yield "Moving x term to left side", term, f"Added {-value}x to left side"
+        elif not on_right:  # A number on the left moves to the right
+            right_terms.append(-value)
+            yield "Moving number to right side", term, f"Added {-value} to right side"
+        else:  # A number on the right stays there
+            right_terms.append(value)
+            yield "Found a number on right side", term, ""
+
+    # Add up all the x terms and all the numbers
+    x_coef = sum(left_terms)
+    num_sum = sum(right_terms)
+
+    yield ("Adding like terms",
+           f"x terms: {left_terms}, numbers: {right_terms}",
+           f"{x_coef}x = {num_sum}")
+
+    # Find x by dividing both sides by coefficient of x
+    if x_coef == 0:
+        if num_sum == 0:
+            return "This equation has infinite solutions!"
+        else:
+            return "This equation has no solution!"
+
+    solution = num_sum / x_coef
+    yield ("Solving for x",
+           f"{x_coef}x = {num_sum}",
+           f"x = {solution}")
+
+    return solution
+
+
+def iter_quadratic(equation: str, cached: Any = None) -> Iterator[Tuple[str, str, str]]:
+    """The steps of solving a quadratic equation like x² - 5x + 6 = 0, like iter_equation"""
+    if not isinstance(equation, str):
+        return "Error: Please provide the equation as a string"
+        
+    yield "[START] Solving quadratic equation", equation, ""
+    
+    # Clean up the equation
+    equation = equation.replace(" ", "").replace("²", "^2")
+    if cached is None:
+        return (yield from _solve_quadratic(equation))
+    return (yield from cached("quadratic", equation, _solve_quadratic))
+
+
+def _solve_quadratic(equation: str) -> Iterator[Tuple[str, str, str]]:
+    """The work behind solve_quadratic, once the equation is cleaned up"""
+    yield "Making equation easier to read", equation, ""
+
+    # Ensure equation is in standard form (= 0)
+    if not equation.endswith("=0"):
+        return "Error: Quadratic equation must be in standard form (ax² + bx + c = 0)"
+
+    # Find a, b, and c in ax² + bx + c = 0
+    equation = equation[:-2]  # Remove "=0"
+    a = b = c = 0
+    found = False
+    for match in _QUADRATIC_TERM.finditer(equation):
+        sign, digits, power, number = match.group("sign", "digits", "power", "number")
+        found = True
+        if power == "x^2":
+            a += float(_coefficient(sign, digits))
+        elif power == "x":
+            b += float(_coefficient(sign, digits))
+        else:
+            c += float(sign + number)
+
+    if not found:
+        return "Error: Invalid quadratic equation format"
+
+    if a == 0:
+        return "Error: This is not a quadratic equation (coefficient of x² is 0)"
+
+    yield ("Found the important numbers",
+           f"From: {equation}",
+           f"a={a}, b={b}, c={c}")
+
+    # Calculate b² - 4ac (called the discriminant)
+    discriminant = b**2 - 4*a*c
+    yield ("Calculating discriminant",
+           f"b² - 4ac = ({b})² - 4({a})({c})",
+           str(discriminant))
+
+    if discriminant < 0:
+        return "This equation has no real solutions (the answers would be imaginary numbers)"
+
+    # Use the quadratic formula to find both solutions
+    x1 = (-b + math.sqrt(discriminant)) / (2*a)
+    x2 = (-b - math.sqrt(discriminant)) / (2*a)
+
+    yield ("Using the quadratic formula",
+           f"x = (-({b}) ± √{discriminant}) / (2*{a})",
+           f"x₁ = {x1}, x₂ = {x2}")
+
+    return (x1, x2)
+
+
+def iter_geometry(problem_type: str, values: Dict[str, float]) -> Iterator[Tuple[str, str, str]]:
+    """The steps of a geometry problem (any shape in geometry.SHAPES), like iter_equation"""
+    if not isinstance(problem_type, str) or not isinstance(values, dict):
+        return "Error: Invalid input types"
+        
+    yield "[START] Solving geometry problem", f"Type: {problem_type}, Values: {values}", ""
+    
+    shape = SHAPES.get(problem_type)
+    if shape is None:
+        return f"Error: Unsupported geometry problem type '{problem_type}'. Supported types: {', '.join(SHAPES)}"
+    error = shape.check(values)
+    if error is not None:
+        return error
+
+    answer = shape.formula(*(values[name] for name in shape.params))
+    yield shape.description, shape.show(values), str(answer)
+    return answer
+
+
+# The kinds of problems solve, solve_many and iter_solve know about
+ITERATORS = {
+    "equation": iter_equation,
+    "quadratic": iter_quadratic,
+    "geometry": iter_geometry,
+}
+
+
+def problem_kind(problem: Any) -> Tuple[str, tuple]:
+    """Works out what kind of problem this is: ("equation", ("2x+3=7",)) and so on"""
+    if isinstance(problem, str):
+        kind = "quadratic" if ("x^2" in problem or "x²" in problem) else "equation"
+        return kind, (problem,)
+    kind, *args = problem
+    if kind not in ITERATORS:
+        raise ValueError(f"Unknown problem type '{kind}'")
+    return kind, tuple(args)
+
+
+def to_result(problem: Any, answer: Any, trace: Any = None) -> SolveResult:
+    """Turns an answer into a SolveResult, moving error messages to the error field"""
+    error = None
+    if isinstance(answer, str) and answer.startswith("Error"):
+        error, answer = answer, None
+    return SolveResult(problem, answer, error, trace)
+
+
+def _log(steps: Iterator[Tuple[str, str, str]], log: "StepLog") -> Iterator[Dict[str, str]]:
+    """Writes every step a solving generator hands over into log, and passes it on"""
+    while True:
+        try:
+            step = next(steps)
+        except StopIteration as done:
+            return done.value
+        log.add(*step)
+        yield log[-1]
+
+
+def solve(problem: Any) -> SolveResult:
+    """
+    Solves one problem (anything solve_batch takes) and gives back a
+    SolveResult whose trace is a new StepLog of the work
+    """
+    log = StepLog()
+    try:
+        kind, args = problem_kind(problem)
+        answer = _run(_log(ITERATORS[kind](*args), log))
+    except Exception as e:
+        answer = f"Error: {e}"
+    return to_result(problem, answer, log)
+
+
+def iter_solve(problem: Any) -> Iterator[Any]:
+    """Solves one problem, handing over each step dictionary as it comes, then a SolveResult"""
+    log = StepLog()
+    try:
+        kind, args = problem_kind(problem)
+        answer = yield from _log(ITERATORS[kind](*args), log)
+    except Exception as e:
+        answer = f"Error: {e}"
+    yield to_result(problem, answer)
+
+
+def solve_many(problems: Iterable[Any], trace: bool = False) -> List[SolveResult]:
+    """solve for a whole list of problems, with the steps as lines of text (Notes) if trace is on"""
+    results = []
+    for problem in problems:
+        result = solve(problem)
+        results.append(result._replace(trace=result.trace.notes() if trace else None))
+    return results
+
 
 class MathProblemSolver:
     """
     This is our main problem solver class. Think of it as a smart calculator
     that can solve different types of math problems and show its work!
     """
-    def __init__(self):
+    def __init__(self, cache_size: int = 1024, metrics: Any = None, result_cache: Any = None,
+                 memory_budget: Any = None):
         """
         Getting ready to solve problems:
         - scratchpad: where we write down our work
         - steps: detailed explanation of each step
+        - equation_cache: equations we've already solved (cache_size=0 turns it off)
+        - metrics: an optional instrumentation.Metrics that times our work
+        - result_cache: an optional result_cache.ResultCache, answers kept on
+          disk and shared with other solvers and processes
+        - memory_budget: bytes of steps to keep in memory; steps from solve_*
+          calls pile up in self.steps, so a long-running solver can set this
+          to move older ones to a temporary file (a BoundedStepLog), or call
+          reset() now and then
         """
-        self.scratchpad: List[str] = []  # Like scratch paper for calculations
+        self.equation_cache = EquationCache(cache_size) if cache_size > 0 else None
+        self.metrics = metrics
+        self.result_cache = result_cache
+        self.steps = StepLog() if memory_budget is None else BoundedStepLog(memory_budget)  # List of steps we take
+        self.scratchpad = self.steps.notes()  # Like scratch paper for calculations (one line per step)
         self.problem: str = ""  # The problem we're trying to solve
         self.solution: Any = None  # Where we'll store the final answer
-        self.steps: List[Dict[str, str]] = []  # List of steps we take
         
+    def reset(self) -> None:
+        """Forget every step, the problem and the answer (the caches are kept)"""
+        self.steps.clear()
+        self.problem = ""
+        self.solution = None
+
     def log_step(self, description: str, work: str = "", result: str = ""):
         """
         This is like writing down each step in your math homework
         so you can show how you got your answer!
         """
-        self.steps.append({
-            "description": description,  # What we're doing
-            "work": work,               # How we're doing it
-            "result": result           # What we got
-        })
-        self.scratchpad.append(f"{description}: {work} => {result}")
+        self._write(self.steps, description, work, result)
+
+    def _write(self, log: StepLog, description: str, work: str, result: str) -> None:
+        log.add(description, work, result)
+        if self.metrics is not None:
+            note = f"{description}: {work} => {result}"
+            self.metrics.count("steps_logged")
+            self.metrics.count("trace_bytes", len(note.encode("utf-8")))
 
     def solve_equation(self, equation: str) -> Union[float, str]:
         """
         Solves simple equations like: 2x + 3 = 7
         Returns the value of x
         """
-        if not isinstance(equation, str):
-            return "Error: Please provide the equation as a string"
-            
-        self.log_step("[START] Solving equation", equation)
-        
-        # Clean up the equation by removing spaces
-        equation = equation.replace(" ", "")
-        self.log_step("Making equation easier to read", f"Original: {equation}")
-        
-        # Split into left and right sides of the equals sign
-        if "=" not in equation:
-            return "Error: Invalid equation format - missing equals sign (=)"
-            
-        left, right = equation.split("=")
-        if not left or not right:
-            return "Error: Invalid equation format - empty side of equation"
-            
-        self.log_step("Breaking equation into two parts", f"Left: {left}, Right: {right}")
-        
-        # Sort terms: put x terms on left, numbers on right
-        left_terms = []   # Will hold coefficients of x terms
-        right_terms = []  # Will hold regular numbers
-        
-        # Look at the left side of the equation
-        terms = re.findall(r'[+-]?\s*\d*x?', left)
-        for term in terms:
-            if 'x' in term:  # If this term has an x in it
-                coef = term.replace('x', '')
-                coef = '1' if coef in ['+', ''] else '-1' if coef == '-' else coef
-                left_terms.append(float(coef))
-                self.log_step("Found an x term", f"Term: {term}", f"Coefficient: {coef}")
-            else:
-                if term:  # If it's a regular number
-                    right_terms.append(-float(term))
-                    self.log_step("Moving number to right side", term, f"Added {-float(term)} to right side")
-
-        # Look at the right side of the equation
-        terms = re.findall(r'[+-]?\s*\d*x?', right)
-        for term in terms:
-            if 'x' in term:  # If this term has an x in it
-                coef = term.replace('x', '')
-                coef = '1' if coef in ['+', ''] else '-1' if coef == '-' else coef
-                left_terms.append(-float(coef))
-                self.log_step("Moving x term to left side", term, f"Added {-float(coef)}x to left side")
-            else:
-                if term:  # If it's a regular number
-                    right_terms.append(float(term))
-                    self.log_step("Found a number on right side", term)
-
-        # Add up all the x terms and all the numbers
-        x_coef = sum(left_terms)
-        num_sum = sum(right_terms)
-        
-        self.log_step("Adding like terms", 
-                     f"x terms: {left_terms}, numbers: {right_terms}",
-                     f"{x_coef}x = {num_sum}")
-
-        # Find x by dividing both sides by coefficient of x
-        if x_coef == 0:
-            if num_sum == 0:
-                return "This equation has infinite solutions!"
-            else:
-                return "This equation has no solution!"
-        
-        solution = num_sum / x_coef
-        self.log_step("Solving for x", 
-                     f"{x_coef}x = {num_sum}",
-                     f"x = {solution}")
-        
-        return solution
+        return _run(self._logged(self._iterate("equation", (equation,))))
 
     def solve_quadratic(self, equation: str) -> Union[tuple, str]:
         """
         Solves quadratic equations like: x² - 5x + 6 = 0
         Uses the quadratic formula: x = (-b ± √(b² - 4ac)) / (2a)
         """
-        if not isinstance(equation, str):
-            return "Error: Please provide the equation as a string"
-            
-        self.log_step("[START] Solving quadratic equation", equation)
-        
-        # Clean up the equation
-        equation = equation.replace(" ", "").replace("²", "^2")
-        self.log_step("Making equation easier to read", equation)
-        
-        # Ensure equation is in standard form (= 0)
-        if not equation.endswith("=0"):
-            return "Error: Quadratic equation must be in standard form (ax² + bx + c = 0)"
-        
-        # Find a, b, and c in ax² + bx + c = 0
-        # More robust pattern matching that handles various formats
-        equation = equation[:-2]  # Remove "=0"
-        parts = re.findall(r'[+-]?\s*\d*x\^2|[+-]?\s*\d*x|[+-]?\s*\d+', equation)
-        
-        if not parts:
-            return "Error: Invalid quadratic equation format"
-            
-        a = b = c = 0
-        for part in parts:
-            if 'x^2' in part:
-                coef = part.replace('x^2', '').strip('+-')
-                a = float(coef if coef and coef != '+' else '1' if part[0] != '-' else '-1')
-            elif 'x' in part:
-                coef = part.replace('x', '').strip('+-')
-                b = float(coef if coef and coef != '+' else '1' if part[0] != '-' else '-1')
-            else:
-                c = float(part)
-                
-        if a == 0:
-            return "Error: This is not a quadratic equation (coefficient of x² is 0)"
-        
-        self.log_step("Found the important numbers", 
-                     f"From: {equation}",
-                     f"a={a}, b={b}, c={c}")
-
-        # Calculate b² - 4ac (called the discriminant)
-        discriminant = b**2 - 4*a*c
-        self.log_step("Calculating discriminant", 
-                     f"b² - 4ac = {b}² - 4({a})({c})",
-                     str(discriminant))
-
-        if discriminant < 0:
-            return "This equation has no real solutions (the answers would be imaginary numbers)"
-        
-        # Use the quadratic formula to find both solutions
-        x1 = (-b + math.sqrt(discriminant)) / (2*a)
-        x2 = (-b - math.sqrt(discriminant)) / (2*a)
-        
-        self.log_step("Using the quadratic formula", 
-                     f"x = (-{b} ± √{discriminant}) / (2*{a})",
-                     f"x₁ = {x1}, x₂ = {x2}")
+        return _run(self._logged(self._iterate("quadratic", (equation,))))
+
+    def _iterate(self, kind: str, args: tuple) -> Iterator[Tuple[str, str, str]]:
+        """The step generator for a problem, with this solver's caches and timers around it"""
+        if kind == "geometry":
+            return self._iter_geometry(*args)
+        return ITERATORS[kind](*args, cached=self._iter_cached)
+
+    def _iter_cached(self, kind: str, equation: str, solve) -> Iterator[Tuple[str, str, str]]:
+        """
+        Looks the cleaned-up equation up in the cache first. If we've solved
+        it before, we just hand over the steps we wrote down last time instead
+        of working it all out again.
+        """
+        cache = self.equation_cache
+        metrics = self.metrics
+        key = f"{kind}:{equation}"
+        cached = cache.get(key) if cache is not None else None
+        if cached is None and self.result_cache is not None:
+            # Maybe another solver (or an earlier run) already did this one
+            cached = self.result_cache.get(f"math:{key}")
+            if cached is not None and cache is not None:
+                cache.put(key, cached)
+        if cached is not None:
+            if metrics is not None:
+                metrics.count("cache_hits")
+            solution, steps = cached
+            yield from steps
+            return solution
+
+        steps = []
+        work = solve(equation)
+        if metrics is None:
+            solution = yield from _remember(work, steps)
+        else:
+            if cache is not None:
+                metrics.count("cache_misses")
+            with metrics.phase(kind):
+                solution = yield from _remember(work, steps)
+        if cache is not None:
+            cache.put(key, (solution, steps))
+        if self.result_cache is not None:
+            self.result_cache.put(f"math:{key}", (solution, steps))
+        return solution
+
+    def _logged(self, steps: Iterator[Tuple[str, str, str]], log: StepLog = None) -> Iterator[Dict[str, str]]:
+        """Writes down every step a solving generator hands over (in self.steps or log), and passes it on"""
+        if log is None:
+            log = self.steps
+        while True:
+            try:
+                step = next(steps)
+            except StopIteration as done:
+                return done.value
+            self._write(log, *step)
+            yield log[-1]
+
+    def solve_quadratic_many(self, a: Any, b: Any, c: Any) -> "QuadraticBatch":
+        """
+        Solves a whole array of quadratic equations ax² + bx + c = 0 at once.
+        a, b and c are arrays (or lists) of the same length, one row per equation.
+        Uses the cancellation-free form of the quadratic formula:
+            q = -(b + sign(b)·√(b² - 4ac)) / 2,  roots q/a and c/q
+        so roots stay accurate even when b² is much bigger than 4ac.
+        Rows without real roots (or that aren't quadratic) get NaN roots
+        and are marked in the masks. Instead of a log entry per row, one
+        summary step is logged for the whole batch.
+        """
+        _require_numpy()
+        a = np.asarray(a, dtype=float)
+        b = np.asarray(b, dtype=float)
+        c = np.asarray(c, dtype=float)
+        a, b, c = np.broadcast_arrays(a, b, c)
+
+        discriminant = b * b - 4 * a * c
+        not_quadratic = a == 0
+        no_real_roots = (discriminant < 0) & ~not_quadratic
+        solvable = ~(not_quadratic | no_real_roots)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            root = np.sqrt(np.where(solvable, discriminant, 0.0))
+            q = -0.5 * (b + np.copysign(root, b))
+            big_root = q / a    # The root with the larger size
+            small_root = c / q  # The other root, without cancellation
+            # If q is 0 then b and c are both 0 and both roots are 0
+            small_root = np.where(q == 0, big_root, small_root)
+            # Keep the usual order: x₁ uses +√, x₂ uses -√. The sign bit
+            # decides, as it did for q, so b = -0.0 doesn't swap the roots
+            plus_is_small = ~np.signbit(b)
+            x1 = np.where(plus_is_small, small_root, big_root)
+            x2 = np.where(plus_is_small, big_root, small_root)
+        x1 = np.where(solvable, x1, np.nan)
+        x2 = np.where(solvable, x2, np.nan)
+
+        self.log_step("Solving many quadratic equations",
+                      f"{a.size} equations with x = (-b ± √(b² - 4ac)) / (2a)",
+                      f"{int(solvable.sum())} with real roots, {int(no_real_roots.sum())} without, "
+                      f"{int(not_quadratic.sum())} not quadratic")
+        return QuadraticBatch(a, b, c, discriminant, x1, x2, no_real_roots, not_quadratic)
+
+    def solve_linear_many(self, coef: Any, const: Any) -> "LinearBatch":
+        """
+        Solves a whole array of simple equations coef·x = const at once
+        (the form solve_equation gets every equation into).
+        Rows with coef 0 get NaN and are marked as having infinite
+        solutions (const 0) or no solution (const not 0).
+        """
+        _require_numpy()
+        coef = np.asarray(coef, dtype=float)
+        const = np.asarray(const, dtype=float)
+        coef, const = np.broadcast_arrays(coef, const)
+
+        zero = coef == 0
+        infinite_solutions = zero & (const == 0)
+        no_solution = zero & (const != 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            x = np.where(zero, np.nan, const / np.where(zero, 1.0, coef))
 
-        return (x1, x2)
+        self.log_step("Solving many linear equations",
+                      f"{coef.size} equations with x = const / coef",
+                      f"{int((~zero).sum())} solved, {int(infinite_solutions.sum())} with infinite "
+                      f"solutions, {int(no_solution.sum())} with no solution")
+        return LinearBatch(coef, const, x, infinite_solutions, no_solution)
 
     def solve_geometry(self, problem_type: str, values: Dict[str, float]) -> Union[float, str]:
         """
-        Solves geometry problems like finding areas of shapes
-        Currently supports:
-        - Triangle area (½ × base × height)
-        - Circle area (πr²)
+        Solves geometry problems like finding areas of shapes, for example
+            solve_geometry("triangle_area", {"base": 6, "height": 4})
+        Every shape in geometry.SHAPES is supported: areas of triangles,
+        circles, rectangles, trapezoids, polygons (from x and y corner lists)
+        and more, perimeters, and volumes of boxes, cylinders, cones and spheres.
         """
-        if not isinstance(problem_type, str) or not isinstance(values, dict):
-            return "Error: Invalid input types"
-            
-        self.log_step("[START] Solving geometry problem", 
-                     f"Type: {problem_type}, Values: {values}")
-        
-        if problem_type == "triangle_area":
-            if not all(key in values for key in ["base", "height"]):
-                return "Error: Triangle area calculation requires both 'base' and 'height' values"
-            if not all(isinstance(values[key], (int, float)) for key in ["base", "height"]):
-                return "Error: Base and height must be numbers"
-            if any(values[key] <= 0 for key in ["base", "height"]):
-                return "Error: Base and height must be positive numbers"
-                
-            area = 0.5 * values["base"] * values["height"]
-            self.log_step("Calculating triangle area",
-                        f"Area = ½ × base × height = ½ × {values['base']} × {values['height']}",
-                        str(area))
-            return area
-                
-        elif problem_type == "circle_area":
-            if "radius" not in values:
-                return "Error: Circle area calculation requires a 'radius' value"
-            if not isinstance(values["radius"], (int, float)):
-                return "Error: Radius must be a number"
-            if values["radius"] <= 0:
-                return "Error: Radius must be a positive number"
-                
-            area = math.pi * values["radius"]**2
-            self.log_step("Calculating circle area",
-                        f"Area = πr² = π × {values['radius']}²",
-                        str(area))
-            return area
-        
-        return f"Error: Unsupported geometry problem type '{problem_type}'. Supported types: triangle_area, circle_area"
+        return _run(self._logged(self._iterate("geometry", (problem_type, values))))
+
+    def _iter_geometry(self, problem_type: str, values: Dict[str, float]) -> Iterator[Tuple[str, str, str]]:
+        """
+        iter_geometry, but copying the answer and steps from the result cache
+        if they're there (and putting them there for next time otherwise)
+        """
+        result_cache = self.result_cache if isinstance(values, dict) else None
+        key = f"math:geometry:{problem_type}:{values!r}"
+        if result_cache is not None:
+            cached = result_cache.get(key)
+            if cached is not None:
+                solution, steps = cached
+                yield from steps
+                return solution
+
+        steps = []
+        if self.metrics is None:
+            solution = yield from _remember(iter_geometry(problem_type, values), steps)
+        else:
+            with self.metrics.phase("geometry"):
+                solution = yield from _remember(iter_geometry(problem_type, values), steps)
+        if result_cache is not None:
+            result_cache.put(key, (solution, steps))
+        return solution
+
+    def solve_geometry_many(self, problem_type: str, columns: Dict[str, Any] = None,
+                            **more_columns: Any) -> "GeometryBatch":
+        """
+        Works out one kind of shape for whole columns of values at once, like
+            solve_geometry_many("rectangle_area", width=widths, height=heights)
+        Polygons take x and y flat arrays with offsets (polygon i has corners
+        offsets[i] up to offsets[i + 1]), or a list of coordinates per polygon.
+        Rows that aren't numbers or aren't positive get NaN results and are
+        marked in the masks. Instead of a log entry per row, one summary step
+        is logged for the whole batch.
+        """
+        _require_numpy()
+        shape = SHAPES.get(problem_type)
+        if shape is None:
+            raise ValueError(f"Unsupported geometry problem type '{problem_type}'. "
+                             f"Supported types: {', '.join(SHAPES)}")
+        values, result, not_numbers, not_positive = evaluate_many(shape, {**(columns or {}), **more_columns})
+        bad_size = "with fewer than 3 corners" if shape.polygon else "not positive"
+        self.log_step("Solving many geometry problems",
+                      f"{result.size} × {shape.name} with {shape.rule}",
+                      f"{int((~(not_numbers | not_positive)).sum())} worked out, "
+                      f"{int(not_numbers.sum())} not numbers, {int(not_positive.sum())} {bad_size}")
+        return GeometryBatch(shape, values, result, not_numbers, not_positive)
+
+    def solve(self, problem: Any) -> SolveResult:
+        """
+        Solves one problem (anything solve_batch takes) on scratch paper of
+        its own: a SolveResult whose trace is a new StepLog of the work.
+        self.steps is left alone, so many threads can share one solver.
+        """
+        log = StepLog()
+        return to_result(problem, self._answer(problem, log), log)
+
+    def _answer(self, problem: Any, log: StepLog) -> Any:
+        """Solves a problem with its steps written in log; errors become error messages"""
+        try:
+            kind, args = problem_kind(problem)
+            return _run(self._logged(self._iterate(kind, args), log))
+        except Exception as e:
+            return f"Error: {e}"
+
+    def solve_batch(self, problems: Iterable[Any], trace: bool = False) -> List[SolveResult]:
+        """
+        Solves a whole list of problems in one go and gives back a
+        SolveResult for each one, in the same order.
+        Each problem can be:
+        - an equation string (quadratic if it has x² or x^2 in it)
+        - a tuple like ("equation", "2x + 3 = 7"), ("quadratic", "x^2-5x+6=0")
+          or ("geometry", "circle_area", {"radius": 2})
+        Problems that fail get an error message instead of stopping the batch.
+        The steps go on scratch paper of this call's own (not self.steps),
+        so many threads can share one solver. With trace, each result gets
+        its steps as Notes: lines of text, written out when they are read.
+        """
+        results = []
+        log = StepLog()  # Without trace, cleared and reused for every problem
+        for problem in problems:
+            if trace:
+                log = StepLog()
+            else:
+                log.clear()
+            answer = self._answer(problem, log)
+            results.append(to_result(problem, answer, log.notes() if trace else None))
+        return results
+
+    def solve_iter(self, problem: Any) -> Iterator[Any]:
+        """
+        Solves one problem (anything solve_batch takes) and hands over each
+        step the moment it is written down - the same dictionaries that go
+        into self.steps - and finally a SolveResult with the answer.
+        Stop early, and the rest of the work is never done.
+        """
+        self.steps.clear()
+        self.problem = problem
+        try:
+            kind, args = problem_kind(problem)
+            answer = yield from self._logged(self._iterate(kind, args))
+        except Exception as e:
+            answer = f"Error: {e}"
+        result = to_result(problem, answer)
+        self.solution = result.result
+        yield result
 
-    def show_work(self) -> None:
+    def show_work(self, renderer: Any = None, out: Any = None) -> None:
         """
         Shows all the steps we took to solve the problem,
         just like showing your work in math class!
+        Plain text on the screen unless you pick a renderer (a
+        renderers.Renderer, or "text", "json", "markdown" or "latex") and
+        somewhere to write to (`out`, any file-like object).
         """
-        print("\n[Solution Steps]")
-        for i, step in enumerate(self.steps, 1):
-            print(f"\nStep {i}:")
-            print(f"What we're doing: {step['description']}")
-            if step['work']:
-                print(f"How we're doing it: {step['work']}")
-            if step['result']:
-                print(f"What we got: {step['result']}")
-        print("\n[All our work]")
-        for i, note in enumerate(self.scratchpad, 1):
-            print(f"{i}. {note}")
+        get_renderer(renderer, out).render_steps(self.steps)
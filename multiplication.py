@@ -0,0 +1,198 @@
+"""
+Multiplication Strategies
+Different ways to multiply two numbers while showing the work:
+- digits: the classic schoolbook method, one digit at a time
+- limbs: the same schoolbook method on chunks ("limbs") of several digits
+- karatsuba: split the numbers in halves and multiply the halves recursively
+- native: let Python's big integers do it and only write down the answer
+
+The agent picks a strategy from the operand size, so small problems keep
+the familiar digit-by-digit scratchpad and huge ones stay fast.
+"""
+
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from digit_engine import add_digits, to_digits, from_digits
+from scratchpad import (
+    MUL_ROW, MUL_DIGIT, MUL_FINAL_CARRY, PARTIAL_RESULT, MUL_STRATEGY,
+    LIMB_ROW, KARATSUBA_SPLIT, KARATSUBA_LEAF, KARATSUBA_COMBINE, run_steps,
+)
+
+Recorder = Optional[Callable[..., None]]
+
+# Longest operand (in digits) each strategy is picked for in "auto" mode
+DIGITS_MAX = 40
+LIMBS_MAX = 400
+KARATSUBA_MAX = 20000
+
+LIMB_DIGITS = 4           # Digits per limb for the limb strategy
+KARATSUBA_LEAF_DIGITS = 64  # Below this, Karatsuba multiplies directly
+KARATSUBA_MAX_DEPTH = 6   # Keeps the trace at most 3^6 leaf products
+
+
+def choose_strategy(num1_digits: int, num2_digits: int) -> str:
+    """Pick a multiplication strategy from the operand lengths"""
+    longest = max(num1_digits, num2_digits)
+    if longest <= DIGITS_MAX:
+        return "digits"
+    if longest <= LIMBS_MAX:
+        return "limbs"
+    if longest <= KARATSUBA_MAX:
+        return "karatsuba"
+    return "native"
+
+
+def multiply_digits(num1: str, num2: str, record: Recorder = None) -> int:
+    """Schoolbook multiplication, one digit of the second number per row"""
+    return run_steps(iter_multiply_digits(num1, num2), record)
+
+
+def iter_multiply_digits(num1: str, num2: str) -> Iterator[Tuple[int, tuple]]:
+    """multiply_digits, yielding each (kind, args) step as it is worked out"""
+    partial_results = []
+
+    # Process each digit of num2 from right to left
+    for i in range(len(num2) - 1, -1, -1):
+        digit2 = int(num2[i])
+        carry = 0
+        current_result = []
+        zeros = '0' * (len(num2) - 1 - i)  # Add trailing zeros for position
+
+        yield MUL_ROW, (digit2, len(num2) - i - 1)
+
+        # Multiply digit2 with each digit of num1
+        for j in range(len(num1) - 1, -1, -1):
+            digit1 = int(num1[j])
+            product = digit1 * digit2 + carry
+            carry = product // 10
+            current_result.append(str(product % 10))
+            yield MUL_DIGIT, (digit1, digit2, carry, product)
+
+        if carry:
+            current_result.append(str(carry))
+            yield MUL_FINAL_CARRY, (carry,)
+
+        current_result.reverse()
+        partial_result = int(''.join(current_result) + zeros)
+        partial_results.append(partial_result)
+        yield PARTIAL_RESULT, (partial_result,)
+
+    return sum(partial_results)
+
+
+def _to_limbs(digits: str, limb_digits: int) -> List[int]:
+    """Split a digit string into limbs, least significant first"""
+    return [
+        int(digits[max(end - limb_digits, 0):end])
+        for end in range(len(digits), 0, -limb_digits)
+    ]
+
+
+def multiply_limbs(num1: str, num2: str, record: Recorder = None,
+                   limb_digits: int = LIMB_DIGITS) -> int:
+    """Schoolbook multiplication on limbs of `limb_digits` digits each"""
+    return run_steps(iter_multiply_limbs(num1, num2, limb_digits), record)
+
+
+def iter_multiply_limbs(num1: str, num2: str,
+                        limb_digits: int = LIMB_DIGITS) -> Iterator[Tuple[int, tuple]]:
+    """multiply_limbs, yielding each (kind, args) step as it is worked out"""
+    base = 10 ** limb_digits
+    limbs1 = _to_limbs(num1, limb_digits)
+    limbs2 = _to_limbs(num2, limb_digits)
+    total = 0
+
+    for position, limb2 in enumerate(limbs2):
+        yield LIMB_ROW, (limb2, position, limb_digits)
+        row = []
+        carry = 0
+        for limb1 in limbs1:
+            product = limb1 * limb2 + carry
+            carry = product // base
+            row.append(product % base)
+            yield MUL_DIGIT, (limb1, limb2, carry, product)
+        if carry:
+            row.append(carry)
+            yield MUL_FINAL_CARRY, (carry,)
+
+        partial_result = 0
+        for limb in reversed(row):
+            partial_result = partial_result * base + limb
+        partial_result *= base ** position
+        total += partial_result
+        yield PARTIAL_RESULT, (partial_result,)
+
+    return total
+
+
+def multiply_karatsuba(num1: str, num2: str, record: Recorder = None,
+                       leaf_digits: int = KARATSUBA_LEAF_DIGITS,
+                       max_depth: int = KARATSUBA_MAX_DEPTH) -> int:
+    """
+    Karatsuba multiplication. Each number is split into a high and a low
+    half, and three half-size products replace the usual four:
+        x·y = z2·10^(2m) + z1·10^m + z0
+    where z2 = high·high, z0 = low·low and z1 = (sum·sum) - z2 - z0.
+    """
+    return run_steps(iter_multiply_karatsuba(num1, num2, leaf_digits, max_depth), record)
+
+
+def iter_multiply_karatsuba(num1: str, num2: str, leaf_digits: int = KARATSUBA_LEAF_DIGITS,
+                            max_depth: int = KARATSUBA_MAX_DEPTH) -> Iterator[Tuple[int, tuple]]:
+    """multiply_karatsuba, yielding each (kind, args) step as it is worked out"""
+    return _karatsuba(num1, num2, 0, leaf_digits, max_depth)
+
+
+def _karatsuba(x: str, y: str, depth: int, leaf_digits: int,
+               max_depth: int) -> Iterator[Tuple[int, tuple]]:
+    length = max(len(x), len(y))
+    if length <= leaf_digits or depth >= max_depth:
+        x_value, y_value = from_digits(x), from_digits(y)
+        product = x_value * y_value
+        yield KARATSUBA_LEAF, (depth, x_value, y_value, product)
+        return product
+
+    m = length // 2
+    x_high, x_low = x[:-m] or "0", x[-m:]
+    y_high, y_low = y[:-m] or "0", y[-m:]
+    yield KARATSUBA_SPLIT, (depth, length, m)
+
+    z0 = yield from _karatsuba(x_low, y_low, depth + 1, leaf_digits, max_depth)
+    z2 = yield from _karatsuba(x_high, y_high, depth + 1, leaf_digits, max_depth)
+    z1 = yield from _karatsuba(add_digits(x_low, x_high), add_digits(y_low, y_high),
+                               depth + 1, leaf_digits, max_depth)
+    z1 -= z2 + z0
+
+    result = (z2 * 10 ** m + z1) * 10 ** m + z0
+    yield KARATSUBA_COMBINE, (depth, z2, 2 * m, z1, m, z0, result)
+    return result
+
+
+STRATEGIES: Dict[str, Callable[..., Iterator[Tuple[int, tuple]]]] = {
+    "digits": iter_multiply_digits,
+    "limbs": iter_multiply_limbs,
+    "karatsuba": iter_multiply_karatsuba,
+}
+
+
+def multiply(num1: int, num2: int, strategy: str = "auto", record: Recorder = None) -> int:
+    """Multiply two non-negative numbers with the chosen (or automatic) strategy"""
+    if strategy == "native" and record is None:
+        return num1 * num2
+    return run_steps(iter_multiply(num1, num2, strategy), record)
+
+
+def iter_multiply(num1: int, num2: int, strategy: str = "auto") -> Iterator[Tuple[int, tuple]]:
+    """multiply, yielding each (kind, args) step as it is worked out"""
+    num1_str = to_digits(num1)
+    num2_str = to_digits(num2)
+    if strategy == "auto":
+        strategy = choose_strategy(len(num1_str), len(num2_str))
+    elif strategy != "native" and strategy not in STRATEGIES:
+        raise ValueError(f"Unknown multiplication strategy '{strategy}'")
+
+    if strategy != "digits":
+        yield MUL_STRATEGY, (len(num1_str), len(num2_str), strategy)
+    if strategy == "native":
+        return num1 * num2
+    return (yield from STRATEGIES[strategy](num1_str, num2_str))
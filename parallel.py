@@ -0,0 +1,102 @@
+"""
+Parallel Solver
+Spreads a stream of problems over several processes. Every worker process
+gets its own solver (AIAgent or MathProblemSolver), the problems travel in
+chunks, and the results come back in the same order they went in. Traces
+come back in their compact form (a Trace, or the Notes of a StepLog), not
+as text: lines are only written out when someone reads them.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from ai_agent import AIAgent
+from math_solver import MathProblemSolver
+from scratchpad import SolveResult
+
+SOLVERS = {
+    "agent": AIAgent,
+    "math": MathProblemSolver,
+}
+
+# The solver owned by this worker process (set up once per process)
+_worker_solver = None
+
+
+def _init_worker(solver: str, options: Dict[str, Any]) -> None:
+    global _worker_solver
+    _worker_solver = SOLVERS[solver](**options)
+
+
+def solve_chunk(solver: Any, chunk: List[Any], trace: bool) -> List[SolveResult]:
+    """
+    solver.solve_batch for one chunk, except that items which already are
+    a SolveResult (e.g. an input line that couldn't be read) are passed on
+    as they are, in their place
+    """
+    problems = [item for item in chunk if not isinstance(item, SolveResult)]
+    if len(problems) == len(chunk):
+        return solver.solve_batch(chunk, trace)
+    results = iter(solver.solve_batch(problems, trace) if problems else [])
+    return [item if isinstance(item, SolveResult) else next(results) for item in chunk]
+
+
+def _solve_chunk(chunk: List[Any], trace: bool) -> List[SolveResult]:
+    return solve_chunk(_worker_solver, chunk, trace)
+
+
+def chunked(problems: Iterable[Any], chunk_size: int) -> Iterator[List[Any]]:
+    """Cut a stream of problems into lists of at most chunk_size problems"""
+    iterator = iter(problems)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def solve_parallel(problems: Iterable[Any], solver: str = "agent", workers: Optional[int] = None,
+                   chunk_size: int = 1000, trace: bool = False,
+                   **options: Any) -> Iterator[SolveResult]:
+    """
+    Solve a stream of problems on a pool of worker processes.
+
+    problems:   any iterable of problems (it is read lazily, chunk by chunk);
+                SolveResults among them are passed through as they are
+    solver:     "agent" for AIAgent problems, "math" for MathProblemSolver ones
+    workers:    number of processes (default: all cores); 1 or 0 solves
+                everything in this process without a pool
+    chunk_size: how many problems each worker gets at a time
+    trace:      also send back the scratchpad of every problem
+    options:    passed on to the solver, e.g. verbosity=Verbosity.SUMMARY
+
+    Yields one SolveResult per problem, in input order. Only a few chunks
+    per worker are in flight at once, so huge streams don't pile up in memory.
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver '{solver}'. Supported solvers: {', '.join(SOLVERS)}")
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    chunks = chunked(problems, chunk_size)
+    if workers <= 1:
+        local_solver = SOLVERS[solver](**options)
+        for chunk in chunks:
+            yield from solve_chunk(local_solver, chunk, trace)
+        return
+
+    max_pending = workers * 2
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(solver, options)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_solve_chunk, chunk, trace))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
@@ -0,0 +1,165 @@
+"""
+Streaming Pipeline
+Solves problem files of any size, one line at a time:
+
+    read lines -> solve in small batches -> write JSONL results
+
+Every stage is a generator, so only one batch of problems (plus a small
+output buffer) is in memory at once, whether the file has a thousand
+problems or a hundred million.
+
+Usage:
+    python pipeline.py problems.txt -o results.jsonl
+    cat problems.jsonl | python pipeline.py - --format jsonl --trace
+    python pipeline.py equations.txt --solver math --workers 8
+"""
+
+import argparse
+import json
+import sys
+import time
+from typing import IO, Any, Dict, Iterable, Iterator
+
+from digit_engine import to_digits
+from parallel import SOLVERS, chunked, solve_chunk, solve_parallel
+from scratchpad import SolveResult
+
+
+def read_problems(lines: Iterable[str], fmt: str = "text") -> Iterator[Any]:
+    """
+    Turn input lines into problems. Blank lines are skipped.
+    - text:  every line is one problem, e.g. "123+456" or "2x + 3 = 7"
+    - jsonl: every line is a JSON string, or an object with a "problem" key
+             (a string, or a list like ["geometry", "circle_area", {"radius": 2}])
+    A jsonl line that can't be read doesn't stop the run: it becomes a
+    SolveResult with an error saying which line it was, and the solvers
+    pass it on as the result for that line.
+    """
+    if fmt not in ("text", "jsonl"):
+        raise ValueError(f"Unknown input format '{fmt}'. Supported formats: text, jsonl")
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if fmt == "text":
+            yield line
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield SolveResult(line, None, f"Line {number}: invalid JSON ({e.msg})")
+            continue
+        if isinstance(item, dict):
+            if "problem" not in item:
+                yield SolveResult(line, None, f'Line {number}: no "problem" key')
+                continue
+            item = item["problem"]
+        yield tuple(item) if isinstance(item, list) else item
+
+
+def solve_stream(problems: Iterable[Any], solver: str = "agent", batch_size: int = 1000,
+                 trace: bool = False, workers: int = 1) -> Iterator[SolveResult]:
+    """Solve a stream of problems batch by batch, yielding results in order"""
+    if workers > 1:
+        yield from solve_parallel(problems, solver, workers=workers, chunk_size=batch_size, trace=trace)
+        return
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver '{solver}'. Supported solvers: {', '.join(SOLVERS)}")
+    local_solver = SOLVERS[solver]()
+    for batch in chunked(problems, batch_size):
+        yield from solve_chunk(local_solver, batch, trace)
+
+
+def jsonable(value: Any) -> Any:
+    """Numbers too long for json.dumps are written as digit strings"""
+    if isinstance(value, int) and not isinstance(value, bool) and value.bit_length() > 10000:
+        return to_digits(value)
+    if isinstance(value, tuple):
+        return [jsonable(item) for item in value]
+    return value
+
+
+def result_to_dict(result: SolveResult) -> Dict[str, Any]:
+    """One result as a JSON-ready dictionary"""
+    record = {
+        "problem": jsonable(result.problem),
+        "result": jsonable(result.result),
+        "error": result.error,
+    }
+    if result.trace is not None:
+        record["trace"] = list(result.trace)  # Traces are only turned into text here
+    return record
+
+
+def write_results(results: Iterable[SolveResult], out: IO[str], buffer_lines: int = 1000) -> int:
+    """
+    Write results as JSON lines. Lines are collected in a small buffer
+    and written in one go, so the output is hit once per buffer instead
+    of once per line. Returns how many results were written.
+    """
+    buffer = []
+    count = 0
+    dumps = json.dumps
+    for result in results:
+        buffer.append(dumps(result_to_dict(result), ensure_ascii=False))
+        count += 1
+        if len(buffer) >= buffer_lines:
+            buffer.append("")
+            out.write("\n".join(buffer))
+            buffer.clear()
+    if buffer:
+        buffer.append("")
+        out.write("\n".join(buffer))
+    out.flush()
+    return count
+
+
+def run(source: IO[str], out: IO[str], fmt: str = "text", solver: str = "agent",
+        batch_size: int = 1000, trace: bool = False, workers: int = 1,
+        buffer_lines: int = 1000) -> Dict[str, float]:
+    """Run the whole pipeline and report how fast it went"""
+    start = time.perf_counter()
+    problems = read_problems(source, fmt)
+    results = solve_stream(problems, solver, batch_size, trace, workers)
+    count = write_results(results, out, buffer_lines)
+    seconds = time.perf_counter() - start
+    return {
+        "problems": count,
+        "seconds": seconds,
+        "problems_per_second": count / seconds if seconds else 0.0,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Solve a file of problems and write JSONL results")
+    parser.add_argument("input", help="Problem file, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="Result file, or - for stdout (default)")
+    parser.add_argument("--format", choices=["text", "jsonl"], default=None,
+                        help="Input format (default: jsonl for .jsonl files, text otherwise)")
+    parser.add_argument("--solver", choices=sorted(SOLVERS), default="agent")
+    parser.add_argument("--trace", action="store_true", help="Include every scratchpad in the output")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes (1 = no pool)")
+    parser.add_argument("--buffer-lines", type=int, default=1000,
+                        help="Result lines collected before each write")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("jsonl" if args.input.endswith(".jsonl") else "text")
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        stats = run(source, out, fmt, args.solver, args.batch_size, args.trace,
+                    args.workers, args.buffer_lines)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+
+    print(f"Solved {stats['problems']} problems in {stats['seconds']:.2f}s "
+          f"({stats['problems_per_second']:.0f} problems/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
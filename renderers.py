@@ -0,0 +1,231 @@
+"""
+Renderers
+Writing the work out for people (or other programs) to read: plain text,
+JSON, Markdown or LaTeX, to the screen, a file, a pipe or anything else
+with a write() method.
+
+A scratchpad can have millions of steps, so renderers never build the
+whole thing as one string, and they don't write every line on its own
+either: lines are collected in a buffer and written in chunks of about
+`buffer_size` characters. AIAgent.show_scratchpad and
+MathProblemSolver.show_work use them:
+
+    with open("work.md", "w") as out:
+        agent.show_scratchpad(MarkdownRenderer(out))
+"""
+
+import json
+import shutil
+import sys
+import tempfile
+from typing import Any, Dict, Iterable, List
+
+from scratchpad import KIND_NAMES, render
+
+BUFFER_SIZE = 1 << 16  # Characters collected before each write
+
+
+class _Buffer:
+    """Collects text and hands it to out.write() in big chunks"""
+
+    def __init__(self, out: Any, size: int):
+        self.out = out
+        self.size = size
+        self.parts: List[str] = []
+        self.length = 0    # Characters waiting in parts
+        self.written = 0   # Characters written so far
+
+    def write(self, text: str) -> None:
+        self.parts.append(text)
+        self.length += len(text)
+        if self.length >= self.size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.parts:
+            self.out.write("".join(self.parts))
+            self.written += self.length
+            self.parts.clear()
+            self.length = 0
+
+
+class Renderer:
+    """
+    The common part of every renderer: where the text goes and how it is
+    buffered. Subclasses say what a scratchpad looks like:
+    - render_trace(trace): an AIAgent scratchpad (a scratchpad.Trace)
+    - render_steps(steps): a MathProblemSolver's steps (a StepLog, or any
+      iterable of {"description", "work", "result"} dictionaries, read once)
+    Both give back how many steps they wrote; `written` is how many
+    characters went out.
+    """
+
+    def __init__(self, out: Any = None, buffer_size: int = BUFFER_SIZE):
+        self.out = out  # None: sys.stdout at the time of rendering
+        self.buffer_size = buffer_size
+        self.written = 0
+
+    def _open(self) -> _Buffer:
+        return _Buffer(sys.stdout if self.out is None else self.out, self.buffer_size)
+
+    def _close(self, buffer: _Buffer) -> None:
+        buffer.flush()
+        self.written += buffer.written
+        if hasattr(buffer.out, "flush"):
+            buffer.out.flush()
+
+    def render_trace(self, trace: Any, title: str = "Scratchpad Contents") -> int:
+        raise NotImplementedError
+
+    def render_steps(self, steps: Iterable[Dict[str, str]], title: str = "Solution Steps") -> int:
+        raise NotImplementedError
+
+
+def _note(step: Dict[str, str]) -> str:
+    """One solver step as a line, like the solver's scratchpad: "description: work => result" """
+    return f"{step['description']}: {step['work']} => {step['result']}"
+
+
+class TextRenderer(Renderer):
+    """Plain text, just like show_scratchpad and show_work have always printed"""
+
+    def render_trace(self, trace: Any, title: str = "Scratchpad Contents") -> int:
+        buffer = self._open()
+        buffer.write(f"\n{title}:\n")
+        count = 0
+        for count, line in enumerate(trace, 1):
+            buffer.write(f"Step {count}: {line}\n")
+        self._close(buffer)
+        return count
+
+    def render_steps(self, steps: Iterable[Dict[str, str]], title: str = "Solution Steps") -> int:
+        buffer = self._open()
+        buffer.write(f"\n[{title}]\n")
+        count = 0
+        # The summary comes after every step. A StepLog, Notes or list can
+        # simply be read again for it; steps that can only be read once are
+        # kept in a temporary file, in memory only while it is small
+        once = iter(steps) is steps
+        notes = tempfile.SpooledTemporaryFile(self.buffer_size, "w+", encoding="utf-8") if once else None
+        try:
+            for count, step in enumerate(steps, 1):
+                buffer.write(f"\nStep {count}:\nWhat we're doing: {step['description']}\n")
+                if step['work']:
+                    buffer.write(f"How we're doing it: {step['work']}\n")
+                if step['result']:
+                    buffer.write(f"What we got: {step['result']}\n")
+                if once:
+                    notes.write(f"{count}. {_note(step)}\n")
+            buffer.write("\n[All our work]\n")
+            if once:
+                buffer.flush()
+                notes.seek(0)
+                shutil.copyfileobj(notes, buffer, self.buffer_size)
+            else:
+                for number, step in enumerate(steps, 1):
+                    buffer.write(f"{number}. {_note(step)}\n")
+        finally:
+            if once:
+                notes.close()
+        self._close(buffer)
+        return count
+
+
+class JSONRenderer(Renderer):
+    """
+    One JSON object: {"title": ..., "steps": [...]}, a dictionary per step
+    with its number, kind and text (for a trace) or its description, work
+    and result (for solver steps). The numbers of a trace are in the text;
+    Trace.to_columns has them as numbers.
+    """
+
+    def render_trace(self, trace: Any, title: str = "Scratchpad Contents") -> int:
+        return self._render(title, ({"kind": KIND_NAMES[step.kind], "text": render(step.kind, step.args)}
+                                    for step in trace.steps()))
+
+    def render_steps(self, steps: Iterable[Dict[str, str]], title: str = "Solution Steps") -> int:
+        return self._render(title, steps)
+
+    def _render(self, title: str, steps: Iterable[Dict[str, str]]) -> int:
+        buffer = self._open()
+        buffer.write(f'{{"title": {json.dumps(title)}, "steps": [')
+        count = 0
+        for count, step in enumerate(steps, 1):
+            buffer.write(("\n  " if count == 1 else ",\n  ") + json.dumps({"step": count, **step}, ensure_ascii=False))
+        buffer.write("\n]}\n" if count else "]}\n")
+        self._close(buffer)
+        return count
+
+
+# Characters Markdown would read as formatting
+_MARKDOWN_SPECIAL = str.maketrans({c: "\\" + c for c in "\\`*_[]<>#|"})
+
+
+class MarkdownRenderer(Renderer):
+    """A heading and a numbered list, a step per item"""
+
+    def render_trace(self, trace: Any, title: str = "Scratchpad Contents") -> int:
+        return self._render(title, (line.strip() for line in trace))
+
+    def render_steps(self, steps: Iterable[Dict[str, str]], title: str = "Solution Steps") -> int:
+        return self._render(title, (_note(step) for step in steps))
+
+    def _render(self, title: str, lines: Iterable[str]) -> int:
+        buffer = self._open()
+        buffer.write(f"## {title.translate(_MARKDOWN_SPECIAL)}\n\n")
+        count = 0
+        for count, line in enumerate(lines, 1):
+            buffer.write(f"{count}. {line.translate(_MARKDOWN_SPECIAL)}\n")
+        self._close(buffer)
+        return count
+
+
+# LaTeX's special characters, and the math signs the solvers write
+_LATEX_SPECIAL = str.maketrans({
+    "\\": r"\textbackslash{}", "&": r"\&", "%": r"\%", "$": r"\$", "#": r"\#", "_": r"\_",
+    "{": r"\{", "}": r"\}", "~": r"\textasciitilde{}", "^": r"\textasciicircum{}", "<": r"$<$", ">": r"$>$",
+    "×": r"$\times$", "÷": r"$\div$", "·": r"$\cdot$", "±": r"$\pm$", "√": r"$\surd$",
+    "π": r"$\pi$", "Σ": r"$\Sigma$", "½": r"$\frac{1}{2}$", "⅓": r"$\frac{1}{3}$",
+    "²": r"$^2$", "³": r"$^3$", "⁴": r"$^4$", "₁": r"$_1$", "₂": r"$_2$", "₃": r"$_3$",
+})
+
+
+class LaTeXRenderer(Renderer):
+    """An unnumbered section with an enumerate list, a step per \\item"""
+
+    def render_trace(self, trace: Any, title: str = "Scratchpad Contents") -> int:
+        return self._render(title, (line.strip() for line in trace))
+
+    def render_steps(self, steps: Iterable[Dict[str, str]], title: str = "Solution Steps") -> int:
+        return self._render(title, (_note(step) for step in steps))
+
+    def _render(self, title: str, lines: Iterable[str]) -> int:
+        buffer = self._open()
+        buffer.write(f"\\section*{{{title.translate(_LATEX_SPECIAL)}}}\n")
+        count = 0
+        for count, line in enumerate(lines, 1):
+            if count == 1:
+                buffer.write("\\begin{enumerate}\n")  # An empty list is a LaTeX error
+            buffer.write(f"\\item{{}} {line.translate(_LATEX_SPECIAL)}\n")  # {} so "[START]" isn't read as a label
+        if count:
+            buffer.write("\\end{enumerate}\n")
+        self._close(buffer)
+        return count
+
+
+RENDERERS = {
+    "text": TextRenderer,
+    "json": JSONRenderer,
+    "markdown": MarkdownRenderer,
+    "latex": LaTeXRenderer,
+}
+
+
+def get_renderer(renderer: Any = None, out: Any = None) -> Renderer:
+    """A Renderer from a Renderer, a format name (see RENDERERS) or None (plain text)"""
+    if isinstance(renderer, Renderer):
+        return renderer
+    name = renderer or "text"
+    if name not in RENDERERS:
+        raise ValueError(f"Unknown format '{name}', expected one of {', '.join(RENDERERS)}")
+    return RENDERERS[name](out)
@@ -0,0 +1,153 @@
+"""
+Result Cache
+An optional on-disk cache of answers and their scratchpad steps, shared by
+every solver (and every worker process) that opens the same file, and kept
+across restarts.
+
+    cache = ResultCache("results.db", max_entries=1_000_000, ttl=24 * 3600)
+    agent = AIAgent(result_cache=cache)
+    solver = MathProblemSolver(result_cache=cache)
+
+The cache is a SQLite database in WAL mode, so any number of processes can
+read while one writes. Entries are keyed by the normalized problem (plus
+the solver settings that change the answer or its steps). When there are
+more than max_entries, the least recently used are removed; entries older
+than ttl seconds are not used any more.
+
+Values are pickled, so only open cache files you trust.
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    created REAL NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_used ON results (used);
+"""
+
+
+class ResultCache:
+    """Size-bounded LRU/TTL cache of solved problems in a SQLite file"""
+
+    def __init__(self, path: str, max_entries: int = 100_000, ttl: Optional[float] = None,
+                 timeout: float = 30.0, evict_every: int = 100, touch_after: float = 1.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl                  # Seconds an entry stays usable (None: forever)
+        self.timeout = timeout          # Seconds to wait for another process's write
+        self.evict_every = evict_every  # Check the size every this many writes
+        self.touch_after = touch_after  # Only record a use if the last one is older
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._connect()
+
+    def _connect(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.path, timeout=self.timeout,
+                                   isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def get(self, key: str) -> Any:
+        """The value stored for a key, or None"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created, used FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            if now - row[2] > self.touch_after:
+                self._db.execute("UPDATE results SET used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return pickle.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+        """Store a value, making room by dropping the least recently used entries"""
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                             (key, data, now, now))
+            self.writes += 1
+            if self.writes % self.evict_every == 0:
+                self._evict(now)
+
+    def evict(self) -> int:
+        """Drop expired entries and trim to max_entries now; returns how many went"""
+        with self._lock:
+            return self._evict(time.time())
+
+    def _evict(self, now: float) -> int:
+        removed = 0
+        if self.ttl is not None:
+            removed += self._db.execute(
+                "DELETE FROM results WHERE created < ?", (now - self.ttl,)).rowcount
+        extra = len(self) - self.max_entries
+        if extra > 0:
+            removed += self._db.execute(
+                "DELETE FROM results WHERE key IN "
+                "(SELECT key FROM results ORDER BY used LIMIT ?)", (extra,)).rowcount
+        self.evictions += removed
+        return removed
+
+    def clear(self) -> None:
+        """Remove every entry (for all processes) and reset the counters"""
+        with self._lock:
+            self._db.execute("DELETE FROM results")
+            self.hits = self.misses = self.writes = self.evictions = 0
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """How well the cache is doing (counts are for this process)"""
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "size": len(self),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    # Worker processes get the settings and open their own connection
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"path": self.path, "max_entries": self.max_entries, "ttl": self.ttl,
+                "timeout": self.timeout, "evict_every": self.evict_every,
+                "touch_after": self.touch_after}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)
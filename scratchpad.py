@@ -0,0 +1,657 @@
+"""
+Scratchpad Trace
+Step records for the agent's scratchpad. Each step is stored as a small
+record (a step kind plus its numbers) and only turned into text when
+someone actually looks at it, e.g. through show_scratchpad() or an export.
+The records themselves are kept in compact typed columns (see Trace), and
+BoundedTrace keeps them within a memory budget by spilling to a temporary file.
+"""
+
+import pickle
+import re
+import sys
+import tempfile
+import zlib
+from array import array
+from bisect import bisect_right
+from enum import IntEnum
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class Verbosity(IntEnum):
+    """How much of the work gets written down"""
+    OFF = 0      # Nothing at all, just compute the answer
+    SUMMARY = 1  # Input, final result and errors
+    DIGITS = 2   # Every digit step (the classic scratchpad)
+
+
+# Step kinds. Each kind has a text template and a verbosity level.
+(
+    INPUT,
+    TEXT,
+    ERROR,
+    ADD_DIGIT,
+    SET_CARRY,
+    FINAL_CARRY,
+    APPLY_BORROW,
+    NEED_BORROW,
+    SUB_DIGIT,
+    MUL_ROW,
+    MUL_DIGIT,
+    MUL_FINAL_CARRY,
+    PARTIAL_RESULT,
+    FINAL_RESULT,
+    MUL_FINAL_RESULT,
+    MUL_STRATEGY,
+    LIMB_ROW,
+    KARATSUBA_SPLIT,
+    KARATSUBA_LEAF,
+    KARATSUBA_COMBINE,
+    EXPR_NODE,
+    EXPR_VALUE,
+    DIV_STRATEGY,
+    DIV_DIGIT,
+    DIV_LIMB,
+    DIV_RECIPROCAL,
+    DIV_NEWTON,
+    DIV_ESTIMATE,
+    DIV_CORRECT,
+    DIV_RESULT,
+) = range(30)
+
+KIND_NAMES: Tuple[str, ...] = (
+    "input",
+    "text",
+    "error",
+    "add_digit",
+    "set_carry",
+    "final_carry",
+    "apply_borrow",
+    "need_borrow",
+    "sub_digit",
+    "mul_row",
+    "mul_digit",
+    "mul_final_carry",
+    "partial_result",
+    "final_result",
+    "mul_final_result",
+    "mul_strategy",
+    "limb_row",
+    "karatsuba_split",
+    "karatsuba_leaf",
+    "karatsuba_combine",
+    "expr_node",
+    "expr_value",
+    "div_strategy",
+    "div_digit",
+    "div_limb",
+    "div_reciprocal",
+    "div_newton",
+    "div_estimate",
+    "div_correct",
+    "div_result",
+)
+
+TEMPLATES: Tuple[str, ...] = (
+    "Input received: {0}",
+    "{0}",
+    "Error: {0}",
+    "Adding {0}: {1} + {2} + carry({3}) = {4}",
+    "Set carry to {0}",
+    "Final carry: {0}",
+    "Applied borrow: {0} becomes {1}",
+    "Need to borrow: {0} becomes {1}",
+    "Subtracting {0}: {1} - {2} = {3}",
+    "\nMultiplying by {0} at position {1}:",
+    "  {0} × {1} + carry({2}) = {3}",
+    "  Final carry: {0}",
+    "Partial result: {0}",
+    "Final result: {0}",
+    "\nFinal result: {0}",
+    "Multiplying {0}-digit by {1}-digit numbers using {2}",
+    "\nMultiplying by limb {0} at limb position {1} (base 10^{2}):",
+    "{0}Splitting {1}-digit numbers at {2} digits",
+    "{0}{1} × {2} = {3}",
+    "{0}Combining: {1}·10^{2} + {3}·10^{4} + {5} = {6}",
+    "\nWorking out {0} {1} {2}:",
+    "{0} {1} {2} = {3}",
+    "Dividing {0}-digit by {1}-digit numbers using {2}",
+    "Bringing down {0}: {1} ÷ {2} = {3} remainder {4}",
+    "Bringing down limb {0}: {1} ÷ {2} = {3} remainder {4} (base 10^{5})",
+    "Reciprocal of the divisor to {0} digits, worked out directly",
+    "Newton step: reciprocal of the divisor to {0} digits",
+    "Quotient from the reciprocal: {0}",
+    "Correcting the quotient by {0}: {1}",
+    "Quotient: {0}, remainder: {1}",
+)
+
+LEVELS: Tuple[int, ...] = (
+    Verbosity.SUMMARY,  # input
+    Verbosity.SUMMARY,  # text
+    Verbosity.SUMMARY,  # error
+    Verbosity.DIGITS,   # add_digit
+    Verbosity.DIGITS,   # set_carry
+    Verbosity.DIGITS,   # final_carry
+    Verbosity.DIGITS,   # apply_borrow
+    Verbosity.DIGITS,   # need_borrow
+    Verbosity.DIGITS,   # sub_digit
+    Verbosity.DIGITS,   # mul_row
+    Verbosity.DIGITS,   # mul_digit
+    Verbosity.DIGITS,   # mul_final_carry
+    Verbosity.DIGITS,   # partial_result
+    Verbosity.SUMMARY,  # final_result
+    Verbosity.SUMMARY,  # mul_final_result
+    Verbosity.DIGITS,   # mul_strategy
+    Verbosity.DIGITS,   # limb_row
+    Verbosity.DIGITS,   # karatsuba_split
+    Verbosity.DIGITS,   # karatsuba_leaf
+    Verbosity.DIGITS,   # karatsuba_combine
+    Verbosity.DIGITS,   # expr_node
+    Verbosity.DIGITS,   # expr_value
+    Verbosity.DIGITS,   # div_strategy
+    Verbosity.DIGITS,   # div_digit
+    Verbosity.DIGITS,   # div_limb
+    Verbosity.DIGITS,   # div_reciprocal
+    Verbosity.DIGITS,   # div_newton
+    Verbosity.DIGITS,   # div_estimate
+    Verbosity.DIGITS,   # div_correct
+    Verbosity.DIGITS,   # div_result
+)
+
+# Kinds whose first number is a digit position (1 = units)
+POSITION_KINDS = frozenset({ADD_DIGIT, SUB_DIGIT})
+
+# Kinds whose first number is a recursion depth, shown as indentation
+DEPTH_KINDS = frozenset({KARATSUBA_SPLIT, KARATSUBA_LEAF, KARATSUBA_COMBINE})
+
+
+def position_name(position: int) -> str:
+    """Turn a digit position into words: 1 -> 'units', 2 -> 'position 2'"""
+    return "units" if position == 1 else f"position {position}"
+
+
+def render(kind: int, args: tuple) -> str:
+    """Turn one step record into its scratchpad line"""
+    if kind in POSITION_KINDS:
+        args = (position_name(args[0]),) + args[1:]
+    elif kind in DEPTH_KINDS:
+        args = ("  " * args[0],) + args[1:]
+    try:
+        return TEMPLATES[kind].format(*args)
+    except ValueError:
+        # Numbers past Python's str() limit need the digit engine
+        from digit_engine import to_digits
+        return TEMPLATES[kind].format(*(to_digits(a) if isinstance(a, int) else a for a in args))
+
+
+def run_steps(steps: Iterator[Tuple[int, tuple]], record: Any = None) -> Any:
+    """
+    Run a step generator to the end, handing every (kind, args) step it
+    yields to record(kind, *args), and return the generator's own result.
+    """
+    while True:
+        try:
+            kind, args = next(steps)
+        except StopIteration as done:
+            return done.value
+        if record is not None:
+            record(kind, *args)
+
+
+class Step:
+    """A single step record: what kind of step it was and its numbers"""
+    __slots__ = ("kind", "args")
+
+    def __init__(self, kind: int, args: tuple):
+        self.kind = kind
+        self.args = args
+
+    @property
+    def name(self) -> str:
+        return KIND_NAMES[self.kind]
+
+    @property
+    def text(self) -> str:
+        return render(self.kind, self.args)
+
+    def __str__(self) -> str:
+        return self.text
+
+    def __repr__(self) -> str:
+        return f"Step({self.name}, {self.args!r})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Step):
+            return NotImplemented
+        return self.kind == other.kind and self.args == other.args
+
+
+class SolveResult(NamedTuple):
+    """
+    The outcome of one problem. The trace, when there is one, is the work
+    in its compact form, formatted only when read:
+    - AIAgent problems: a TraceReader (Trace, BoundedTrace or
+      virtual_trace.VirtualTrace), which reads like a list of lines
+    - MathProblemSolver problems: the StepLog (step dictionaries) from
+      solve(), or its Notes (lines) from solve_batch
+    """
+    problem: Any
+    result: Any
+    error: Optional[str] = None  # Error message, if the problem failed
+    trace: Any = None            # The work, if asked for (see above)
+
+
+# Argument columns: numbers up to SMALL_MAX take a single byte; the three
+# byte values above it mark arguments kept in a wider column instead
+SMALL_MAX = 252
+MEDIUM = 253      # A 32-bit number (e.g. a digit position), in the medium column
+WIDE = 254        # A 64-bit integer, kept in the wide column
+OBJECT = 255      # Anything else (text, huge numbers), kept in the object list
+CHECKPOINT = 64   # Column offsets are saved every CHECKPOINT steps
+_I64_MIN, _I64_MAX = -2 ** 63, 2 ** 63 - 1
+_ESCAPES = re.compile(b"[\xfd-\xff]")
+
+
+class TraceReader:
+    """
+    Reading a scratchpad: iteration, indexing and slicing (as lines of
+    text), raw Step records and exports. Subclasses provide len() and
+    _records(start, stop), the (kind, args) records of steps start..stop-1.
+    """
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def _records(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, tuple]]:
+        raise NotImplementedError
+
+    def count(self, kind: int, start: int = 0) -> int:
+        """How many steps of one kind there are (from step `start` on)"""
+        return sum(1 for record in self._records(start) if record[0] == kind)
+
+    def steps(self, start: int = 0) -> Iterator[Step]:
+        """Iterate over the raw step records (from step `start` on)"""
+        for kind, args in self._records(start):
+            yield Step(kind, args)
+
+    def step(self, index: int) -> Step:
+        """One raw step record"""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("trace index out of range")
+        return Step(*next(self._records(index, index + 1)))
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __iter__(self) -> Iterator[str]:
+        for kind, args in self._records():
+            yield render(kind, args)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, stride = index.indices(len(self))
+            if stride == 1:
+                return [render(kind, args) for kind, args in self._records(start, stop)]
+            return [self.step(i).text for i in range(start, stop, stride)]
+        return self.step(index).text
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (TraceReader, list)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def to_list(self) -> List[str]:
+        """Export the scratchpad as a list of strings"""
+        return list(self)
+
+    def to_text(self, sep: str = "\n") -> str:
+        """Export the scratchpad as one string"""
+        return sep.join(self)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Export the scratchpad as structured step dictionaries"""
+        return [
+            {"kind": KIND_NAMES[kind], "args": list(args), "text": render(kind, args)}
+            for kind, args in self._records()
+        ]
+
+
+class Trace(TraceReader):
+    """
+    The scratchpad. Behaves like a list of step strings (len, iteration,
+    indexing, append), but only formats text on demand.
+
+    Steps are stored in columns rather than as Python objects: a byte per
+    step for its kind (the template) and its argument count, and a byte
+    per argument for the small numbers that make up nearly every step
+    (digits, carries, sums). Bigger numbers go to a 32-bit or 64-bit
+    column and anything else to a plain list. A step costs a few bytes instead of the
+    ~100 a formatted line takes.
+    """
+
+    def __init__(self, verbosity: int = Verbosity.DIGITS):
+        self.verbosity = Verbosity(verbosity)
+        self._start_columns()
+
+    def _start_columns(self) -> None:
+        self._kinds = array("B")
+        self._counts = array("B")   # Arguments per step
+        self._small = array("B")    # One byte per argument
+        self._medium = array("I")
+        self._wide = array("q")
+        self._objects: List[Any] = []
+        self._object_bytes = 0      # Memory taken by the values in _objects
+        self._marks = array("Q")    # Column offsets at every checkpoint step
+
+    def record(self, kind: int, *args: Any) -> None:
+        """Write down one step, if the verbosity level asks for it"""
+        if LEVELS[kind] <= self.verbosity:
+            kinds = self._kinds
+            if not len(kinds) % CHECKPOINT:
+                self._checkpoint()
+                kinds = self._kinds
+            kinds.append(kind)
+            self._counts.append(len(args))
+            small = self._small
+            start = len(small)
+            try:
+                small.extend(args)
+                packed = not args or max(args) <= SMALL_MAX
+            except (TypeError, OverflowError):
+                packed = False
+            if not packed:
+                del small[start:]
+                self._pack(args)
+
+    def _checkpoint(self) -> None:
+        """Save where the next step starts in every column"""
+        self._marks.extend((len(self._small), len(self._medium), len(self._wide), len(self._objects)))
+
+    def _pack(self, args: tuple) -> None:
+        small = self._small
+        for value in args:
+            if type(value) is int and 0 <= value <= SMALL_MAX:
+                small.append(value)
+            elif type(value) is int and 0 <= value <= 0xFFFFFFFF:
+                small.append(MEDIUM)
+                self._medium.append(value)
+            elif type(value) is int and _I64_MIN <= value <= _I64_MAX:
+                small.append(WIDE)
+                self._wide.append(value)
+            else:
+                small.append(OBJECT)
+                self._objects.append(value)
+                self._object_bytes += sys.getsizeof(value)
+
+    def append(self, text: str) -> None:
+        """Write down a free-form line of text"""
+        self.record(TEXT, text)
+
+    def clear(self) -> None:
+        """Throw away all steps"""
+        for column in (self._kinds, self._counts, self._small, self._medium, self._wide, self._marks):
+            del column[:]
+        self._objects.clear()
+        self._object_bytes = 0
+
+    def count(self, kind: int, start: int = 0) -> int:
+        """How many steps of one kind were written down (from step `start` on)"""
+        kinds = self._kinds if start == 0 else self._kinds[start:]
+        return kinds.count(kind)
+
+    def _locate(self, index: int) -> List[int]:
+        """Where step `index` starts in the small, medium, wide and object columns"""
+        mark = index // CHECKPOINT
+        offsets = self._marks[4 * mark:4 * mark + 4].tolist()
+        first = mark * CHECKPOINT
+        if index > first:
+            skipped = sum(self._counts[first:index])
+            values = self._small[offsets[0]:offsets[0] + skipped]
+            offsets[0] += skipped
+            offsets[1] += values.count(MEDIUM)
+            offsets[2] += values.count(WIDE)
+            offsets[3] += values.count(OBJECT)
+        return offsets
+
+    def _records(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, tuple]]:
+        """The (kind, args) records of steps start..stop-1, rebuilt from the columns"""
+        stop = len(self._kinds) if stop is None else stop
+        if start >= stop:
+            return
+        small_at, *others = self._locate(start)
+        columns = (self._medium, self._wide, self._objects)
+        kinds, counts, small = self._kinds, self._counts, self._small
+        for index in range(start, stop):
+            end = small_at + counts[index]
+            args = tuple(small[small_at:end])
+            small_at = end
+            if args and max(args) > SMALL_MAX:
+                values = []
+                for value in args:
+                    if value > SMALL_MAX:
+                        column = value - MEDIUM
+                        value = columns[column][others[column]]
+                        others[column] += 1
+                    values.append(value)
+                args = tuple(values)
+            yield kinds[index], args
+
+    def __len__(self) -> int:
+        return len(self._kinds)
+
+    def __repr__(self) -> str:
+        return f"Trace({len(self)} steps, verbosity={self.verbosity.name})"
+
+    @property
+    def nbytes(self) -> int:
+        """Memory taken by the step columns, the objects list and the values in it"""
+        arrays = (self._kinds, self._counts, self._small, self._medium, self._wide, self._marks)
+        return sum(len(a) * a.itemsize for a in arrays) + sys.getsizeof(self._objects) + self._object_bytes
+
+    def to_columns(self) -> Dict[str, Any]:
+        """
+        Export the scratchpad as columns, for analysis without any text:
+        - kind:      step kind per step (array of bytes, see KIND_NAMES)
+        - arg_count: number of arguments per step
+        - args:      every argument of every step in order, as 64-bit ints
+        - objects:   {position in args: value} for the arguments that are
+                     not 64-bit ints (text, huge numbers); they are 0 in args
+        The arrays can be handed to numpy.frombuffer without copying.
+        """
+        args = array("q", self._small)
+        objects: Dict[int, Any] = {}
+        medium, wide, others = iter(self._medium), iter(self._wide), iter(self._objects)
+        for match in _ESCAPES.finditer(self._small.tobytes()):
+            position = match.start()
+            tag = args[position]
+            if tag == MEDIUM:
+                args[position] = next(medium)
+            elif tag == WIDE:
+                args[position] = next(wide)
+            else:
+                args[position] = 0
+                objects[position] = next(others)
+        return {"kind": array("B", self._kinds), "arg_count": array("B", self._counts),
+                "args": args, "objects": objects}
+
+
+MEMORY_BUDGET = 64 * 2 ** 20  # Default bytes of steps a bounded scratchpad keeps in memory
+BLOCK_STEPS = 256 * CHECKPOINT  # Steps per block of a bounded scratchpad
+
+
+class SpilledBlocks:
+    """
+    The full blocks of a bounded scratchpad, in order, kept within a memory
+    budget: the newest blocks stay in memory, and older ones are compressed
+    into a temporary file, deleted when the scratchpad is. The first block
+    (the one with the input) is kept as long as anything is, so it goes to
+    the file last. Any block can be read back by its number.
+    """
+
+    def __init__(self, memory_budget: int = MEMORY_BUDGET, directory: Optional[str] = None):
+        self.memory_budget = memory_budget
+        self.directory = directory  # Where the temporary file goes (None: the system default)
+        self.nbytes = 0             # Memory taken by the blocks kept in memory
+        self.spilled_bytes = 0      # Size of the temporary file
+        self._count = 0
+        self._kept: Dict[int, Tuple[Any, int]] = {}     # number: (block, nbytes), oldest first
+        self._spans: Dict[int, Tuple[int, int]] = {}    # number: (offset, length) of spilled blocks
+        self._file: Any = None
+        self._last: Tuple[int, Any] = (-1, None)  # The block read back last
+
+    def add(self, block: Any, nbytes: int, reserve: Optional[int] = None) -> None:
+        """
+        Keep a full block, spilling older ones until the budget leaves room
+        for `reserve` more bytes (by default: another block like this one)
+        """
+        self._kept[self._count] = (block, nbytes)
+        self._count += 1
+        self.nbytes += nbytes
+        self.make_room(nbytes if reserve is None else reserve)
+
+    def make_room(self, reserve: int) -> None:
+        """Spill blocks, oldest first (the first block last), until `reserve` more bytes fit in the budget"""
+        while self._kept and self.nbytes + reserve > self.memory_budget:
+            numbers = iter(self._kept)
+            number = next(numbers)
+            if number == 0 and len(self._kept) > 1:
+                number = next(numbers)
+            self._spill(number)
+
+    def _spill(self, number: int) -> None:
+        block, nbytes = self._kept.pop(number)
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(dir=self.directory)
+        data = zlib.compress(pickle.dumps(block, pickle.HIGHEST_PROTOCOL), 1)
+        self._file.seek(self.spilled_bytes)
+        self._file.write(data)
+        self._spans[number] = (self.spilled_bytes, len(data))
+        self.spilled_bytes += len(data)
+        self.nbytes -= nbytes
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def spilled(self) -> int:
+        """How many blocks are in the temporary file"""
+        return len(self._spans)
+
+    def __getitem__(self, number: int) -> Any:
+        kept = self._kept.get(number)
+        if kept is not None:
+            return kept[0]
+        if self._last[0] != number:
+            offset, length = self._spans[number]
+            self._file.seek(offset)
+            self._last = (number, pickle.loads(zlib.decompress(self._file.read(length))))
+        return self._last[1]
+
+    def clear(self) -> None:
+        """Throw every block away, the temporary file too"""
+        if self._file is not None:
+            self._file.close()
+        self.__init__(self.memory_budget, self.directory)
+
+
+class BoundedTrace(Trace):
+    """
+    A Trace that keeps to a memory budget, for problems with more steps
+    than fit in memory. Steps are written down in blocks of up to
+    `block_steps`; as many of the newest blocks as the budget allows stay
+    in memory, and the rest is compressed into a temporary file (see
+    SpilledBlocks). Reading the trace - iteration, indexing, exports,
+    show_scratchpad - works as usual and reads spilled blocks back as it
+    goes.
+
+    The budget counts everything in memory, the block being written too.
+    It is checked every CHECKPOINT steps and after every step that stores
+    a big value, and when the block being written doesn't fit next to the
+    others it is closed early and spilled. So the only steps that can go
+    over the budget are the small ones since the last checkpoint, or a
+    single value bigger than the budget itself.
+    """
+
+    def __init__(self, verbosity: int = Verbosity.DIGITS, memory_budget: int = MEMORY_BUDGET,
+                 block_steps: int = BLOCK_STEPS, directory: Optional[str] = None):
+        super().__init__(verbosity)
+        self.block_steps = -(-block_steps // CHECKPOINT) * CHECKPOINT
+        self.blocks = SpilledBlocks(memory_budget, directory)
+        self._firsts = array("Q", [0])  # First step of every block, the one being written last
+
+    def _checkpoint(self) -> None:
+        self._fit()
+        super()._checkpoint()
+
+    def _pack(self, args: tuple) -> None:
+        object_bytes = self._object_bytes
+        super()._pack(args)
+        if self._object_bytes != object_bytes:
+            self._fit()
+
+    def _fit(self) -> None:
+        """Make room for the block being written, closing it if it is full or too big to keep"""
+        used = Trace.nbytes.fget(self)
+        full = len(self._kinds) >= self.block_steps
+        if not full and self.blocks.nbytes + used <= self.blocks.memory_budget:
+            return
+        self.blocks.make_room(used)
+        if full or self.blocks.nbytes + used > self.blocks.memory_budget:
+            # The columns so far become a full block; start new ones
+            block = Trace(self.verbosity)
+            (block._kinds, block._counts, block._small, block._medium, block._wide,
+             block._objects, block._object_bytes, block._marks) = (
+                self._kinds, self._counts, self._small, self._medium, self._wide,
+                self._objects, self._object_bytes, self._marks)
+            self._firsts.append(self._firsts[-1] + len(block))
+            self._start_columns()
+            self.blocks.add(block, used)
+
+    def _block(self, number: int) -> Trace:
+        """Block `number`; the one after the full blocks is the one being written"""
+        return self if number == len(self.blocks) else self.blocks[number]
+
+    def __len__(self) -> int:
+        return self._firsts[-1] + len(self._kinds)
+
+    def _records(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, tuple]]:
+        stop = len(self) if stop is None else stop
+        number = bisect_right(self._firsts, start) - 1
+        while start < stop:
+            first = self._firsts[number]
+            end = min(stop, self._firsts[number + 1] if number < len(self.blocks) else stop)
+            yield from Trace._records(self._block(number), start - first, end - first)
+            start, number = end, number + 1
+
+    def count(self, kind: int, start: int = 0) -> int:
+        total = 0
+        for number in range(bisect_right(self._firsts, start) - 1, len(self.blocks) + 1):
+            total += Trace.count(self._block(number), kind, max(start - self._firsts[number], 0))
+        return total
+
+    def clear(self) -> None:
+        super().clear()
+        self.blocks.clear()
+        self._firsts = array("Q", [0])
+
+    @property
+    def nbytes(self) -> int:
+        """Memory taken by the steps kept in memory, the block being written too (see spilled_bytes for the rest)"""
+        return self.blocks.nbytes + Trace.nbytes.fget(self)
+
+    @property
+    def spilled_bytes(self) -> int:
+        """Size of the compressed steps in the temporary file"""
+        return self.blocks.spilled_bytes
+
+    def to_columns(self) -> Dict[str, Any]:
+        columns = Trace.to_columns(self._block(0))
+        for number in range(1, len(self.blocks) + 1):
+            more = Trace.to_columns(self._block(number))
+            offset = len(columns["args"])
+            for name in ("kind", "arg_count", "args"):
+                columns[name].extend(more[name])
+            columns["objects"].update({offset + position: value for position, value in more["objects"].items()})
+        return columns
@@ -0,0 +1,353 @@
+"""
+Solve Server
+An asyncio server that solves problems for many clients at once without
+ever running a digit loop on the event loop.
+
+Protocol: newline-delimited JSON over TCP. Each request line is either a
+bare problem ("123+456") or an object like
+    {"id": 7, "problem": "2x + 3 = 7", "solver": "math", "trace": true}
+For every request the server sends back the scratchpad steps (if trace is
+on) as {"id": 7, "step": "..."} lines, then one final line
+    {"id": 7, "result": 2.0, "error": null}
+Responses on a connection come back in the order the requests were sent.
+Steps are streamed: the worker sends them on in small groups while it is
+still solving, so the first lines of a huge trace reach the client long
+before the answer does, and no process ever holds the whole trace.
+
+How it keeps latency bounded:
+- Requests are sorted into a "cheap" and a "heavy" lane by size, each with
+  its own bounded queue, so a few huge multiplications can't hold up the
+  flood of small problems behind them.
+- Each lane collects requests into small batches (up to batch_size, waiting
+  at most batch_wait seconds) and hands them to a process pool; the heavy
+  lane may only use part of the pool.
+- When a lane's queue is full, the server stops reading from the clients
+  that feed it until there is room again (backpressure through TCP).
+
+Usage:
+    python server.py --port 8765 --workers 8
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from math_solver import Notes
+from parallel import SOLVERS
+from pipeline import jsonable
+from scratchpad import SolveResult
+
+# Solvers owned by this worker process, created on first use
+_worker_solvers: Dict[str, Any] = {}
+
+# Steps a worker collects before sending them on (one message per group)
+STEP_GROUP = 64
+
+
+def _worker_solver(solver: str) -> Any:
+    instance = _worker_solvers.get(solver)
+    if instance is None:
+        instance = _worker_solvers[solver] = SOLVERS[solver]()
+    return instance
+
+
+def _solve_jobs(solver: str, problems: List[Any], trace: bool) -> List[SolveResult]:
+    return _worker_solver(solver).solve_batch(problems, trace)
+
+
+def _stream_jobs(solver: str, jobs: List[Tuple[int, Any]], channel: Any) -> None:
+    """
+    Solve (key, problem) jobs one step at a time, putting (key, lines, None)
+    on the channel for every STEP_GROUP steps and (key, lines, SolveResult)
+    once a problem is done
+    """
+    instance = _worker_solver(solver)
+    for key, problem in jobs:
+        lines = []
+        for item in instance.solve_iter(problem):
+            if isinstance(item, SolveResult):
+                channel.put((key, lines, item))
+                break
+            # Agent steps are Step objects, math steps are step dictionaries
+            lines.append(Notes._note(item) if isinstance(item, dict) else str(item))
+            if len(lines) == STEP_GROUP:
+                channel.put((key, lines, None))
+                lines = []
+
+
+class SolveServer:
+    """Micro-batching solve server with a cheap and a heavy lane"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, workers: int = 4,
+                 max_queue: int = 10_000, batch_size: int = 256, batch_wait: float = 0.002,
+                 cheap_length: int = 64, max_in_flight: int = 1024,
+                 max_line_bytes: int = 16 * 2 ** 20, executor: Optional[Executor] = None):
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.cheap_length = cheap_length      # Longer problems go to the heavy lane
+        self.max_in_flight = max_in_flight    # Unanswered requests per connection
+        self.max_line_bytes = max_line_bytes  # Longest request line we accept
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._lanes: Dict[str, asyncio.Queue] = {}
+        self._tasks: set = set()
+        # Streamed steps come back from the workers on one channel, and a
+        # relay thread hands them to the loop, to the stream of their request
+        self._manager: Any = None
+        self._channel: Any = None
+        self._relay: Optional[threading.Thread] = None
+        self._streams: Dict[int, asyncio.Queue] = {}
+        self._next_key = 0
+
+    async def start(self) -> None:
+        """Start listening (port 0 picks a free port, see self.port)"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._manager = multiprocessing.Manager()
+        self._channel = self._manager.Queue()
+        self._relay = threading.Thread(target=self._forward, args=(asyncio.get_running_loop(),),
+                                       daemon=True)
+        self._relay.start()
+        self._lanes = {
+            "cheap": asyncio.Queue(self.max_queue),
+            "heavy": asyncio.Queue(self.max_queue),
+        }
+        heavy_slots = max(1, self.workers // 2)
+        self._spawn(self._batcher(self._lanes["cheap"], self.batch_size, self.workers))
+        self._spawn(self._batcher(self._lanes["heavy"], 1, heavy_slots))
+        self._server = await asyncio.start_server(self._handle, self.host, self.port,
+                                                  limit=self.max_line_bytes)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._owns_executor and self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+        if self._relay is not None:
+            self._channel.put(None)
+            await asyncio.get_running_loop().run_in_executor(None, self._relay.join)
+            self._manager.shutdown()
+            self._relay = self._manager = self._channel = None
+            self._streams.clear()
+
+    def _forward(self, loop: asyncio.AbstractEventLoop) -> None:
+        """The relay thread: pass everything from the channel on to the loop"""
+        while True:
+            message = self._channel.get()
+            if message is None:
+                return
+            loop.call_soon_threadsafe(self._deliver, *message)
+
+    def _deliver(self, key: int, lines: List[str], result: Optional[SolveResult]) -> None:
+        stream = self._streams.get(key)
+        if stream is None:  # Already answered (e.g. with a server error)
+            return
+        if lines:
+            stream.put_nowait(lines)
+        if result is not None:
+            del self._streams[key]
+            stream.put_nowait(result)
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    def _spawn(self, coroutine) -> asyncio.Task:
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def lane_for(self, problem: Any) -> str:
+        """Guess how expensive a problem is from its length"""
+        if isinstance(problem, str) and len(problem) > self.cheap_length:
+            return "heavy"
+        return "cheap"
+
+    @staticmethod
+    def parse_request(line: bytes) -> Tuple[Any, Any, str, bool]:
+        """(id, problem, solver, trace) from one request line"""
+        text = line.decode("utf-8").strip()
+        try:
+            request = json.loads(text)
+        except ValueError:
+            return None, text, "agent", False
+        if not isinstance(request, dict):
+            return None, request, "agent", False
+        problem = request.get("problem")
+        if isinstance(problem, list):
+            problem = tuple(problem)
+        return request.get("id"), problem, request.get("solver", "agent"), bool(request.get("trace"))
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        handler = asyncio.current_task()
+        self._tasks.add(handler)
+        responses: asyncio.Queue = asyncio.Queue(self.max_in_flight)
+        sender = self._spawn(self._send(responses, writer))
+        try:
+            async for line in reader:
+                if not line.strip():
+                    continue
+                request_id, problem, solver, trace = self.parse_request(line)
+                # Groups of step lines, then the SolveResult
+                stream: asyncio.Queue = asyncio.Queue()
+                await responses.put((request_id, stream))
+                if solver not in SOLVERS:
+                    stream.put_nowait(SolveResult(problem, None, f"Unknown solver '{solver}'"))
+                    continue
+                # Waits here while the lane is full: that's the backpressure
+                await self._lanes[self.lane_for(problem)].put((solver, problem, trace, stream))
+        except (ConnectionError, ValueError):  # Dropped connection or line too long
+            pass
+        except asyncio.CancelledError:  # Server is stopping
+            sender.cancel()
+            writer.close()
+            return
+        finally:
+            self._tasks.discard(handler)
+        await responses.put(None)
+        try:
+            await sender
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        writer.close()
+
+    async def _send(self, responses: asyncio.Queue, writer: asyncio.StreamWriter) -> None:
+        while True:
+            item = await responses.get()
+            if item is None:
+                return
+            request_id, stream = item
+            while True:
+                result = await stream.get()
+                if isinstance(result, SolveResult):
+                    break
+                for step in result:
+                    writer.write(_encode({"id": request_id, "step": step}))
+                await writer.drain()
+            writer.write(_encode({"id": request_id, "result": jsonable(result.result),
+                                  "error": result.error}))
+            await writer.drain()
+
+    async def _batcher(self, queue: asyncio.Queue, batch_size: int, slots: int) -> None:
+        loop = asyncio.get_running_loop()
+        running = asyncio.Semaphore(slots)
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < batch_size:
+                try:
+                    batch.append(queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await running.acquire()
+            self._spawn(self._run_batch(batch, running))
+
+    async def _run_batch(self, batch: List[tuple], running: asyncio.Semaphore) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            groups: Dict[Tuple[str, bool], List[tuple]] = {}
+            for job in batch:
+                groups.setdefault((job[0], job[2]), []).append(job)
+            for (solver, trace), jobs in groups.items():
+                if trace:
+                    await self._stream_batch(solver, jobs)
+                    continue
+                try:
+                    results = await loop.run_in_executor(
+                        self._executor, _solve_jobs, solver, [job[1] for job in jobs], False)
+                except Exception as e:
+                    results = [SolveResult(job[1], None, f"Server error: {e}") for job in jobs]
+                for job, result in zip(jobs, results):
+                    job[3].put_nowait(result)
+        finally:
+            running.release()
+
+    async def _stream_batch(self, solver: str, jobs: List[tuple]) -> None:
+        """Solve traced jobs in a worker, their steps arriving through the relay while it runs"""
+        keyed = []
+        for job in jobs:
+            self._next_key += 1
+            self._streams[self._next_key] = job[3]
+            keyed.append((self._next_key, job[1]))
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, _stream_jobs, solver, keyed, self._channel)
+        except Exception as e:
+            # Jobs the worker didn't finish get the error (steps already sent stay sent)
+            for key, problem in keyed:
+                stream = self._streams.pop(key, None)
+                if stream is not None:
+                    stream.put_nowait(SolveResult(problem, None, f"Server error: {e}"))
+
+
+def _encode(message: Dict[str, Any]) -> bytes:
+    return (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+async def request(host: str, port: int, problems: List[Any], solver: str = "agent",
+                  trace: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """A small client: send problems over one connection and yield every response line"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for request_id, problem in enumerate(problems):
+            writer.write(_encode({"id": request_id, "problem": problem,
+                                  "solver": solver, "trace": trace}))
+        await writer.drain()
+        remaining = len(problems)
+        while remaining:
+            line = await reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            if "step" not in message:
+                remaining -= 1
+            yield message
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Run the asyncio solve server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-queue", type=int, default=10_000)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--batch-wait", type=float, default=0.002, help="Seconds to wait for a batch to fill")
+    parser.add_argument("--cheap-length", type=int, default=64, help="Longer problems use the heavy lane")
+    args = parser.parse_args(argv)
+    server = SolveServer(args.host, args.port, args.workers, args.max_queue,
+                         args.batch_size, args.batch_wait, args.cheap_length)
+    asyncio.run(server.serve_forever())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
+import ai_agent
 from ai_agent import AIAgent
+from scratchpad import Verbosity
 
 def test_basic_addition():
     agent = AIAgent()
@@ -104,7 +108,7 @@ def test_invalid_inputs():
     result = agent.solve_problem()
     assert result is None
     
-    # Multiple operations
+    # Multiple operations whose result goes below zero
     agent.receive_input("123+456-789")
     result = agent.solve_problem()
     assert result is None
@@ -137,6 +141,133 @@ def test_complex_operations():
     result = agent.solve_problem()
     assert result == 10000
 
+def test_operations_table():
+    agent = AIAgent()
+    agent.supported_operations['+'] = lambda num1, num2: agent._finish(num1 * 10 + num2)
+    agent.receive_input("12+3")
+    assert agent.solve_problem() == 123 and agent.output == 123
+    assert agent.scratchpad.to_list() == ["Input received: 12+3", "Final result: 123"]
+    
+    # Errors are written down as before, and expressions don't use the table
+    agent.receive_input("12-30")
+    assert agent.solve_problem() is None and agent.output is None
+    assert agent.scratchpad.to_list()[-1].startswith("Error: First number")
+    agent.receive_input("1+2+3")
+    assert agent.solve_problem() == 6
+
+def test_scratchpad_text():
+    agent = AIAgent()
+    agent.receive_input("999+1")
+    agent.solve_problem()
+    assert list(agent.scratchpad) == [
+        "Input received: 999+1",
+        "Adding units: 9 + 1 + carry(1) = 10",
+        "Set carry to 1",
+        "Adding position 2: 9 + 0 + carry(1) = 10",
+        "Set carry to 1",
+        "Adding position 3: 9 + 0 + carry(1) = 10",
+        "Set carry to 1",
+        "Final carry: 1",
+        "Final result: 1000",
+    ]
+    assert agent.scratchpad[-1] == "Final result: 1000"
+    assert agent.scratchpad.to_dicts()[0]["kind"] == "input"
+
+def test_scratchpad_verbosity():
+    # Summary keeps the input and the answer only
+    agent = AIAgent(verbosity=Verbosity.SUMMARY)
+    agent.receive_input("999*999")
+    assert agent.solve_problem() == 998001
+    assert agent.scratchpad.to_list() == [
+        "Input received: 999*999",
+        "\nFinal result: 998001",
+    ]
+    
+    # Off writes nothing down at all
+    agent = AIAgent(verbosity=Verbosity.OFF)
+    agent.receive_input("2000-999")
+    assert agent.solve_problem() == 1001
+    assert len(agent.scratchpad) == 0
+    
+    # Errors still surface through the return value
+    agent.receive_input("100-200")
+    assert agent.solve_problem() is None
+
+def test_multiplication_strategies():
+    # Every strategy gets the same answer
+    for strategy in ["digits", "limbs", "karatsuba", "native", "auto"]:
+        agent = AIAgent(multiplication_strategy=strategy)
+        agent.receive_input("123456789*98765")
+        assert agent.solve_problem() == 123456789 * 98765
+    
+    # Limbs show their work a chunk of digits at a time
+    agent = AIAgent(multiplication_strategy="limbs")
+    agent.receive_input("123456789*98765")
+    agent.solve_problem()
+    assert "Multiplying by limb 8765 at limb position 0 (base 10^4):" in agent.scratchpad[2]
+    
+    # Long operands switch to Karatsuba automatically
+    agent = AIAgent()
+    agent.receive_input("9" * 500 + "*" + "8" * 450)
+    assert agent.solve_problem() == int("9" * 500) * int("8" * 450)
+    assert agent.scratchpad[1].endswith("using karatsuba")
+    
+    # Unknown strategies are rejected up front
+    with pytest.raises(ValueError):
+        AIAgent(multiplication_strategy="fft")
+
+def test_solve_batch():
+    agent = AIAgent()
+    results = agent.solve_batch(["123+456", "1000-1", "999*999", "abc+def", "100-200", "1+2+3"])
+    assert [r.result for r in results] == [579, 999, 998001, None, None, 6]
+    assert results[0].error is None and results[0].trace is None
+    assert results[3].error == "Invalid number format"
+    assert results[4].error == "First number must be greater than or equal to second number"
+    
+    # Traces come back in bulk when asked for
+    results = agent.solve_batch(["999+1", "12*34"], trace=True)
+    assert results[0].trace[-1] == "Final result: 1000"
+    assert results[1].result == 408
+    assert agent.scratchpad.verbosity == Verbosity.DIGITS
+
+def test_solve_iter():
+    agent = AIAgent()
+    agent.receive_input("999+1")
+    agent.solve_problem()
+    
+    # Same steps as the scratchpad, one at a time, then the result
+    *steps, result = AIAgent().solve_iter("999+1")
+    assert [step.text for step in steps] == agent.scratchpad.to_list()
+    assert result.result == 1000 and result.error is None
+    
+    # Errors are the last step
+    *steps, result = AIAgent().solve_iter("5-9")
+    assert steps[-1].text.startswith("Error:")
+    assert result.error == "First number must be greater than or equal to second number"
+    
+    # Stopping early skips the rest of a huge problem
+    steps = AIAgent().solve_iter("9" * 100000 + "+1")
+    assert next(steps).text == "Input received: " + "9" * 100000 + "+1"
+    assert next(steps).text == "Adding units: 9 + 1 + carry(1) = 10"
+    steps.close()
+
+def test_solve_is_thread_safe():
+    problems = [f"{a}{op}{b}" for a in range(90, 990, 37) for b in range(1, 99, 13) for op in "+-*"] + ["7-9", "a+b", "12*3+4"]
+    expected = [ai_agent.solve(problem) for problem in problems]
+    assert expected[-1].result == 40 and expected[-2].error == "Invalid number format"
+    
+    # One agent, many threads: every answer and trace is the same as one by one
+    agent = AIAgent()
+    agent.receive_input("1+1")
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(agent.solve, problems))
+        batches = list(pool.map(lambda part: agent.solve_batch(part, trace=True),
+                                [problems[i:i + 25] for i in range(0, len(problems), 25)]))
+    assert [(r.result, r.error) for r in results] == [(r.result, r.error) for r in expected]
+    assert [r.trace.to_list() for r in results] == [r.trace.to_list() for r in expected]
+    assert [r.trace for batch in batches for r in batch] == [r.trace.to_list() for r in expected]
+    assert agent.input == "1+1" and agent.scratchpad.to_list() == ["Input received: 1+1"]
+
 if __name__ == "__main__":
     print("\nRunning AI Agent Tests...")
     
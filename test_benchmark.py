@@ -0,0 +1,17 @@
+from benchmark import build_cases, compare, run_benchmarks
+
+def test_run_and_compare():
+    cases = [case for case in build_cases(max_digits=10, batch_sizes=[2])]
+    assert {case.name for case in cases} >= {
+        "solve_addition", "solve_subtraction", "solve_multiplication",
+        "solve_equation", "solve_quadratic", "solve_geometry",
+    }
+    baseline = run_benchmarks(cases[:3], warmup=0, repeats=1, verbose=False)
+    assert baseline["results"][0]["peak_bytes"] >= 0
+    assert compare(baseline, baseline) == []
+    
+    # A run twice as slow is flagged
+    slower = {"results": [dict(r, median=r["median"] * 2 + 1) for r in baseline["results"]]}
+    regressions = compare(baseline, slower, threshold=0.2)
+    assert len(regressions) == 3
+    assert {r["metric"] for r in regressions} == {"median"}
@@ -0,0 +1,63 @@
+import gzip
+import json
+import os
+import pytest
+
+from dataset import generate, sample_examples
+
+def read_shard(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+def test_examples_are_correct_and_deterministic():
+    examples = list(sample_examples(seed=7, shard=0, count=50, max_digits=4))
+    assert examples == list(sample_examples(seed=7, shard=0, count=50, max_digits=4))
+    assert examples != list(sample_examples(seed=7, shard=1, count=50, max_digits=4))
+    for example in examples:
+        assert example["answer"] == eval(example["problem"])
+        assert example["scratchpad"].startswith("Input received: " + example["problem"])
+        assert example["scratchpad"].rstrip().endswith(str(example["answer"]))
+
+def test_generate_shards_and_resume(tmp_path):
+    out_dir = str(tmp_path)
+    stats = generate(out_dir, examples=25, shard_size=10, seed=1, workers=1, max_digits=3)
+    assert stats["written"] == 25
+    files = sorted(f for f in os.listdir(out_dir) if f.endswith(".jsonl.gz"))
+    assert files == ["shard-00000.jsonl.gz", "shard-00001.jsonl.gz", "shard-00002.jsonl.gz"]
+    first = read_shard(os.path.join(out_dir, files[0]))
+    assert len(first) == 10
+    
+    # A lost shard is rewritten with exactly the same examples
+    os.remove(os.path.join(out_dir, files[1]))
+    before = read_shard(os.path.join(out_dir, files[2]))
+    stats = generate(out_dir, examples=25, shard_size=10, seed=1, workers=2, max_digits=3)
+    assert stats["written"] == 10 and stats["skipped_shards"] == 2
+    assert read_shard(os.path.join(out_dir, files[2])) == before
+    assert len(read_shard(os.path.join(out_dir, files[1]))) == 10
+    assert json.load(open(os.path.join(out_dir, "manifest.json")))["shards"] == files
+
+def test_resume_checks_settings_and_shards(tmp_path):
+    out_dir = str(tmp_path)
+    generate(out_dir, examples=25, shard_size=10, seed=1, workers=1, max_digits=3)
+    manifest = json.load(open(os.path.join(out_dir, "manifest.json")))
+    assert manifest["complete"] and manifest["sampling"]["max_digits"] == 3
+    
+    # Other settings would mix two datasets: refused unless told to overwrite
+    with pytest.raises(ValueError, match="max_digits"):
+        generate(out_dir, examples=25, shard_size=10, seed=1, workers=1, max_digits=5)
+    with pytest.raises(ValueError, match="seed"):
+        generate(out_dir, examples=25, shard_size=10, seed=2, workers=1, max_digits=3)
+    stats = generate(out_dir, examples=25, shard_size=10, seed=2, workers=1, max_digits=5, overwrite=True)
+    assert stats["written"] == 25 and stats["skipped_shards"] == 0
+    assert read_shard(os.path.join(out_dir, "shard-00000.jsonl.gz")) == list(
+        sample_examples(seed=2, shard=0, count=10, max_digits=5))
+    
+    # More examples: the short last shard is made again, the full ones kept
+    stats = generate(out_dir, examples=30, shard_size=10, seed=2, workers=1, max_digits=5)
+    assert stats["written"] == 10 and stats["skipped_shards"] == 2
+    assert len(read_shard(os.path.join(out_dir, "shard-00002.jsonl.gz"))) == 10
+    
+    # Shards nobody knows the settings of are not trusted
+    os.remove(os.path.join(out_dir, "manifest.json"))
+    with pytest.raises(ValueError, match="no manifest"):
+        generate(out_dir, examples=30, shard_size=10, seed=2, workers=1, max_digits=5)
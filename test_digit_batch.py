@@ -0,0 +1,51 @@
+import random
+
+import pytest
+import ai_agent
+from ai_agent import AIAgent
+from digit_batch import add_many, subtract_many
+from digit_engine import iter_add_digits, iter_subtract_digits
+from scratchpad import run_steps
+
+np = pytest.importorskip("numpy")
+
+def _steps(steps):
+    written = []
+    answer = run_steps(steps, lambda kind, *args: written.append((kind, args)))
+    return written, answer
+
+def test_add_many_matches_one_at_a_time():
+    rng = random.Random(0)
+    num1s = [rng.randint(0, 10 ** rng.randint(1, 25)) for _ in range(500)]
+    num2s = [rng.randint(0, 10 ** rng.randint(1, 25)) for _ in range(500)]
+    batch = AIAgent().solve_addition_many(num1s, num2s)
+    assert batch.answers() == [a + b for a, b in zip(num1s, num2s)]
+    
+    # Every problem's steps come back from the carries, just as the digit engine writes them
+    for row in range(0, 500, 7):
+        assert _steps(batch.steps(row)) == _steps(iter_add_digits(str(num1s[row]), str(num2s[row])))
+    problem = f"{num1s[3]}+{num2s[3]}"
+    assert batch.trace(3).to_list() == ai_agent.solve(problem).trace.to_list()
+
+def test_subtract_many_marks_negative_rows():
+    rng = random.Random(1)
+    num1s = [rng.randint(0, 10 ** rng.randint(1, 12)) for _ in range(500)]
+    num2s = [rng.randint(0, 10 ** rng.randint(1, 12)) for _ in range(500)]
+    batch = subtract_many(num1s, num2s)
+    assert batch.answers() == [a - b if a >= b else None for a, b in zip(num1s, num2s)]
+    assert list(batch.negative) == [a < b for a, b in zip(num1s, num2s)]
+    for row in range(0, 500, 7):
+        if num1s[row] >= num2s[row]:
+            assert _steps(batch.steps(row)) == _steps(iter_subtract_digits(str(num1s[row]), str(num2s[row])))
+    row = int(np.argmax(batch.negative))
+    assert batch.trace(row).to_list()[-1] == "Error: First number must be greater than or equal to second number"
+
+def test_digit_strings_and_long_numbers():
+    batch = add_many(["007", " 95", 10 ** 5000], ["3", "5", 1])
+    assert batch.answers() == [10, 100, 10 ** 5000 + 1]
+    assert batch.digits(1) == "100" and list(batch.widths) == [1, 2, 5001]
+    assert batch.trace(0).to_list()[0] == "Input received: 7+3"
+    with pytest.raises(ValueError):
+        add_many(["12a"], ["1"])
+    with pytest.raises(ValueError):
+        add_many([1, 2], [3])
@@ -0,0 +1,38 @@
+import random
+
+import pytest
+from ai_agent import AIAgent
+from digit_engine import add_digits, subtract_digits, to_digits, from_digits
+
+def test_matches_python_ints():
+    rng = random.Random(1)
+    for _ in range(200):
+        a = rng.randint(0, 10 ** rng.randint(1, 60))
+        b = rng.randint(0, 10 ** rng.randint(1, 60))
+        assert add_digits(str(a), str(b)) == str(a + b)
+        high, low = max(a, b), min(a, b)
+        assert subtract_digits(str(high), str(low)) == str(high - low)
+
+def test_steps_match_agent():
+    # The engine writes down the same steps as the agent
+    steps = []
+    add_digits("999", "1", lambda *step: steps.append(step))
+    agent = AIAgent()
+    agent.receive_input("999+1")
+    agent.solve_problem()
+    assert [s.args for s in agent.scratchpad.steps()][1:-1] == [s[1:] for s in steps]
+
+def test_subtraction_order():
+    with pytest.raises(ValueError):
+        subtract_digits("12", "13")
+    assert subtract_digits("1000", "999") == "1"
+    assert subtract_digits("5", "5") == "0"
+
+def test_past_int_str_limit():
+    # Operands longer than Python's int/str conversion limit
+    digits = "9" * 20000
+    assert to_digits(from_digits(digits)) == digits
+    assert add_digits(digits, "1") == "1" + "0" * 20000
+    agent = AIAgent()
+    agent.receive_input(digits + "+1")
+    assert agent.solve_problem() == 10 ** 20000
@@ -0,0 +1,71 @@
+import random
+
+import pytest
+from ai_agent import AIAgent
+from digit_engine import digit_count, from_digits, to_digits
+from division import divide, divmod_fast, NATIVE_MAX_BITS
+from scratchpad import FINAL_RESULT, INPUT, Trace
+from verifier import verify_trace
+
+def test_matches_python_ints():
+    rng = random.Random(1)
+    for strategy in ["digits", "limbs", "newton", "native", "auto"]:
+        for _ in range(100):
+            a = rng.randrange(10 ** rng.randint(1, 400))
+            b = rng.randrange(1, 10 ** rng.randint(1, 300))
+            assert divide(a, b, strategy) == divmod(a, b)
+    
+    # Long quotients of long divisors take Newton's method, even without steps
+    a = rng.getrandbits(4 * NATIVE_MAX_BITS)
+    b = rng.getrandbits(2 * NATIVE_MAX_BITS)
+    assert divmod_fast(a, b) == divmod(a, b)
+    with pytest.raises(ValueError, match="Cannot divide by zero"):
+        divide(5, 0)
+
+def test_long_division_steps():
+    agent = AIAgent()
+    agent.receive_input("1234/7")
+    assert agent.solve_problem() == 176
+    assert agent.scratchpad.to_list() == [
+        "Input received: 1234/7",
+        "Bringing down 1: 1 ÷ 7 = 0 remainder 1",
+        "Bringing down 2: 12 ÷ 7 = 1 remainder 5",
+        "Bringing down 3: 53 ÷ 7 = 7 remainder 4",
+        "Bringing down 4: 44 ÷ 7 = 6 remainder 2",
+        "Quotient: 176, remainder: 2",
+        "Final result: 176",
+    ]
+    agent.receive_input("1234 % 7")
+    assert agent.solve_problem() == 2
+    agent.receive_input("12/0")
+    assert agent.solve_problem() is None
+    assert agent.scratchpad[-1] == "Error: Cannot divide by zero"
+
+def test_long_operands_switch_strategy():
+    # Limbs bring down 8 digits a step, the leading limb with what's left over
+    agent = AIAgent()
+    agent.receive_input("9" * 60 + "/7")
+    assert agent.solve_problem() == int("9" * 60) // 7
+    assert agent.scratchpad[1] == "Dividing 60-digit by 1-digit numbers using limbs"
+    assert agent.scratchpad[2] == "Bringing down limb 9999: 9999 ÷ 7 = 1428 remainder 3 (base 10^8)"
+    assert len(agent.scratchpad) == 2 + 8 + 2
+    
+    # Newton's method only writes down a step per doubling of precision
+    trace = Trace()
+    a, b = from_digits("3" * 6000), from_digits("7" * 2500)
+    assert divide(a, b, record=trace.record) == divmod(a, b)
+    kinds = [step.name for step in trace.steps()]
+    assert kinds[0] == "div_strategy" and kinds[-1] == "div_result" and len(kinds) < 20
+    assert trace[1].startswith("Reciprocal of the divisor to")
+    
+    # Every strategy's trace checks out
+    for strategy in ["digits", "limbs", "newton", "native"]:
+        trace = Trace()
+        trace.record(INPUT, "3" * 6000 + "%" + "7" * 2500)
+        divide(a, b, strategy, trace.record)
+        trace.record(FINAL_RESULT, a % b)
+        assert verify_trace(trace) is None
+
+def test_digit_count():
+    for value in [0, 7, 10, 10 ** 4000 - 1, 10 ** 4000, 10 ** 5000 + 3]:
+        assert digit_count(value) == len(to_digits(value))
@@ -0,0 +1,44 @@
+import pytest
+from ai_agent import AIAgent
+from expression import compile_expression, compile_shape, is_expression, shape_of
+
+def test_precedence_and_brackets():
+    agent = AIAgent()
+    for problem, expected in [("1+2+3", 6), ("123*45+678-9", 6204), ("10-2-3", 5),
+                              ("2*3+4*5", 26), ("(12+3)*4", 60), ("2*(3+4)*5", 70), ("((7))*2", 14),
+                              ("100/7%3", 2), ("2+12/4*3", 11), ("(12+3)%4", 3)]:
+        agent.receive_input(problem)
+        assert agent.solve_problem() == expected
+    
+    # Every operation gets the usual digit steps
+    agent.receive_input("12*34+5")
+    agent.solve_problem()
+    assert "\nWorking out 12 * 34:" in agent.scratchpad
+    assert "Partial result: 360" in agent.scratchpad
+    assert "Working out 408 + 5:" in agent.scratchpad[11]
+    assert agent.scratchpad[-1] == "Final result: 413"
+
+def test_invalid_expressions():
+    agent = AIAgent()
+    for problem, error in [("1++2", "missing number"), ("(1+2", "unbalanced brackets"),
+                           ("1+2)", "unbalanced brackets"), ("(1)(2)+3", "missing operator"),
+                           ("1+a+2", "unexpected 'a'")]:
+        agent.receive_input(problem)
+        assert agent.solve_problem() is None
+        assert agent.scratchpad[-1] == f"Error: Invalid expression - {error}"
+    
+    # No step may go below zero
+    agent.receive_input("123+456-789")
+    assert agent.solve_problem() is None
+
+def test_plans_are_cached_by_shape():
+    assert is_expression("1+2+3") and is_expression("(4)") and not is_expression("1+2")
+    assert shape_of("12 * 3 + 45") == ("#*#+#", ["12", "3", "45"])
+    
+    compile_shape.cache_clear()
+    plan, numbers = compile_expression("12*3+4")
+    assert plan.steps == (("*", 0, 1), ("+", 3, 2)) and plan.result == 4
+    assert compile_expression("98*76+54")[0] is plan
+    assert compile_shape.cache_info().hits == 1
+    with pytest.raises(ValueError):
+        compile_shape("#+")
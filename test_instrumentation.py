@@ -0,0 +1,61 @@
+import threading
+from ai_agent import AIAgent
+from instrumentation import Metrics
+from math_solver import MathProblemSolver
+
+def test_agent_metrics():
+    events = []
+    metrics = Metrics(callback=lambda event, name, value: events.append((event, name)))
+    agent = AIAgent(metrics=metrics)
+    for problem in ["999+1", "1000-1", "abc+def"]:
+        agent.receive_input(problem)
+        agent.solve_problem()
+    
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["problems"] == 2
+    assert snapshot["counters"]["carries"] == 3
+    assert snapshot["counters"]["borrows"] == 3
+    assert snapshot["counters"]["digits_processed"] == 9
+    assert snapshot["counters"]["errors"] == 1
+    assert snapshot["phases"]["parse"]["calls"] == 3
+    assert snapshot["phases"]["solve"]["calls"] == 2
+    assert ("phase", "parse") in events
+    
+    text = metrics.to_prometheus()
+    assert 'showwork_phase_seconds_total{phase="solve"}' in text
+    assert "showwork_carries_total 3" in text
+
+def test_math_solver_metrics():
+    metrics = Metrics()
+    solver = MathProblemSolver(metrics=metrics)
+    solver.solve_equation("2x + 3 = 7")
+    solver.solve_equation("2x + 3 = 7")
+    solver.solve_geometry("circle_area", {"radius": 1})
+    counters = metrics.snapshot()["counters"]
+    assert counters["cache_hits"] == 1 and counters["cache_misses"] == 1
+    assert counters["steps_logged"] == len(solver.steps)
+    assert metrics.phase_calls["linear"] == 1
+    assert metrics.phase_calls["geometry"] == 1
+
+def test_metrics_off_by_default():
+    agent = AIAgent()
+    agent.receive_input("1+1")
+    assert agent.solve_problem() == 2
+    assert agent.metrics is None
+
+def test_metrics_shared_by_threads():
+    metrics = Metrics()
+    
+    def work():
+        for _ in range(20000):
+            metrics.count("problems")
+            metrics.add_time("solve", 0.5)
+    
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["problems"] == 160000
+    assert snapshot["phases"]["solve"] == {"seconds": 80000.0, "calls": 160000}
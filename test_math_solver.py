@@ -0,0 +1,193 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import math_solver
+from geometry import SHAPES, Shape, register_shape
+from math_solver import MathProblemSolver
+
+def test_linear_equations():
+    solver = MathProblemSolver()
+    assert solver.solve_equation("2x + 3 = 7") == 2.0
+    assert solver.solve_equation("3x - 2 = 2x + 5") == 7.0
+    assert solver.solve_equation("2x = 2x") == "This equation has infinite solutions!"
+    assert solver.solve_equation("2x + 3").startswith("Error")
+    assert solver.solve_equation("x - = 2").startswith("Error")
+
+def test_quadratic_signs():
+    solver = MathProblemSolver()
+    assert solver.solve_quadratic("1x^2-5x+6=0") == (3.0, 2.0)
+    assert solver.solve_quadratic("x² + 5x + 6 = 0") == (-2.0, -3.0)
+    assert solver.solve_quadratic("-x^2+4=0") == (-2.0, 2.0)
+    
+    # Negative numbers are written in brackets, so the signs read right
+    solver.solve_quadratic("x^2 - 5x + 6 = 0")
+    assert solver.steps[-2]["work"] == "b² - 4ac = (-5.0)² - 4(1.0)(6.0)"
+    assert solver.steps[-1]["work"] == "x = (-(-5.0) ± √1.0) / (2*1.0)"
+
+def test_equation_cache():
+    solver = MathProblemSolver(cache_size=2)
+    assert solver.solve_equation("2x + 3 = 7") == 2.0
+    first_steps = list(solver.steps)
+    
+    # Same equation (spaces don't matter): answer and steps come from the cache
+    solver.steps.clear()
+    assert solver.solve_equation("2x+3=7") == 2.0
+    assert solver.steps[1:] == first_steps[1:]
+    assert solver.equation_cache.stats()["hits"] == 1
+    
+    # Oldest equation is forgotten when the cache is full
+    solver.solve_equation("x + 1 = 3")
+    solver.solve_quadratic("x^2-4=0")
+    assert len(solver.equation_cache) == 2
+    solver.solve_equation("2x+3=7")
+    assert solver.equation_cache.stats()["misses"] == 4
+
+def test_cache_off():
+    solver = MathProblemSolver(cache_size=0)
+    assert solver.equation_cache is None
+    assert solver.solve_equation("x + 1 = 3") == 2.0
+
+def test_solve_quadratic_many():
+    np = pytest.importorskip("numpy")
+    solver = MathProblemSolver()
+    batch = solver.solve_quadratic_many([1, 1, 1, 0, 2], [-5, 0, 0, 3, 0], [6, 1, 0, 1, -8])
+    assert batch.x1[0] == 3.0 and batch.x2[0] == 2.0
+    assert list(batch.no_real_roots) == [False, True, False, False, False]
+    assert list(batch.not_quadratic) == [False, False, False, True, False]
+    assert np.isnan(batch.x1[1]) and batch.x1[2] == 0.0
+    assert (batch.x1[4], batch.x2[4]) == (2.0, -2.0)
+    assert "no real solutions" in batch.summary(1)
+    assert len(solver.steps) == 1
+    
+    # Tiny root next to a huge one keeps its precision
+    batch = solver.solve_quadratic_many([1.0], [-1e8], [1.0])
+    assert batch.x1[0] == 1e8
+    assert abs(batch.x2[0] - 1e-8) < 1e-20
+    
+    # b = -0.0 gives the roots in the same order as b = 0.0: x₁ = (-b + √d) / 2a
+    batch = solver.solve_quadratic_many([1.0, 1.0, -1.0, -1.0], [0.0, -0.0, 0.0, -0.0], [-4.0, -4.0, 4.0, 4.0])
+    assert list(batch.x1) == [2.0, 2.0, -2.0, -2.0] and list(batch.x2) == [-2.0, -2.0, 2.0, 2.0]
+
+def test_solve_linear_many():
+    pytest.importorskip("numpy")
+    solver = MathProblemSolver()
+    batch = solver.solve_linear_many([2, 0, 0, -4], [4, 0, 3, 2])
+    assert batch.x[0] == 2.0 and batch.x[3] == -0.5
+    assert list(batch.infinite_solutions) == [False, True, False, False]
+    assert list(batch.no_solution) == [False, False, True, False]
+
+def test_geometry_shapes():
+    solver = MathProblemSolver()
+    assert solver.solve_geometry("triangle_area", {"base": 6, "height": 4}) == 12.0
+    assert solver.steps[-1]["work"] == "Area = ½ × base × height = ½ × 6 × 4"
+    assert solver.solve_geometry("trapezoid_area", {"a": 2, "b": 4, "height": 3}) == 9.0
+    assert solver.solve_geometry("polygon_area", {"x": [0, 4, 4, 0], "y": [0, 0, 3, 3]}) == 12.0
+    assert abs(solver.solve_geometry("sphere_volume", {"radius": 3}) - 36 * math.pi) < 1e-9
+    assert solver.solve_geometry("circle_area", {"radius": -1}) == "Error: Radius must be a positive number"
+    assert solver.solve_geometry("rectangle_area", {"width": 2}) == (
+        "Error: Rectangle area calculation requires both 'width' and 'height' values")
+    assert solver.solve_geometry("polygon_area", {"x": [0, 1], "y": [0, 1]}).startswith("Error: X and y")
+
+    register_shape(Shape("kite_area", ("p", "q"), lambda p, q: 0.5 * p * q,
+                         "Calculating kite area", "Area = ½ × p × q = ½ × {p} × {q}"))
+    try:
+        assert solver.solve_geometry("kite_area", {"p": 4, "q": 5}) == 10.0
+    finally:
+        del SHAPES["kite_area"]
+
+def test_solve_geometry_many():
+    np = pytest.importorskip("numpy")
+    solver = MathProblemSolver()
+    batch = solver.solve_geometry_many("rectangle_area", width=[2, 3, 0, np.nan], height=5)
+    assert list(batch.result[:2]) == [10.0, 15.0] and np.isnan(batch.result[2:]).all()
+    assert list(batch.not_positive) == [False, False, True, False]
+    assert list(batch.not_numbers) == [False, False, False, True]
+    assert batch.summary(0) == "Area = width × height = 2.0 × 5.0 = 10.0"
+    assert len(solver.steps) == 1 and solver.steps[0]["result"].startswith("2 worked out")
+
+    # The same answers as one shape at a time
+    radius = np.random.default_rng(0).uniform(0.1, 10, 1000)
+    batch = solver.solve_geometry_many("cone_volume", {"radius": radius, "height": radius * 2})
+    one = [solver.solve_geometry("cone_volume", {"radius": r, "height": r * 2}) for r in radius[:10]]
+    assert list(batch.result[:10]) == one
+
+    # Polygons: a list of corners each, or flat coordinates with offsets
+    batch = solver.solve_geometry_many("polygon_area", x=[[0, 4, 4, 0], [0, 1], [1e9, 1e9 + 4, 1e9]],
+                                       y=[[0, 0, 3, 3], [0, 1], [1e9, 1e9, 1e9 + 2]])
+    assert batch.result[0] == 12.0 and batch.result[2] == 4.0
+    assert list(batch.not_positive) == [False, True, False]
+    flat = solver.solve_geometry_many("polygon_area", x=batch.values["x"], y=batch.values["y"],
+                                      offsets=batch.values["offsets"])
+    assert np.array_equal(flat.result, batch.result, equal_nan=True)
+    with pytest.raises(ValueError):
+        solver.solve_geometry_many("triangle_area", base=[1])
+
+def test_solve_iter():
+    solver = MathProblemSolver()
+    *steps, result = solver.solve_iter("2x + 3 = 7")
+    assert steps[0]["description"] == "[START] Solving equation"
+    assert steps == solver.steps
+    assert result.result == 2.0 and result.error is None
+    
+    # Cached answers come back step by step too
+    *cached, result = solver.solve_iter("2x+3=7")
+    assert cached[1:] == steps[1:] and result.result == 2.0
+    
+    *steps, result = solver.solve_iter("x^2+1=0")
+    assert steps[-1]["description"] == "Calculating discriminant"
+    assert result.result.startswith("This equation has no real solutions")
+    assert next(solver.solve_iter("x="))["description"] == "[START] Solving equation"
+    *_, result = solver.solve_iter(("geometry", "square_area", {}))
+    assert result.error.startswith("Error: Unsupported geometry problem type")
+
+def test_solve_is_thread_safe():
+    problems = [f"{a}x + {b} = {a + b}" for a in range(1, 40) for b in range(0, 11)]
+    problems += [f"x^2 - {a + b}x + {a * b} = 0" for a in range(1, 20) for b in range(1, 8)]
+    problems += [("geometry", "circle_area", {"radius": r}) for r in range(1, 30)] + ["x=", "x^2+1=0"]
+    expected = math_solver.solve_many(problems, trace=True)
+    assert expected[0].result == 1.0 and expected[-2].error is not None
+    
+    # One solver (with a shared cache), many threads: same answers and steps
+    solver = MathProblemSolver(cache_size=64)
+    solver.solve_equation("2x + 3 = 7")
+    before = list(solver.steps)
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(solver.solve, problems * 2))
+        batches = list(pool.map(lambda part: solver.solve_batch(part, trace=True),
+                                [problems[i:i + 30] for i in range(0, len(problems), 30)]))
+    assert [(r.result, r.error) for r in results] == [(r.result, r.error) for r in expected] * 2
+    assert [list(r.trace.notes()) for r in results] == [r.trace for r in expected] * 2
+    assert [r for batch in batches for r in batch] == expected
+    assert list(solver.steps) == before and solver.problem == ""
+
+def test_step_log():
+    solver = MathProblemSolver()
+    solver.solve_equation("2x + 3 = 7")
+    solver.solve_equation("3x - 2 = 2x + 5")
+    assert solver.steps[-1] == {"description": "Solving for x", "work": "1.0x = 7.0", "result": "x = 7.0"}
+    assert solver.scratchpad[-1] == "Solving for x: 1.0x = 7.0 => x = 7.0"
+    assert len(solver.scratchpad) == len(solver.steps)
+    
+    # Every description is stored once
+    columns = solver.steps.to_columns()
+    assert len(columns["description_id"]) == len(solver.steps)
+    assert len(columns["descriptions"]) == len(set(step["description"] for step in solver.steps))
+
+def test_bounded_step_log():
+    solver = MathProblemSolver(memory_budget=5000)
+    solver.steps.block_steps = 10
+    plain = MathProblemSolver()
+    for a in range(1, 60):
+        solver.solve_equation(f"{a}x + 3 = {a + 3}")
+        plain.solve_equation(f"{a}x + 3 = {a + 3}")
+    
+    # Older steps went to disk, but the steps read just the same
+    assert solver.steps.blocks.spilled > 0 and solver.steps.blocks.nbytes <= 5000
+    assert solver.steps == plain.steps and solver.scratchpad == plain.scratchpad
+    assert solver.steps[-25:] == plain.steps[-25:]
+    assert solver.steps.to_columns() == plain.steps.to_columns()
+    
+    solver.reset()
+    assert len(solver.steps) == 0 and solver.solution is None
+    assert solver.solve_equation("2x + 3 = 7") == 2.0 and solver.steps[0]["work"] == "2x + 3 = 7"
@@ -0,0 +1,25 @@
+from parallel import solve_parallel
+from scratchpad import Trace
+
+PROBLEMS = [f"{i}*{i + 1}" for i in range(50)] + ["abc+def", "999+1"]
+
+def test_parallel_keeps_order():
+    results = list(solve_parallel(PROBLEMS, workers=2, chunk_size=7))
+    assert [r.problem for r in results] == PROBLEMS
+    assert [r.result for r in results[:50]] == [i * (i + 1) for i in range(50)]
+    assert results[50].error == "Invalid number format"
+    assert results[51].result == 1000
+
+def test_serial_fallback_matches():
+    parallel = list(solve_parallel(PROBLEMS, workers=2, chunk_size=10, trace=True))
+    serial = list(solve_parallel(PROBLEMS, workers=1, chunk_size=10, trace=True))
+    assert parallel == serial
+    assert serial[51].trace[-1] == "Final result: 1000"
+    # Traces travel compact and are only written out when read
+    assert isinstance(parallel[51].trace, Trace)
+    assert parallel[51].trace.to_list() == serial[51].trace.to_list()
+
+def test_math_solver_workers():
+    results = list(solve_parallel(["2x + 3 = 7", "x + 1 = 3"], solver="math", workers=2, trace=True))
+    assert [r.result for r in results] == [2.0, 2.0]
+    assert results[0].trace[-1] == "Solving for x: 2.0x = 4.0 => x = 2.0"
@@ -0,0 +1,47 @@
+import io
+import json
+
+from pipeline import read_problems, run
+
+def test_text_pipeline():
+    source = io.StringIO("123+456\n\n999*999\nabc+def\n")
+    out = io.StringIO()
+    stats = run(source, out, batch_size=2)
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert stats["problems"] == 3
+    assert [line["result"] for line in lines] == [579, 998001, None]
+    assert lines[2]["error"] == "Invalid number format"
+    assert "trace" not in lines[0]
+
+def test_jsonl_pipeline_with_traces():
+    source = io.StringIO(
+        '{"problem": "2x + 3 = 7"}\n'
+        '"x^2-5x+6=0"\n'
+        '{"problem": ["geometry", "circle_area", {"radius": 1}]}\n'
+    )
+    out = io.StringIO()
+    run(source, out, fmt="jsonl", solver="math", trace=True, buffer_lines=1)
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert lines[0]["result"] == 2.0
+    assert lines[1]["result"] == [3.0, 2.0]
+    assert lines[2]["problem"] == ["geometry", "circle_area", {"radius": 1}]
+    assert lines[0]["trace"][0].startswith("[START] Solving equation")
+
+def test_read_problems_is_lazy():
+    def endless():
+        while True:
+            yield "1+1\n"
+    problems = read_problems(endless())
+    assert next(problems) == "1+1"
+
+def test_bad_jsonl_lines_are_reported():
+    source = io.StringIO('"1+1"\n{"problem": "2+2"\n\n{"id": 3}\n"3+3"\n')
+    for workers in (1, 2):
+        out = io.StringIO()
+        stats = run(source, out, fmt="jsonl", batch_size=2, workers=workers)
+        lines = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert stats["problems"] == 4
+        assert [line["result"] for line in lines] == [2, None, None, 6]
+        assert lines[1]["error"].startswith("Line 2: invalid JSON")
+        assert lines[2] == {"problem": '{"id": 3}', "result": None, "error": 'Line 4: no "problem" key'}
+        source.seek(0)
@@ -0,0 +1,107 @@
+import io
+import json
+import tracemalloc
+
+import pytest
+from ai_agent import AIAgent
+from math_solver import MathProblemSolver
+from renderers import JSONRenderer, LaTeXRenderer, MarkdownRenderer, TextRenderer, get_renderer
+
+class Writes(io.StringIO):
+    """Counts the write() calls that reach the file"""
+    calls = 0
+
+    def write(self, text):
+        self.calls += 1
+        return super().write(text)
+
+def test_text_matches_print(capsys):
+    agent = AIAgent()
+    agent.receive_input("999+1").solve_problem()
+    agent.show_scratchpad()
+    printed = capsys.readouterr().out
+    assert printed.startswith("\nScratchpad Contents:\nStep 1: Input received: 999+1\n")
+    assert printed == "\nScratchpad Contents:\n" + "".join(
+        f"Step {i}: {line}\n" for i, line in enumerate(agent.scratchpad, 1))
+    
+    solver = MathProblemSolver()
+    solver.solve_equation("2x + 3 = 7")
+    solver.show_work()
+    printed = capsys.readouterr().out
+    assert "\nStep 8:\nWhat we're doing: Solving for x\nHow we're doing it: 2.0x = 4.0\nWhat we got: x = 2.0\n" in printed
+    assert printed.endswith("\n[All our work]\n" + "".join(
+        f"{i}. {note}\n" for i, note in enumerate(solver.scratchpad, 1)))
+    
+    # Steps that can only be read once (a generator) give the same text
+    out = io.StringIO()
+    assert TextRenderer(out).render_steps(step for step in solver.steps) == len(solver.steps)
+    assert out.getvalue() == printed
+
+def test_big_traces_are_written_in_chunks():
+    agent = AIAgent()
+    agent.receive_input("7" * 3000 + "+" + "8" * 3000).solve_problem()
+    out = Writes()
+    renderer = TextRenderer(out, buffer_size=4096)
+    agent.show_scratchpad(renderer)
+    assert len(out.getvalue()) == renderer.written
+    assert out.calls < renderer.written // 4096 + 2 < len(agent.scratchpad)
+
+class Sink:
+    """Throws the text away, keeping only how much came"""
+    length = 0
+
+    def write(self, text):
+        self.length += len(text)
+
+def test_summary_is_not_kept_in_memory():
+    solver = MathProblemSolver(memory_budget=20000)
+    solver.steps.block_steps = 500
+    for a in range(1, 2000):
+        solver.solve_equation(f"{a}x + 3 = {a + 3}")
+    assert solver.steps.blocks.spilled > 0
+    
+    # A bounded log is read twice; a generator's summary goes to a temporary file
+    for steps in (solver.steps, (step for step in solver.steps)):
+        out = Sink()
+        tracemalloc.start()
+        try:
+            assert TextRenderer(out, buffer_size=4096).render_steps(steps) == len(solver.steps)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        summary = sum(len(f"{n}. {line}\n") for n, line in enumerate(solver.scratchpad, 1))
+        assert summary > 500_000 and peak < summary // 4
+    
+    # Either way the text is the same
+    out, again = io.StringIO(), io.StringIO()
+    TextRenderer(out, buffer_size=1024).render_steps(solver.steps)
+    TextRenderer(again, buffer_size=1024).render_steps(step for step in solver.steps)
+    assert out.getvalue() == again.getvalue()
+
+def test_other_formats():
+    agent = AIAgent()
+    agent.receive_input("12*34").solve_problem()
+    out = io.StringIO()
+    agent.show_scratchpad("json", out)
+    steps = json.loads(out.getvalue())["steps"]
+    assert steps[0] == {"step": 1, "kind": "input", "text": "Input received: 12*34"}
+    assert len(steps) == len(agent.scratchpad)
+    
+    out = io.StringIO()
+    agent.show_scratchpad(MarkdownRenderer(out))
+    assert out.getvalue().startswith("## Scratchpad Contents\n\n1. Input received: 12\\*34\n")
+    assert "\n3. 2 × 4 + carry(0) = 8\n" in out.getvalue()
+    
+    solver = MathProblemSolver()
+    solver.solve_quadratic("x^2-5x+6=0")
+    out = io.StringIO()
+    solver.show_work(LaTeXRenderer(out))
+    latex = out.getvalue()
+    assert latex.startswith("\\section*{Solution Steps}\n\\begin{enumerate}\n\\item{} [START]")
+    assert "x\\textasciicircum{}2" in latex and "$\\pm$ $\\surd$" in latex and latex.endswith("\\end{enumerate}\n")
+    
+    out = io.StringIO()
+    assert JSONRenderer(out).render_steps([]) == 0 and json.loads(out.getvalue())["steps"] == []
+    assert isinstance(get_renderer(None), TextRenderer)
+    with pytest.raises(ValueError):
+        get_renderer("html")
@@ -0,0 +1,72 @@
+import time
+from concurrent.futures import ProcessPoolExecutor
+from ai_agent import AIAgent
+from math_solver import MathProblemSolver
+from parallel import solve_parallel
+from result_cache import ResultCache
+
+def _fill(path, start):
+    with ResultCache(path) as cache:
+        for i in range(start, start + 200):
+            cache.put(f"key{i}", i)
+            assert cache.get(f"key{i}") == i
+    return True
+
+def test_get_put_and_stats(tmp_path):
+    with ResultCache(str(tmp_path / "cache.db")) as cache:
+        assert cache.get("agent:1+1") is None
+        cache.put("agent:1+1", (2, None, []))
+        assert cache.get("agent:1+1") == (2, None, [])
+        stats = cache.stats()
+        assert stats["size"] == 1 and stats["hits"] == 1 and stats["misses"] == 1
+        assert stats["hit_rate"] == 0.5
+
+def test_lru_and_ttl_eviction(tmp_path):
+    with ResultCache(str(tmp_path / "cache.db"), max_entries=3, touch_after=0) as cache:
+        for key in "abc":
+            cache.put(key, key)
+            time.sleep(0.01)
+        cache.get("a")  # "b" is now the least recently used
+        cache.put("d", "d")
+        assert cache.evict() == 1
+        assert cache.get("b") is None and cache.get("a") == "a"
+    
+    with ResultCache(str(tmp_path / "ttl.db"), ttl=0.05) as cache:
+        cache.put("x", 1)
+        time.sleep(0.1)
+        assert cache.get("x") is None and len(cache) == 0
+
+def test_agent_and_math_solver_use_the_cache(tmp_path):
+    path = str(tmp_path / "cache.db")
+    agent = AIAgent(result_cache=ResultCache(path))
+    agent.receive_input("999 + 1")
+    assert agent.solve_problem() == 1000
+    expected = agent.scratchpad.to_list()
+    
+    # A new agent (as after a restart) gets answer and steps from disk
+    agent = AIAgent(result_cache=ResultCache(path))
+    agent.receive_input("999+1")
+    assert agent.solve_problem() == 1000
+    assert agent.scratchpad.to_list()[1:] == expected[1:]
+    assert agent.result_cache.stats()["hits"] == 1
+    
+    solver = MathProblemSolver(result_cache=ResultCache(path))
+    assert solver.solve_equation("2x + 3 = 7") == 2.0
+    assert solver.solve_geometry("circle_area", {"radius": 1}) > 3.14
+    steps = list(solver.steps)
+    solver = MathProblemSolver(result_cache=ResultCache(path))
+    assert solver.solve_equation("2x + 3 = 7") == 2.0
+    assert solver.solve_geometry("circle_area", {"radius": 1}) > 3.14
+    assert list(solver.steps) == steps
+    assert solver.result_cache.stats()["hits"] == 2
+
+def test_shared_between_processes(tmp_path):
+    path = str(tmp_path / "cache.db")
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        assert all(pool.map(_fill, [path] * 4, [0, 100, 200, 300]))
+    assert len(ResultCache(path)) == 500
+    
+    # Worker processes open the cache themselves
+    results = list(solve_parallel(["12+3", "4*5"] * 20, workers=2, chunk_size=5,
+                                  result_cache=ResultCache(path)))
+    assert [r.result for r in results[:2]] == [15, 20]
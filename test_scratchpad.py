@@ -0,0 +1,84 @@
+import sys
+from ai_agent import AIAgent
+from digit_engine import from_digits
+from scratchpad import ADD_DIGIT, CHECKPOINT, INPUT, KIND_NAMES, BoundedTrace, Step, Trace
+
+def test_trace_columns_round_trip():
+    trace = Trace()
+    trace.record(INPUT, "1+1")
+    trace.record(ADD_DIGIT, 1, 1, 1, 0, 2)
+    trace.record(ADD_DIGIT, 70000, 9, -5, 2 ** 40, 10 ** 30)
+    assert list(trace.steps()) == [
+        Step(INPUT, ("1+1",)),
+        Step(ADD_DIGIT, (1, 1, 1, 0, 2)),
+        Step(ADD_DIGIT, (70000, 9, -5, 2 ** 40, 10 ** 30)),
+    ]
+    
+    columns = trace.to_columns()
+    assert [KIND_NAMES[k] for k in columns["kind"]] == ["input", "add_digit", "add_digit"]
+    assert list(columns["arg_count"]) == [1, 5, 5]
+    assert list(columns["args"]) == [0, 1, 1, 1, 0, 2, 70000, 9, -5, 2 ** 40, 0]
+    assert columns["objects"] == {0: "1+1", 10: 10 ** 30}
+
+def test_trace_random_access_and_size():
+    agent = AIAgent()
+    agent.receive_input("8" * 3000 + "+" + "3" * 3000)
+    agent.solve_problem()
+    trace = agent.scratchpad
+    lines = trace.to_list()
+    # Any step can be read without going through the ones before it
+    for index in (0, 1, 63, 64, 65, 1000, 2999, len(lines) - 1, -1):
+        assert trace[index] == lines[index]
+    assert trace[500:700] == lines[500:700]
+    assert trace[::97] == lines[::97]
+    
+    # Much smaller than keeping the lines as strings
+    strings = sys.getsizeof(lines) + sum(map(sys.getsizeof, lines))
+    assert trace.nbytes * 10 < strings
+
+def test_trace_big_numbers():
+    agent = AIAgent()
+    agent.receive_input("9" * 5000 + "*9")
+    agent.solve_problem()
+    assert agent.scratchpad.step(-1).args[0] == from_digits("9" * 5000) * 9
+
+def test_bounded_trace_spills_to_disk():
+    problem = "8" * 3000 + "+" + "3" * 3000
+    agent = AIAgent()
+    answer = agent.receive_input(problem).solve_problem()
+    bounded = AIAgent(memory_budget=4000)
+    bounded.scratchpad = BoundedTrace(memory_budget=4000, block_steps=100)
+    assert bounded.receive_input(problem).solve_problem() == answer
+    
+    # Only the newest blocks stay in memory, and reading is the same
+    trace, lines = bounded.scratchpad, agent.scratchpad.to_list()
+    assert trace.block_steps == 128 and trace.blocks.spilled > 10
+    assert trace.nbytes < agent.scratchpad.nbytes // 4 and trace.spilled_bytes > 0
+    assert trace.to_list() == lines and len(trace) == len(lines)
+    for index in (0, 127, 128, 1000, -1):
+        assert trace[index] == lines[index]
+    assert trace[100:700:3] == lines[100:700:3]
+    assert trace.count(ADD_DIGIT) == agent.scratchpad.count(ADD_DIGIT)
+    assert trace.to_columns() == agent.scratchpad.to_columns()
+    trace.clear()
+    assert len(trace) == 0 and trace.blocks.spilled == 0
+
+def test_bounded_trace_keeps_to_its_budget():
+    # Long multiplication steps hold numbers thousands of digits long
+    problem = "7" * 2000 + "*" + "3" * 500
+    agent = AIAgent(multiplication_strategy="limbs")
+    answer = agent.receive_input(problem).solve_problem()
+    bounded = AIAgent(memory_budget=20000, multiplication_strategy="limbs")
+    assert bounded.receive_input(problem).solve_problem() == answer
+    trace = bounded.scratchpad
+    assert agent.scratchpad.nbytes > 50 * 20000
+    assert trace.nbytes <= 20000 and trace.blocks.spilled > 10
+    assert trace.to_list() == agent.scratchpad.to_list()
+    
+    # All the way through, give or take the small steps since the last checkpoint
+    trace = BoundedTrace(memory_budget=20000)
+    for step in agent.solve_iter(problem):
+        if isinstance(step, Step):
+            trace.record(step.kind, *step.args)
+            assert trace.nbytes <= 20000 + CHECKPOINT * 64
+    assert trace.to_list() == agent.scratchpad.to_list()
@@ -0,0 +1,47 @@
+import asyncio
+
+from ai_agent import solve
+from math_solver import solve as math_solve
+from server import STEP_GROUP, SolveServer, request
+
+async def _collect(port, problems, **options):
+    return [message async for message in request("127.0.0.1", port, problems, **options)]
+
+def test_server_round_trip():
+    async def scenario():
+        server = SolveServer(port=0, workers=2, batch_wait=0.001, max_queue=4, cheap_length=10)
+        await server.start()
+        try:
+            problems = [f"{i}+{i}" for i in range(20)] + ["9" * 30 + "*" + "9" * 30, "abc+def"]
+            messages = await _collect(server.port, problems)
+            assert [m["id"] for m in messages] == list(range(22))
+            assert [m["result"] for m in messages[:20]] == [2 * i for i in range(20)]
+            assert messages[20]["result"] == int("9" * 30) ** 2
+            assert messages[21]["error"] == "Invalid number format"
+            
+            # Steps stream back before the result
+            messages = await _collect(server.port, ["999+1"], trace=True)
+            assert messages[0]["step"] == "Input received: 999+1"
+            assert messages[-1] == {"id": 0, "result": 1000, "error": None}
+
+            # Long traces come in many groups, still in order, for both solvers
+            problem = "9" * 150 + "+1"
+            messages = await _collect(server.port, [problem, "x^2 - 5x + 6 = 0"], trace=True)
+            agent_steps = [m["step"] for m in messages if m["id"] == 0 and "step" in m]
+            assert agent_steps == list(solve(problem).trace)
+            assert len(agent_steps) > 3 * STEP_GROUP
+            error_steps = [m["step"] for m in messages if m["id"] == 1 and "step" in m]
+            assert error_steps == list(solve("x^2 - 5x + 6 = 0").trace)
+            messages = await _collect(server.port, ["x^2 - 5x + 6 = 0"], solver="math", trace=True)
+            assert [m["step"] for m in messages[:-1]] == list(math_solve("x^2 - 5x + 6 = 0").trace.notes())
+            assert messages[-1]["result"] == [3.0, 2.0]
+            
+            # Many clients at once
+            answers = await asyncio.gather(*[
+                _collect(server.port, ["2x + 3 = 7"], solver="math") for _ in range(10)
+            ])
+            assert all(a[0]["result"] == 2.0 for a in answers)
+        finally:
+            await server.stop()
+
+    asyncio.run(scenario())
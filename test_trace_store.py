@@ -0,0 +1,81 @@
+import pytest
+from ai_agent import AIAgent
+from digit_engine import from_digits
+from math_solver import MathProblemSolver
+from trace_store import TraceStoreReader, TraceWriter
+
+def test_write_and_read_back(tmp_path):
+    path = str(tmp_path / "traces")
+    agent = AIAgent()
+    problems = ["999+1", "2000-999", "12*34", "9" * 5000 + "*9"]
+    expected = []
+    with TraceWriter(path) as writer:
+        for problem in problems:
+            agent.receive_input(problem)
+            agent.solve_problem()
+            assert writer.append(agent.scratchpad) == len(expected)
+            expected.append(agent.scratchpad.to_list())
+        solver = MathProblemSolver()
+        solver.solve_equation("2x + 3 = 7")
+        writer.append(solver.scratchpad)
+        expected.append(list(solver.scratchpad))
+    
+    with TraceStoreReader(path) as reader:
+        assert len(reader) == 5
+        for problem_id, lines in enumerate(expected):
+            assert list(reader[problem_id]) == lines
+        # Random access to a single step
+        assert reader.step(0, 1).text == "Adding units: 9 + 1 + carry(1) = 10"
+        assert reader[1][-1] == "Final result: 1001"
+        assert reader.step(3, -1).args[0] == from_digits("9" * 5000) * 9
+        with pytest.raises(IndexError):
+            reader.trace(5)
+
+def test_append_after_reopen(tmp_path):
+    path = str(tmp_path / "traces")
+    with TraceWriter(path) as writer:
+        writer.append(["first"])
+    reader = TraceStoreReader(path)
+    with TraceWriter(path) as writer:
+        assert writer.append(["second"]) == 1
+    assert len(reader) == 1
+    reader.refresh()
+    assert list(reader[1]) == ["second"]
+    reader.close()
+
+def test_refresh_closes_old_maps(tmp_path):
+    path = str(tmp_path / "traces")
+    with TraceWriter(path) as writer:
+        writer.append(["first", "steps"])
+        reader = TraceStoreReader(path)
+        first = reader[0]
+        for number in range(3):
+            old = reader._data
+            writer.append([str(number)])
+            reader.refresh()
+            # Maps still used by a trace stay open until it is gone
+            assert old.closed == (number > 0)
+        assert list(first) == ["first", "steps"] and list(reader[-1]) == ["2"]
+        reader.close()
+        assert first[1] == "steps"
+
+def test_reader_before_first_append(tmp_path):
+    path = str(tmp_path / "traces")
+    with TraceWriter(path) as writer:
+        reader = TraceStoreReader(path)
+        assert len(reader) == 0
+        writer.append(["first"])
+        reader.refresh()
+        assert list(reader[0]) == ["first"]
+        reader.close()
+
+def test_reader_sees_traces_while_writing(tmp_path):
+    path = str(tmp_path / "traces")
+    with TraceWriter(path, sync=True) as writer:
+        writer.append(["first"])
+        reader = TraceStoreReader(path)
+        for number in range(100):
+            writer.append(["x" * 1000, str(number)])
+            reader.refresh()
+            assert list(reader[-1]) == ["x" * 1000, str(number)]
+        reader.close()
@@ -0,0 +1,134 @@
+import gzip
+import json
+import os
+
+from ai_agent import AIAgent
+from dataset import generate
+from math_solver import MathProblemSolver
+from verifier import main, verify_batch, verify_file, verify_trace
+
+def agent_trace(problem, strategy="auto"):
+    agent = AIAgent(2, strategy)
+    agent.receive_input(problem)
+    agent.solve_problem()
+    return agent.scratchpad
+
+def test_good_traces_pass():
+    for strategy in ("digits", "limbs", "karatsuba", "native"):
+        for problem in ("987654321*123456789", "1000-999", "99999+1", "12-345"):
+            trace = agent_trace(problem, strategy)
+            assert verify_trace(trace) is None
+            assert verify_trace(list(trace.steps())) is None
+            assert verify_trace("\n".join(step.text for step in trace.steps())) is None
+    assert verify_trace(agent_trace("123*45+678-9")) is None
+    for problem in ("1234/7", "100%7", "9" * 60 + "/7", "3" * 3000 + "/" + "7" * 1000, "100/7%3+1"):
+        assert verify_trace(agent_trace(problem)) is None
+
+    solver = MathProblemSolver()
+    solver.solve_quadratic("x^2 - 5x + 6 = 0")
+    solver.solve_equation("3x - 2x + 4 = 10")
+    solver.solve_geometry("circle_area", {"radius": 2})
+    assert verify_trace(solver.steps) is None
+
+def test_first_bad_step_is_reported():
+    lines = [step.text for step in agent_trace("478+365", "digits").steps()]
+    assert lines[3] == "Adding position 2: 7 + 6 + carry(1) = 14"
+    lines[3] = "Adding position 2: 7 + 6 + carry(1) = 13"
+    issue = verify_trace(lines)
+    assert issue.step == 3 and issue.text == lines[3]
+
+    lines = [step.text for step in agent_trace("4321*56", "digits").steps()]
+    bad = next(i for i, line in enumerate(lines) if line.startswith("Partial result"))
+    lines[bad] = "Partial result: 1"
+    assert verify_trace(lines).step == bad
+
+    lines = [step.text for step in agent_trace("1234/7").steps()]
+    lines[3] = "Bringing down 3: 53 ÷ 7 = 6 remainder 11"
+    assert verify_trace(lines).step == 3
+
+    # Strategy headers must describe the numbers in the input
+    lines = [step.text for step in agent_trace("987654321*123456789", "limbs").steps()]
+    assert lines[1].startswith("Multiplying 9-digit by 9-digit numbers")
+    for header in ("Multiplying 8-digit by 9-digit numbers using limbs",
+                   "Multiplying 9-digit by 10-digit numbers using limbs"):
+        issue = verify_trace(lines[:1] + [header] + lines[2:])
+        assert issue.step == 1 and "digits" in issue.reason
+    lines = [step.text for step in agent_trace("3" * 3000 + "/" + "7" * 1000).steps()]
+    lines[1] = lines[1].replace("3000-digit", "2999-digit", 1)
+    assert verify_trace(lines).step == 1
+
+    solver = MathProblemSolver()
+    solver.solve_quadratic("x^2 - 5x + 6 = 0")
+    steps = [dict(step) for step in solver.steps]
+    steps[3]["result"] = "7.0"  # The discriminant is 1
+    assert verify_trace(steps).step == 3
+
+def math_lines(method, *args):
+    solver = MathProblemSolver(cache_size=0)
+    getattr(solver, method)(*args)
+    return list(solver.scratchpad)
+
+def test_math_steps_come_from_the_problem():
+    # Each step is replaced with one that is off, and must be the step reported
+    lines = math_lines("solve_equation", "3x - 2x + 4 = 10")
+    tampered = [
+        (0, "[START] Solving equation: 3x - 2x + 4 = 11 => "),  # The rest is for "= 10"
+        (2, "Breaking equation into two parts: Left: 3x-2x+4, Right: 11 => "),
+        (3, "Found an x term: Term: 3x => Coefficient: 4"),
+        (4, "Found an x term: Term: -3x => Coefficient: -3"),
+        (5, "Moving number to right side: +4 => Added -5.0 to right side"),
+        (7, "Adding like terms: x terms: [3.0, -2.0], numbers: [-4.0, 11.0] => 1.0x = 7.0"),
+    ]
+    for number, line in tampered:
+        issue = verify_trace(lines[:number] + [line] + lines[number + 1:])
+        assert issue is not None and issue.step == max(number, 1), line
+    assert verify_trace(lines[1:]).step == 0  # No [START]
+    assert verify_trace(lines[:2] + lines[3:]).step == 2  # A step left out
+
+    lines = math_lines("solve_quadratic", "x^2 - 5x + 6 = 0")
+    tampered = [
+        (1, "Making equation easier to read: x^2-5x+7=0 => "),
+        (2, "Found the important numbers: From: x^2-5x+6 => a=1.0, b=-5.0, c=7.0"),
+        (4, "Using the quadratic formula: x = (-(-5.0) ± √4.0) / (2*1.0) => x₁ = 3.5, x₂ = 1.5"),
+        (4, "Using the quadratic formula: x = (-(-5.0) ± √1.0) / (2*2.0) => x₁ = 1.5, x₂ = 1.0"),
+        (4, "Using the quadratic formula: x = (-(-5.0) ± √1.0) / (2*1.0) => x₁ = 2.0, x₂ = 3.0"),
+    ]
+    for number, line in tampered:
+        issue = verify_trace(lines[:number] + [line] + lines[number + 1:])
+        assert issue is not None and issue.step == number, line
+
+    lines = math_lines("solve_geometry", "polygon_area", {"x": [0, 4, 4, 0], "y": [0, 0, 3, 3]})
+    assert verify_trace(lines) is None
+    assert verify_trace(lines[:1] + [lines[1].replace("12.0", "13.0")]).step == 1
+    lines = math_lines("solve_geometry", "circle_area", {"radius": 2})
+    assert verify_trace([lines[0].replace("2}", "3}"), lines[1]]).step == 1
+
+def test_batch_matches_step_by_step():
+    traces = ["\n".join(step.text for step in agent_trace(problem, "digits").steps())
+              for problem in ("12+990", "1000-1", "907*86", "5-7", "31*0")]
+    traces.append(traces[0].replace("Final result: 1002", "Final result: 1012"))
+    traces.append(traces[2].replace("Partial result", "Partial sum"))
+    traces.append("")
+    results = verify_batch(traces)
+    assert results == [verify_trace(trace) for trace in traces]
+    assert results[:5] == [None] * 5 and results[5] is not None and results[6] is not None
+    assert verify_batch(traces * 3, workers=2, chunk_size=4) == results * 3
+
+def test_verify_file_and_cli(tmp_path, capsys):
+    generate(str(tmp_path), examples=40, shard_size=40, seed=3, workers=1, max_digits=6)
+    path = os.path.join(str(tmp_path), "shard-00000.jsonl.gz")
+    report = verify_file(path)
+    assert report["traces"] == 40 and report["bad"] == 0
+    assert main([path]) == 0
+
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    answer = f"Final result: {records[5]['answer']}"
+    records[5]["scratchpad"] = records[5]["scratchpad"].replace(answer, answer + "1")
+    bad_path = str(tmp_path / "bad.jsonl")
+    with open(bad_path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(record) + "\n" for record in records)
+    report = verify_file(bad_path)
+    assert report["bad"] == 1 and report["issues"][0]["line"] == 6
+    assert main([bad_path, path, "--workers", "2"]) == 1
+    assert json.loads(capsys.readouterr().out)["problem"] == records[5]["problem"]
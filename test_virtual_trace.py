@@ -0,0 +1,66 @@
+import io
+import random
+
+import pytest
+from ai_agent import AIAgent
+from renderers import TextRenderer
+from scratchpad import SET_CARRY, Trace, Verbosity
+from virtual_trace import VirtualAddition, VirtualMultiplication, VirtualSubtraction
+
+def _written(problem, verbosity=Verbosity.DIGITS, strategy="auto"):
+    agent = AIAgent(verbosity=verbosity, multiplication_strategy=strategy)
+    agent.receive_input(problem).solve_problem()
+    return agent.scratchpad
+
+def test_same_steps_as_the_agent():
+    rng = random.Random(0)
+    for verbosity in Verbosity:
+        for _ in range(20):
+            a, b = sorted((rng.randint(0, 10 ** rng.randint(1, 200)), rng.randint(0, 10 ** rng.randint(1, 200))))
+            for trace in (VirtualAddition(f"{b}+{a}", str(b), str(a), verbosity),
+                          VirtualSubtraction(f"{b}-{a}", str(b), str(a), verbosity)):
+                assert trace.to_list() == _written(trace.problem, verbosity).to_list()
+            a, b = rng.randint(0, 10 ** rng.randint(1, 50)), rng.randint(0, 10 ** rng.randint(1, 50))
+            for strategy in ("digits", "limbs"):
+                trace = VirtualMultiplication(f"{a}*{b}", str(a), str(b), strategy, verbosity)
+                assert trace.to_list() == _written(trace.problem, verbosity, strategy).to_list()
+                assert trace.result == a * b
+
+def test_random_access_without_the_steps_before():
+    problem = "9" * 300 + "+" + "1"
+    written = _written(problem)
+    trace = VirtualAddition(problem, "9" * 300, "1")
+    lines = written.to_list()
+    assert len(trace) == len(lines) and trace.result == 10 ** 300
+    for index in (0, 1, 2, 127, 128, 129, 300, -2, -1):
+        assert trace[index] == lines[index] and trace.step(index) == written.step(index)
+    assert trace[250:260] == lines[250:260] and trace[::13] == lines[::13]
+    assert trace.count(SET_CARRY) == written.count(SET_CARRY)
+    with pytest.raises(IndexError):
+        trace[len(lines)]
+    
+    # Rows of a multiplication can be entered anywhere too
+    problem = "987654321" * 5 + "*" + "56789" * 3
+    lines = _written(problem, strategy="digits").to_list()
+    trace = VirtualMultiplication(problem, "987654321" * 5, "56789" * 3, "digits")
+    assert [trace[i] for i in range(len(lines) - 1, -1, -1)] == lines[::-1]
+
+def test_solve_virtual():
+    agent = AIAgent()
+    result = agent.solve_virtual("123456789 + 987654321")
+    assert result.result == 1111111110 and result.error is None
+    assert result.trace.to_list() == agent.solve("123456789 + 987654321").trace.to_list()
+    
+    # A million digit steps, without writing one down
+    result = agent.solve_virtual("9" * 1000 + "*" + "9" * 1000)
+    assert isinstance(result.trace, Trace)  # Karatsuba past 400 digits: solved as usual
+    result = AIAgent(multiplication_strategy="digits").solve_virtual("9" * 1000 + "*" + "9" * 1000)
+    assert len(result.trace) > 1000000 and result.trace.nbytes < 10000
+    assert result.trace[500000] == "  9 × 9 + carry(8) = 89"
+    
+    # Anything else is solved the usual way
+    assert agent.solve_virtual("1-2").error == "First number must be greater than or equal to second number"
+    assert isinstance(agent.solve_virtual("7/2").trace, Trace)
+    out = io.StringIO()
+    assert TextRenderer(out).render_trace(agent.solve_virtual("99+1").trace) == 7
+    assert out.getvalue().endswith("Step 6: Final carry: 1\nStep 7: Final result: 100\n")
@@ -0,0 +1,291 @@
+"""
+Trace Store
+A compact binary file format for archiving scratchpads, with an index so
+any problem's trace (or any single step of it) can be read back straight
+from a memory-mapped file, without loading the file or parsing text.
+
+Two files make up a store:
+
+    <name>.trc  data:  header, then one block per problem:
+                         step count (u64)
+                         step offsets (u64 each, from the start of the block)
+                         step records: kind (u8), arg count (u8), then
+                         per arg a type tag (u8) and its payload
+                         (u8, i64, f64, or u32 length + bytes)
+    <name>.idx  index: header, then one fixed 24-byte entry per problem:
+                         block offset (u64), block length (u64), steps (u64)
+
+Problem ids are simply the order problems were appended in (0, 1, 2, ...),
+so finding a problem is one index lookup and finding a step is one more.
+Files are only ever appended to, and every block is flushed before its
+index entry, so a reader never sees an entry without its data.
+"""
+
+import mmap
+import os
+import struct
+from typing import Any, Iterable, Iterator, List, Tuple, Union
+
+from digit_engine import to_digits, from_digits
+from scratchpad import TEXT, Step, Trace
+
+DATA_MAGIC = b"SWTRACE1"
+INDEX_MAGIC = b"SWINDEX1"
+INDEX_ENTRY = struct.Struct("<QQQ")
+U64 = struct.Struct("<Q")
+U32 = struct.Struct("<I")
+I64 = struct.Struct("<q")
+F64 = struct.Struct("<d")
+STEP_HEAD = struct.Struct("<BB")
+
+# Argument type tags (digits and carries fit the one-byte form)
+TAG_BYTE, TAG_INT, TAG_BIGINT = b"u", b"i", b"b"
+TAG_FLOAT, TAG_STR, TAG_NONE = b"f", b"s", b"n"
+_I64_MIN, _I64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _encode_arg(out: bytearray, value: Any) -> None:
+    if isinstance(value, int):
+        if 0 <= value <= 255:
+            out += TAG_BYTE
+            out.append(value)
+            return
+        if _I64_MIN <= value <= _I64_MAX:
+            out += TAG_INT
+            out += I64.pack(value)
+            return
+        digits = to_digits(value).encode("ascii")
+        out += TAG_BIGINT
+        out += U32.pack(len(digits))
+        out += digits
+    elif isinstance(value, float):
+        out += TAG_FLOAT
+        out += F64.pack(value)
+    elif value is None:
+        out += TAG_NONE
+    else:
+        text = str(value).encode("utf-8")
+        out += TAG_STR
+        out += U32.pack(len(text))
+        out += text
+
+
+def _decode_arg(buffer: Any, offset: int) -> Tuple[Any, int]:
+    tag = buffer[offset:offset + 1]
+    offset += 1
+    if tag == TAG_BYTE:
+        return buffer[offset], offset + 1
+    if tag == TAG_INT:
+        return I64.unpack_from(buffer, offset)[0], offset + 8
+    if tag == TAG_FLOAT:
+        return F64.unpack_from(buffer, offset)[0], offset + 8
+    if tag == TAG_NONE:
+        return None, offset
+    size = U32.unpack_from(buffer, offset)[0]
+    offset += 4
+    raw = bytes(buffer[offset:offset + size])
+    if tag == TAG_BIGINT:
+        return from_digits(raw.decode("ascii")), offset + size
+    return raw.decode("utf-8"), offset + size
+
+
+def _records(trace: Union[Trace, Iterable[Any]]) -> Iterator[Tuple[int, tuple]]:
+    """(kind, args) records from a Trace, Step objects or plain strings"""
+    items = trace.steps() if isinstance(trace, Trace) else trace
+    for item in items:
+        if isinstance(item, Step):
+            yield item.kind, item.args
+        elif isinstance(item, str):
+            yield TEXT, (item,)
+        else:
+            yield item
+
+
+def encode_block(trace: Union[Trace, Iterable[Any]]) -> Tuple[bytes, int]:
+    """One problem's steps as a data block; returns (block, step count)"""
+    body = bytearray()
+    offsets: List[int] = []
+    for kind, args in _records(trace):
+        offsets.append(len(body))
+        body += STEP_HEAD.pack(kind, len(args))
+        for arg in args:
+            _encode_arg(body, arg)
+    head_size = 8 + 8 * len(offsets)
+    head = U64.pack(len(offsets)) + struct.pack(f"<{len(offsets)}Q", *(o + head_size for o in offsets))
+    return head + bytes(body), len(offsets)
+
+
+class TraceWriter:
+    """Appends traces to a store. Use as a context manager, or call close()."""
+
+    def __init__(self, path: str, sync: bool = False):
+        self.path = path
+        self.sync = sync  # fsync every block, so appended traces survive a crash
+        self._data = open(path + ".trc", "ab")
+        self._index = open(path + ".idx", "ab")
+        # Headers go out right away: a reader may open the store before
+        # the first trace is appended
+        if self._data.tell() == 0:
+            self._data.write(DATA_MAGIC)
+            self._flush(self._data)
+        if self._index.tell() == 0:
+            self._index.write(INDEX_MAGIC)
+            self._flush(self._index)
+        self._count = (self._index.tell() - len(INDEX_MAGIC)) // INDEX_ENTRY.size
+
+    def append(self, trace: Union[Trace, Iterable[Any]]) -> int:
+        """
+        Store one problem's trace: an AIAgent scratchpad (Trace), a list of
+        Step objects, (kind, args) tuples, or plain strings (e.g. a
+        MathProblemSolver scratchpad). Returns the new problem id.
+        """
+        block, steps = encode_block(trace)
+        offset = self._data.tell()
+        self._data.write(block)
+        # The block has to be in the file before its index entry is, or a
+        # reader refreshing in between would find an entry past the data
+        self._flush(self._data)
+        self._index.write(INDEX_ENTRY.pack(offset, len(block), steps))
+        self._flush(self._index)
+        self._count += 1
+        return self._count - 1
+
+    def _flush(self, file: Any) -> None:
+        file.flush()
+        if self.sync:
+            os.fsync(file.fileno())
+
+    def flush(self) -> None:
+        self._flush(self._data)
+        self._flush(self._index)
+
+    def close(self) -> None:
+        self.flush()
+        self._data.close()
+        self._index.close()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> "TraceWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class StoredTrace:
+    """
+    One problem's steps, decoded from the mapped file only when accessed.
+    The reader hands it a memoryview of its block, which keeps that map
+    open for as long as the trace is around.
+    """
+
+    def __init__(self, buffer: Any, offset: int, steps: int):
+        self._buffer = buffer
+        self._offset = offset
+        self._steps = steps
+
+    def __len__(self) -> int:
+        return self._steps
+
+    def step(self, number: int) -> Step:
+        """Decode step `number` (0-based) of this trace"""
+        if number < 0:
+            number += self._steps
+        if not 0 <= number < self._steps:
+            raise IndexError("step number out of range")
+        buffer = self._buffer
+        position = self._offset + U64.unpack_from(buffer, self._offset + 8 + 8 * number)[0]
+        kind, count = STEP_HEAD.unpack_from(buffer, position)
+        position += 2
+        args = []
+        for _ in range(count):
+            value, position = _decode_arg(buffer, position)
+            args.append(value)
+        return Step(kind, tuple(args))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.step(i).text for i in range(*index.indices(self._steps))]
+        return self.step(index).text
+
+    def __iter__(self) -> Iterator[str]:
+        for number in range(self._steps):
+            yield self.step(number).text
+
+    def steps(self) -> Iterator[Step]:
+        for number in range(self._steps):
+            yield self.step(number)
+
+
+class TraceStoreReader:
+    """Random access to a store through memory maps"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data_file = open(path + ".trc", "rb")
+        self._index_file = open(path + ".idx", "rb")
+        self._data = self._index = None
+        self.refresh()
+        if self._data[:len(DATA_MAGIC)] != DATA_MAGIC or self._index[:len(INDEX_MAGIC)] != INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"'{path}' is not a trace store")
+
+    def refresh(self) -> None:
+        """Map the files again to see traces appended since opening"""
+        old = (self._data, self._index)
+        self._data = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._count = (len(self._index) - len(INDEX_MAGIC)) // INDEX_ENTRY.size
+        for view in old:
+            _release(view)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def entry(self, problem_id: int) -> Tuple[int, int, int]:
+        """(block offset, block length, step count) of one problem"""
+        if problem_id < 0:
+            problem_id += self._count
+        if not 0 <= problem_id < self._count:
+            raise IndexError("problem id out of range")
+        return INDEX_ENTRY.unpack_from(self._index, len(INDEX_MAGIC) + problem_id * INDEX_ENTRY.size)
+
+    def trace(self, problem_id: int) -> StoredTrace:
+        """The trace of one problem (nothing is decoded until you read steps)"""
+        offset, length, steps = self.entry(problem_id)
+        return StoredTrace(memoryview(self._data)[offset:offset + length], 0, steps)
+
+    def step(self, problem_id: int, number: int) -> Step:
+        """A single step of a single problem"""
+        return self.trace(problem_id).step(number)
+
+    def __getitem__(self, problem_id: int) -> StoredTrace:
+        return self.trace(problem_id)
+
+    def __iter__(self) -> Iterator[StoredTrace]:
+        for problem_id in range(self._count):
+            yield self.trace(problem_id)
+
+    def close(self) -> None:
+        for view in (self._data, self._index):
+            _release(view)
+        self._data_file.close()
+        self._index_file.close()
+
+    def __enter__(self) -> "TraceStoreReader":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+def _release(view: Any) -> None:
+    """Unmap a file now, or (while traces still use it) once the last of them is gone"""
+    if view is None:
+        return
+    try:
+        view.close()
+    except BufferError:  # Exported to a StoredTrace: freed with it
+        pass
@@ -0,0 +1,1436 @@
+"""
+Trace Verifier
+Checks scratchpads for arithmetic mistakes without solving the problems
+again: every column sum and carry, every borrow, every digit product and
+partial result, every long division step, and the numbers in equation and
+geometry steps must agree with each other (and with the problem). The
+first step that doesn't is reported, for each trace.
+
+Traces can be AIAgent scratchpads (Trace objects, step records or their
+text lines, e.g. from a model trained on them) or MathProblemSolver
+scratchpads. Text is read back into step records with regular expressions
+built from the scratchpad templates.
+
+Most of a long trace is runs of the same kind of step (the columns of an
+addition or subtraction, the digit products of a row), so runs are read
+with one regular expression call and checked a column at a time, a whole
+run at once; only runs with a mistake in them are gone through step by
+step, to find the first bad step and say what is wrong with it.
+
+Usage:
+    python verifier.py data/shard-*.jsonl.gz results.jsonl --workers 8
+"""
+
+import argparse
+import ast
+import gzip
+import json
+import math
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import numpy as np  # Optional: checks whole batches of digit traces at once
+except ImportError:
+    np = None
+
+from digit_engine import add_digits, from_digits, to_digits
+from geometry import SHAPES, Shape
+from scratchpad import (
+    TEMPLATES, POSITION_KINDS, DEPTH_KINDS, Step, Trace,
+    INPUT, TEXT, ERROR, ADD_DIGIT, SET_CARRY, FINAL_CARRY, APPLY_BORROW, NEED_BORROW,
+    SUB_DIGIT, MUL_ROW, MUL_DIGIT, MUL_FINAL_CARRY, PARTIAL_RESULT, FINAL_RESULT,
+    MUL_FINAL_RESULT, MUL_STRATEGY, LIMB_ROW, KARATSUBA_SPLIT, KARATSUBA_LEAF,
+    KARATSUBA_COMBINE, EXPR_NODE, EXPR_VALUE, DIV_STRATEGY, DIV_DIGIT, DIV_LIMB, DIV_RECIPROCAL,
+    DIV_NEWTON, DIV_ESTIMATE, DIV_CORRECT, DIV_RESULT,
+)
+
+
+class Issue(NamedTuple):
+    """The first step of a trace that doesn't add up"""
+    step: int    # 0-based step (line) number
+    text: str    # The step as written
+    reason: str  # What is wrong with it
+
+
+PARSE_CACHE_SIZE = 65536
+
+# Arguments that are text rather than numbers
+_TEXT_ARGS = {(INPUT, 0), (TEXT, 0), (ERROR, 0), (MUL_STRATEGY, 2), (DIV_STRATEGY, 2), (EXPR_NODE, 1),
+              (EXPR_VALUE, 1)}
+
+# Most common single lines first (runs of digit steps are read separately),
+# free-form text last (it matches anything)
+_PARSE_ORDER = (
+    PARTIAL_RESULT, MUL_ROW, MUL_FINAL_CARRY, FINAL_CARRY, INPUT, FINAL_RESULT, MUL_FINAL_RESULT,
+    LIMB_ROW, MUL_STRATEGY, KARATSUBA_LEAF, KARATSUBA_SPLIT, KARATSUBA_COMBINE, EXPR_NODE,
+    EXPR_VALUE, DIV_DIGIT, DIV_LIMB, DIV_RESULT, DIV_STRATEGY, DIV_RECIPROCAL, DIV_NEWTON, DIV_ESTIMATE,
+    DIV_CORRECT, ADD_DIGIT, SET_CARRY, APPLY_BORROW, NEED_BORROW, SUB_DIGIT, MUL_DIGIT, ERROR, TEXT,
+)
+
+
+def _pattern(kind: int) -> str:
+    """A regular expression for one template, with a group per argument"""
+    pattern = ""
+    for i, part in enumerate(re.split(r"\{(\d+)\}", TEMPLATES[kind].lstrip("\n"))):
+        if i % 2 == 0:
+            pattern += re.escape(part)
+        elif kind in POSITION_KINDS and part == "0":
+            pattern += r"(units|position \d+)"
+        elif kind in DEPTH_KINDS and part == "0":
+            pattern += "( *)"
+        elif (kind, int(part)) in _TEXT_ARGS:
+            pattern += "(.*)" if kind in (INPUT, TEXT, ERROR) else r"(\S+)"
+        else:
+            pattern += r"(-?\d+)"
+    return pattern
+
+
+def _number(text: str) -> int:
+    return int(text) if len(text) < 4000 else (-from_digits(text[1:]) if text[0] == "-" else from_digits(text))
+
+
+def _position(text: str) -> int:
+    return 1 if text == "units" else int(text[9:])
+
+
+def _depth(text: str) -> int:
+    return len(text) // 2
+
+
+def _converters(kind: int) -> tuple:
+    """How to turn each argument of a kind back from text"""
+    converters = []
+    for index in range(re.compile(_pattern(kind)).groups):
+        if kind in POSITION_KINDS and index == 0:
+            converters.append(_position)
+        elif kind in DEPTH_KINDS and index == 0:
+            converters.append(_depth)
+        elif (kind, index) in _TEXT_ARGS:
+            converters.append(str)
+        else:
+            converters.append(_number)
+    return tuple(converters)
+
+
+def _build_parser() -> Tuple["re.Pattern", Dict[int, Tuple[int, Tuple[int, ...], tuple]]]:
+    """One regular expression for every template, and where each kind's arguments are"""
+    branches = []
+    groups: Dict[int, Tuple[int, Tuple[int, ...], tuple]] = {}
+    group = 0
+    for kind in _PARSE_ORDER:
+        converters = _converters(kind)
+        groups[group + 1] = (kind, tuple(range(group + 2, group + 2 + len(converters))), converters)
+        branches.append(f"({_pattern(kind)})")
+        group += 1 + len(converters)
+    return re.compile("|".join(branches), re.DOTALL), groups
+
+
+_LINE, _GROUPS = _build_parser()
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_line(line: str) -> Tuple[int, tuple]:
+    """Read one scratchpad line back into a (kind, args) record (cached: most lines repeat)"""
+    match = _LINE.fullmatch(line.lstrip("\n"))
+    kind, groups, converters = _GROUPS[match.lastindex]
+    values = match.group(*groups) if len(groups) > 1 else (match.group(groups[0]),)
+    return kind, tuple([convert(value) for convert, value in zip(converters, values)])
+
+
+def _lines(trace: Any) -> List[str]:
+    """Scratchpad text (one string or a list of lines) as non-blank lines"""
+    if isinstance(trace, str):
+        trace = trace.split("\n")
+    return [line for line in trace if line.strip()]
+
+
+# Runs of steps that are checked together. One row is one column of an
+# addition (with its carry), of a subtraction (with its borrows), or one
+# digit product of a multiplication row.
+ADD_ROWS, SUB_ROWS, MUL_ROWS = "add", "sub", "mul"
+
+
+def _without_groups(pattern: str) -> str:
+    return re.sub(r"(?<!\\)\((?!\?)", "(?:", pattern)
+
+
+_ROW_PATTERNS = {
+    ADD_ROWS: f"{_pattern(ADD_DIGIT)}(?:\\n{_pattern(SET_CARRY)})?",
+    SUB_ROWS: f"(?:{_pattern(APPLY_BORROW)}\\n)?(?:{_pattern(NEED_BORROW)}\\n)?{_pattern(SUB_DIGIT)}",
+    MUL_ROWS: _pattern(MUL_DIGIT),
+}
+_ROWS = {name: re.compile(f"^{pattern}$", re.M) for name, pattern in _ROW_PATTERNS.items()}
+_RUN_NAMES = tuple(_ROW_PATTERNS)
+_TEXT_ITEMS = re.compile(
+    "^(?:" + "|".join(f"({_without_groups(p)}(?:\\n{_without_groups(p)})*)" for p in _ROW_PATTERNS.values())
+    + "|(.+))$", re.M)
+
+
+def _optional(column: Tuple[str, ...]) -> tuple:
+    return tuple([int(value) if value else None for value in column])
+
+
+def _text_columns(name: str, rows: List[Tuple[str, ...]]) -> tuple:
+    """Turn the text of a run's rows into columns of numbers"""
+    if name == MUL_ROWS:
+        values = tuple(map(int, chain.from_iterable(rows)))
+        return values[0::4], values[1::4], values[2::4], values[3::4]
+    columns = tuple(zip(*rows))
+    if name == ADD_ROWS:
+        positions, digits1, digits2, carries, totals, sets = columns
+        return (tuple(map(_position, positions)), tuple(map(int, digits1)), tuple(map(int, digits2)),
+                tuple(map(int, carries)), tuple(map(int, totals)), _optional(sets))
+    if name == SUB_ROWS:
+        before_a, after_a, before_n, after_n, positions, digits1, digits2, differences = columns
+        return (_optional(before_a), _optional(after_a), _optional(before_n), _optional(after_n),
+                tuple(map(_position, positions)), tuple(map(int, digits1)), tuple(map(int, digits2)),
+                tuple(map(int, differences)))
+    raise ValueError(f"unknown run '{name}'")
+
+
+def _text_items(text: str) -> Iterator[Tuple[Any, Any, int, Any]]:
+    """(kind, args, steps, source) for the runs and single steps of a text trace"""
+    for match in _TEXT_ITEMS.finditer(text):
+        index = match.lastindex
+        if index > len(_RUN_NAMES):
+            line = match.group(index)
+            if line.strip():
+                kind, args = parse_line(line)
+                yield kind, args, 1, line
+            continue
+        name = _RUN_NAMES[index - 1]
+        run = match.group(index)
+        try:
+            columns = _text_columns(name, _ROWS[name].findall(text, match.start(), match.end()))
+        except ValueError:  # Numbers too long for int(): leave them to parse_line
+            columns = None
+        yield name, columns, run.count("\n") + 1, run
+
+
+def _record_items(records: List[Tuple[int, tuple, Any]]) -> Iterator[Tuple[Any, Any, int, Any]]:
+    """(kind, args, steps, source) for the runs and single steps of a list of records"""
+    i, count = 0, len(records)
+    while i < count:
+        kind, args, item = records[i]
+        start = i
+        rows = []
+        if kind == ADD_DIGIT:
+            name = ADD_ROWS
+            while i < count and records[i][0] == ADD_DIGIT and len(records[i][1]) == 5:
+                row = records[i][1]
+                i += 1
+                if i < count and records[i][0] == SET_CARRY and len(records[i][1]) == 1:
+                    rows.append(row + records[i][1])
+                    i += 1
+                else:
+                    rows.append(row + (None,))
+        elif kind in (SUB_DIGIT, APPLY_BORROW, NEED_BORROW):
+            name = SUB_ROWS
+            while i < count:
+                j, applied, needed = i, (None, None), (None, None)
+                if records[j][0] == APPLY_BORROW and len(records[j][1]) == 2:
+                    applied = records[j][1]
+                    j += 1
+                if j < count and records[j][0] == NEED_BORROW and len(records[j][1]) == 2:
+                    needed = records[j][1]
+                    j += 1
+                if j == count or records[j][0] != SUB_DIGIT or len(records[j][1]) != 4:
+                    break
+                rows.append(applied + needed + records[j][1])
+                i = j + 1
+        elif kind == MUL_DIGIT:
+            name = MUL_ROWS
+            while i < count and records[i][0] == MUL_DIGIT and len(records[i][1]) == 4:
+                rows.append(records[i][1])
+                i += 1
+        if rows:
+            yield name, tuple(zip(*rows)), i - start, records[start:i]
+        else:
+            yield kind, args, 1, item
+            i = start + 1
+
+
+def _records(trace: Any) -> List[Tuple[int, tuple, Any]]:
+    """(kind, args, original) for every step of a list of Steps, records or lines"""
+    records = []
+    for item in trace:
+        if isinstance(item, Step):
+            records.append((item.kind, item.args, item))
+        elif isinstance(item, str):
+            if item.strip():
+                kind, args = parse_line(item)
+                records.append((kind, args, item))
+        else:
+            records.append((item[0], tuple(item[1]), item))
+    return records
+
+
+def _items(trace: Any) -> Iterator[Tuple[Any, Any, int, Any]]:
+    if isinstance(trace, Trace):
+        return _record_items(_records(trace.steps()))
+    if isinstance(trace, str):
+        return _text_items(trace)
+    trace = list(trace)
+    if trace and isinstance(trace[0], str):
+        return _text_items("\n".join(trace))
+    return _record_items(_records(trace))
+
+
+def _expand(source: Any) -> List[Tuple[int, tuple, Any]]:
+    """The single steps of a run, to go through one by one"""
+    if isinstance(source, str):
+        return _records(source.split("\n"))
+    return source
+
+
+class _Bad(Exception):
+    pass
+
+
+def _expect(condition: bool, reason: str) -> None:
+    if not condition:
+        raise _Bad(reason)
+
+
+_SIMPLE = re.compile(r"\s*(\d+)\s*([-+*/%])\s*(\d+)\s*", re.ASCII)
+_DIGIT_VALUES = bytes.maketrans(b"0123456789", bytes(range(10)))
+
+
+class _AgentChecker:
+    """Follows an AIAgent trace, keeping just enough state to check each step"""
+
+    def __init__(self):
+        self.operands: Optional[Tuple[str, str, str]] = None
+        self.values: Optional[set] = None  # Numbers an expression step may work on
+        self.node: Optional[tuple] = None
+        self.last_value: Any = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the work of the current operation"""
+        self.position = 1      # Next column (1 = units)
+        self.carry = 0
+        self.borrow = False    # Borrow owed by the current column
+        self.applied = False   # Current column paid its borrow
+        self.needed = False    # Current column borrowed from the next one
+        self.digit1: Optional[int] = None  # Current column's top digit, after borrows
+        self.digits: List[int] = []        # Answer digits so far, units first
+        self.base = 10
+        self.row: Optional[List[int]] = None
+        self.row_position = 0
+        self.rows = 0          # Rows done so far
+        self.multiplier = 0
+        self.column = 1
+        self.partial_sum: Optional[int] = None
+        self.products: Dict[int, List[int]] = {}  # Karatsuba results per depth
+        self.halves: Optional[List[Tuple[str, str]]] = None  # Karatsuba products still to come
+        self.top: Optional[int] = None
+        self.brought_down = 0  # Digits of the dividend brought down so far
+        self.divisor: Optional[int] = None
+        self.remainder = 0
+        self.quotient: Optional[int] = None   # The quotient the division steps come to so far
+        self.division: Optional[Tuple[int, int]] = None  # Quotient and remainder, once written down
+        self._limb_cache: Dict[Tuple[int, int], Sequence[int]] = {}
+
+    def _limbs(self, which: int) -> Sequence[int]:
+        """Digits (or limbs, for bigger bases) of an operand, units first"""
+        key = (which, self.base)
+        limbs = self._limb_cache.get(key)
+        if limbs is None:
+            number = self.operands[which]
+            if self.base == 10:
+                limbs = number[::-1].encode("ascii").translate(_DIGIT_VALUES)
+            else:
+                width = len(str(self.base)) - 1
+                limbs = [int(number[max(end - width, 0):end]) for end in range(len(number), 0, -width)]
+            self._limb_cache[key] = limbs
+        return limbs
+
+    def _limb(self, which: int, position: int) -> Optional[int]:
+        """Limb `position` (1 = units) of an operand, None if the operands aren't known"""
+        if self.operands is None:
+            return None
+        limbs = self._limbs(which)
+        return limbs[position - 1] if position <= len(limbs) else 0
+
+    def _limbs_at(self, which: int, position: int, count: int) -> tuple:
+        """Limbs position .. position + count - 1 of an operand"""
+        limbs = tuple(self._limbs(which)[position - 1:position - 1 + count])
+        return limbs + (0,) * (count - len(limbs))
+
+    def worked_out(self) -> Optional[int]:
+        """The answer the steps of the current operation add up to, if any"""
+        if self.division is not None:
+            return self.division[self.operands[2] == "%"] if self.operands is not None else None
+        if self.digits:
+            return from_digits("".join(map(str, reversed(self.digits))).lstrip("0") or "0")
+        if self.partial_sum is not None:
+            return self.partial_sum
+        return self.top
+
+    def native(self) -> Optional[int]:
+        if self.operands is None:
+            return None
+        num1, num2, operation = from_digits(self.operands[0]), from_digits(self.operands[1]), self.operands[2]
+        if operation in "/%":
+            return None if num2 == 0 else num1 // num2 if operation == "/" else num1 % num2
+        return num1 + num2 if operation == "+" else num1 - num2 if operation == "-" else num1 * num2
+
+    def check(self, kind: int, args: tuple) -> None:
+        handler = _AGENT_CHECKS.get(kind)
+        if handler is not None:
+            handler(self, *args)
+
+    def check_rows(self, name: str, columns: tuple) -> bool:
+        """Check a whole run at once; False (and nothing changed) if any row is off"""
+        if columns is None or self.operands is None:
+            return False
+        try:
+            return _ROW_CHECKS[name](self, *columns)
+        except (TypeError, ValueError, IndexError):
+            return False
+
+    def input(self, problem: Any) -> None:
+        self.__init__()
+        match = _SIMPLE.fullmatch(problem) if isinstance(problem, str) else None
+        if match:
+            num1, operation, num2 = match.groups()
+            self.operands = (num1.lstrip("0") or "0", num2.lstrip("0") or "0", operation)
+        elif isinstance(problem, str):
+            self.values = {_number(number) for number in re.findall(r"\d+", problem)}
+
+    def strategy(self, length1: int, length2: int, name: str, operations: str = "*") -> None:
+        """The header of a multiplication or division: its operand lengths must be the input's"""
+        if self.operands is None:
+            return
+        num1, num2, operation = self.operands
+        _expect(operation in operations, f"no {'multiplication' if operations == '*' else 'division'} here")
+        _expect(length1 == len(num1), f"first number has {len(num1)} digits")
+        _expect(length2 == len(num2), f"second number has {len(num2)} digits")
+
+    def div_strategy(self, length1: int, length2: int, name: str) -> None:
+        self.strategy(length1, length2, name, "/%")
+
+    # Addition
+    def add_digit(self, position: int, digit1: int, digit2: int, carry: int, total: int) -> None:
+        _expect(position == self.position, f"expected column {self.position}")
+        expected1, expected2 = self._limb(0, position), self._limb(1, position)
+        _expect(expected1 is None or digit1 == expected1, f"top digit should be {expected1}")
+        _expect(expected2 is None or digit2 == expected2, f"bottom digit should be {expected2}")
+        _expect(total == digit1 + digit2 + self.carry,
+                f"{digit1} + {digit2} + carry {self.carry} is {digit1 + digit2 + self.carry}")
+        _expect(carry == (1 if total >= 10 else 0), f"carry should be {1 if total >= 10 else 0}")
+        self.carry = carry
+        self.digits.append(total % 10)
+        self.position += 1
+
+    def add_rows(self, positions: tuple, digits1: tuple, digits2: tuple, carries: tuple,
+                 totals: tuple, sets: tuple) -> bool:
+        count = len(totals)
+        if positions != tuple(range(self.position, self.position + count)):
+            return False
+        if digits1 != self._limbs_at(0, self.position, count) or digits2 != self._limbs_at(1, self.position, count):
+            return False
+        carries_in = (self.carry,) + carries[:-1]
+        if not all(a + b + c == t for a, b, c, t in zip(digits1, digits2, carries_in, totals)):
+            return False
+        if carries != tuple([1 if t >= 10 else 0 for t in totals]):
+            return False
+        if not all(s is None or s == c == 1 for s, c in zip(sets, carries)):
+            return False
+        self.carry = carries[-1]
+        self.digits += [t % 10 for t in totals]
+        self.position += count
+        return True
+
+    def set_carry(self, carry: int) -> None:
+        _expect(carry == self.carry == 1, "no carry to set")
+
+    def final_carry(self, carry: int) -> None:
+        _expect(carry == self.carry, f"final carry should be {self.carry}")
+        self.digits.append(carry)
+
+    # Subtraction
+    def apply_borrow(self, before: int, after: int) -> None:
+        _expect(self.borrow and not self.applied, "no borrow to apply")
+        expected = self._limb(0, self.position)
+        _expect(expected is None or before == expected, f"top digit should be {expected}")
+        _expect(after == before - 1, f"{before} should become {before - 1}")
+        self.applied = True
+        self.digit1 = after
+
+    def need_borrow(self, before: int, after: int) -> None:
+        current = self.digit1 if self.digit1 is not None else self._limb(0, self.position)
+        _expect(current is None or before == current, f"top digit should be {current}")
+        bottom = self._limb(1, self.position)
+        _expect(bottom is None or before < bottom, f"{before} is not less than {bottom}")
+        _expect(after == before + 10, f"{before} should become {before + 10}")
+        self.needed = True
+        self.digit1 = after
+
+    def sub_digit(self, position: int, digit1: int, digit2: int, difference: int) -> None:
+        _expect(position == self.position, f"expected column {self.position}")
+        _expect(not self.borrow or self.applied, "borrow from the previous column was not applied")
+        current = self.digit1 if self.digit1 is not None else self._limb(0, position)
+        _expect(current is None or digit1 == current, f"top digit should be {current}")
+        bottom = self._limb(1, position)
+        _expect(bottom is None or digit2 == bottom, f"bottom digit should be {bottom}")
+        _expect(self.needed or digit1 >= digit2, f"{digit1} - {digit2} needs a borrow")
+        _expect(difference == digit1 - digit2, f"{digit1} - {digit2} is {digit1 - digit2}")
+        self.digits.append(difference)
+        self.borrow, self.applied, self.needed, self.digit1 = self.needed, False, False, None
+        self.position += 1
+
+    def sub_rows(self, applied_before: tuple, applied_after: tuple, needed_before: tuple,
+                 needed_after: tuple, positions: tuple, digits1: tuple, digits2: tuple,
+                 differences: tuple) -> bool:
+        count = len(differences)
+        if self.applied or self.needed or positions != tuple(range(self.position, self.position + count)):
+            return False
+        tops = self._limbs_at(0, self.position, count)
+        bottoms = self._limbs_at(1, self.position, count)
+        needed = tuple([b is not None for b in needed_before])
+        owed = (self.borrow,) + needed[:-1]
+        if tuple([b is not None for b in applied_before]) != owed:
+            return False
+        if not all(b is None or (b == t and a == b - 1)
+                   for b, a, t in zip(applied_before, applied_after, tops)):
+            return False
+        currents = tuple([t - o for t, o in zip(tops, owed)])
+        if not all((c >= bottom) if b is None else (b == c and b < bottom and a == b + 10)
+                   for b, a, c, bottom in zip(needed_before, needed_after, currents, bottoms)):
+            return False
+        if digits1 != tuple([c + 10 if n else c for c, n in zip(currents, needed)]) or digits2 != bottoms:
+            return False
+        if not all(d == a - b for d, a, b in zip(differences, digits1, digits2)):
+            return False
+        self.digits += differences
+        self.borrow = needed[-1]
+        self.position += count
+        return True
+
+    # Multiplication (digits and limbs)
+    def mul_row(self, multiplier: int, position: int) -> None:
+        self._start_row(multiplier, position, 10)
+
+    def limb_row(self, multiplier: int, position: int, limb_digits: int) -> None:
+        self._start_row(multiplier, position, 10 ** limb_digits)
+
+    def _start_row(self, multiplier: int, position: int, base: int) -> None:
+        self.base = base
+        _expect(self.row is None, "previous row has no partial result")
+        _expect(position == self.rows, f"expected position {self.rows}")
+        self.rows += 1
+        expected = self._limb(1, position + 1)
+        _expect(expected is None or multiplier == expected, f"multiplier should be {expected}")
+        self.row, self.row_position, self.multiplier = [], position, multiplier
+        self.carry, self.column = 0, 1
+
+    def mul_digit(self, digit1: int, digit2: int, carry: int, product: int) -> None:
+        _expect(self.row is not None, "digit product outside a row")
+        expected = self._limb(0, self.column)
+        _expect(expected is None or digit1 == expected, f"top digit should be {expected}")
+        _expect(digit2 == self.multiplier, f"multiplier should be {self.multiplier}")
+        _expect(product == digit1 * digit2 + self.carry,
+                f"{digit1} × {digit2} + carry {self.carry} is {digit1 * digit2 + self.carry}")
+        _expect(carry == product // self.base, f"carry should be {product // self.base}")
+        self.row.append(product - carry * self.base)
+        self.carry = carry
+        self.column += 1
+
+    def mul_rows(self, digits1: tuple, digits2: tuple, carries: tuple, products: tuple) -> bool:
+        if self.row is None or digits1 != self._limbs_at(0, self.column, len(products)):
+            return False
+        multiplier, base = self.multiplier, self.base
+        if digits2.count(multiplier) != len(digits2):
+            return False
+        carries_in = (self.carry,) + carries[:-1]
+        if not all(a * multiplier + c == p for a, c, p in zip(digits1, carries_in, products)):
+            return False
+        if carries != tuple([p // base for p in products]):
+            return False
+        self.row += [p - c * base for p, c in zip(products, carries)]
+        self.carry = carries[-1]
+        self.column += len(products)
+        return True
+
+    def mul_final_carry(self, carry: int) -> None:
+        _expect(self.row is not None and carry == self.carry != 0, f"final carry should be {self.carry}")
+        self.row.append(carry)
+
+    def partial_result(self, value: int) -> None:
+        _expect(self.row is not None, "partial result outside a row")
+        if self.operands is not None:
+            _expect(self.column - 1 == len(self._limbs(0)), "row skipped digits of the top number")
+        expected = 0
+        for digit in reversed(self.row):
+            expected = expected * self.base + digit
+        expected *= self.base ** self.row_position
+        if value != expected:
+            raise _Bad(f"partial result should be {to_digits(expected)}")
+        self.partial_sum = (self.partial_sum or 0) + value
+        self.row = None
+
+    # Karatsuba
+    def _next_halves(self) -> Optional[Tuple[str, str]]:
+        """The numbers the next Karatsuba product should multiply, if known"""
+        if self.halves is None and self.operands is not None:
+            self.halves = [self.operands[:2]]
+        if self.halves is None:
+            return None
+        _expect(bool(self.halves), "more products than the splits call for")
+        return self.halves.pop()
+
+    def karatsuba_split(self, depth: int, length: int, half: int) -> None:
+        _expect(half == length // 2, f"split should be at {length // 2} digits")
+        numbers = self._next_halves()
+        if numbers is not None:
+            x, y = numbers
+            _expect(length == max(len(x), len(y)), f"numbers have {max(len(x), len(y))} digits")
+            x_high, x_low = x[:-half] or "0", x[-half:]
+            y_high, y_low = y[:-half] or "0", y[-half:]
+            # Worked out as low·low, high·high, then sum·sum
+            self.halves += [(add_digits(x_low, x_high), add_digits(y_low, y_high)),
+                            (x_high, y_high), (x_low, y_low)]
+
+    def karatsuba_leaf(self, depth: int, x: int, y: int, product: int) -> None:
+        numbers = self._next_halves()
+        if numbers is not None and (x, y) != (from_digits(numbers[0]), from_digits(numbers[1])):
+            raise _Bad(f"should multiply {numbers[0].lstrip('0') or 0} by {numbers[1].lstrip('0') or 0}")
+        _expect(product == x * y, "leaf product is wrong")
+        self.products.setdefault(depth, []).append(product)
+        self.top = product
+
+    def karatsuba_combine(self, depth: int, z2: int, shift2: int, z1: int, shift1: int,
+                          z0: int, result: int) -> None:
+        _expect(shift2 == 2 * shift1, "shifts don't match")
+        children = self.products.pop(depth + 1, [])
+        if len(children) == 3:
+            _expect(z0 == children[0] and z2 == children[1], "halves don't match their products")
+            _expect(z1 == children[2] - z2 - z0, "middle term should be (sum·sum) - z2 - z0")
+        _expect(result == (z2 * 10 ** shift1 + z1) * 10 ** shift1 + z0, "combined result is wrong")
+        self.products.setdefault(depth, []).append(result)
+        self.top = result
+
+    # Division
+    def _bring_down(self, limb: int, digits: int, current: int, divisor: int,
+                    quotient: int, remainder: int, base: int) -> None:
+        if self.operands is not None:
+            dividend = self.operands[0]
+            end = self.brought_down + digits
+            _expect(end <= len(dividend), "brings down more digits than the dividend has")
+            expected = int(dividend[self.brought_down:end])
+            _expect(limb == expected, f"should bring down {expected}")
+            if self.divisor is None:
+                self.divisor = from_digits(self.operands[1])
+            if divisor != self.divisor:
+                raise _Bad(f"divisor should be {self.operands[1]}")
+            self.brought_down = end
+        if current != self.remainder * base + limb:
+            raise _Bad(f"{to_digits(self.remainder)} and {limb} make {to_digits(self.remainder * base + limb)}")
+        if not 0 <= remainder < divisor:
+            raise _Bad(f"remainder should be less than {to_digits(divisor)}")
+        if current != quotient * divisor + remainder:
+            raise _Bad(f"{to_digits(current)} ÷ {to_digits(divisor)} is {to_digits(current // divisor)}"
+                       f" remainder {to_digits(current % divisor)}")
+        self.quotient = (self.quotient or 0) * base + quotient
+        self.remainder = remainder
+
+    def div_digit(self, digit: int, current: int, divisor: int, quotient: int, remainder: int) -> None:
+        self._bring_down(digit, 1, current, divisor, quotient, remainder, 10)
+
+    def div_limb(self, limb: int, current: int, divisor: int, quotient: int, remainder: int,
+                 limb_digits: int) -> None:
+        digits = limb_digits
+        if self.operands is not None and self.brought_down == 0:
+            digits = len(self.operands[0]) % limb_digits or limb_digits  # The leading limb may be shorter
+        self._bring_down(limb, digits, current, divisor, quotient, remainder, 10 ** limb_digits)
+
+    def div_estimate(self, estimate: int) -> None:
+        _expect(self.quotient is None, "quotient was already worked out")
+        self.quotient = estimate
+
+    def div_correct(self, correction: int, quotient: int) -> None:
+        _expect(self.quotient is not None, "no quotient to correct")
+        if quotient != self.quotient + correction:
+            raise _Bad(f"{to_digits(self.quotient)} + {correction} is {to_digits(self.quotient + correction)}")
+        self.quotient = quotient
+
+    def div_result(self, quotient: int, remainder: int) -> None:
+        if self.quotient is not None:
+            _expect(quotient == self.quotient, f"steps come to a quotient of {to_digits(self.quotient)}")
+        if self.brought_down and remainder != self.remainder:
+            raise _Bad(f"last remainder was {to_digits(self.remainder)}")
+        if self.operands is not None:
+            num1, num2 = from_digits(self.operands[0]), from_digits(self.operands[1])
+            if not 0 <= remainder < num2:
+                raise _Bad(f"remainder should be less than {self.operands[1]}")
+            _expect(quotient * num2 + remainder == num1, "quotient × divisor + remainder isn't the dividend")
+        self.division = (quotient, remainder)
+
+    # Expressions and answers
+    def expr_node(self, left: int, operation: str, right: int) -> None:
+        _expect(self.values is None or (left in self.values and right in self.values),
+                "works on a number that isn't in the problem or worked out yet")
+        self.reset()
+        self.node = (left, operation, right)
+        self.operands = (to_digits(left), to_digits(right), operation)
+
+    def _check_complete(self) -> None:
+        """Every column (or row) of the operation must have been worked out"""
+        if self.operands is None:
+            return
+        if self.brought_down:
+            _expect(self.brought_down == len(self.operands[0]), "not every digit of the dividend was brought down")
+            _expect(self.division is not None, "no quotient and remainder written down")
+        elif self.digits:
+            num1, num2, operation = self.operands
+            columns = len(num1) if operation == "-" else max(len(num1), len(num2))
+            _expect(self.position - 1 == columns, "not every column was worked out")
+        elif self.rows:
+            _expect(self.row is None and self.rows == len(self._limbs(1)), "not every row was worked out")
+
+    def expr_value(self, left: int, operation: str, right: int, value: int) -> None:
+        _expect(self.node == (left, operation, right), "doesn't match the operation being worked out")
+        self._check_complete()
+        expected = self.worked_out()
+        if expected is not None and value != expected:
+            raise _Bad(f"steps add up to {to_digits(expected)}")
+        self.last_value = value
+        if self.values is not None:
+            self.values.add(value)
+
+    def final_result(self, value: Any) -> None:
+        if self.node is not None:
+            if value != self.last_value:
+                raise _Bad(f"last operation came to {to_digits(self.last_value)}")
+            return
+        _expect(not self.borrow, "a borrow is still owed")
+        self._check_complete()
+        expected = self.worked_out()
+        if expected is None:  # No digit steps written down: check the answer itself
+            expected = self.native()
+        if expected is not None and value != expected:
+            raise _Bad(f"steps add up to {to_digits(expected)}")
+
+
+_AGENT_CHECKS = {
+    INPUT: _AgentChecker.input,
+    ADD_DIGIT: _AgentChecker.add_digit,
+    SET_CARRY: _AgentChecker.set_carry,
+    FINAL_CARRY: _AgentChecker.final_carry,
+    APPLY_BORROW: _AgentChecker.apply_borrow,
+    NEED_BORROW: _AgentChecker.need_borrow,
+    SUB_DIGIT: _AgentChecker.sub_digit,
+    MUL_ROW: _AgentChecker.mul_row,
+    LIMB_ROW: _AgentChecker.limb_row,
+    MUL_DIGIT: _AgentChecker.mul_digit,
+    MUL_FINAL_CARRY: _AgentChecker.mul_final_carry,
+    PARTIAL_RESULT: _AgentChecker.partial_result,
+    MUL_STRATEGY: _AgentChecker.strategy,
+    KARATSUBA_SPLIT: _AgentChecker.karatsuba_split,
+    KARATSUBA_LEAF: _AgentChecker.karatsuba_leaf,
+    KARATSUBA_COMBINE: _AgentChecker.karatsuba_combine,
+    DIV_STRATEGY: _AgentChecker.div_strategy,
+    DIV_DIGIT: _AgentChecker.div_digit,
+    DIV_LIMB: _AgentChecker.div_limb,
+    DIV_ESTIMATE: _AgentChecker.div_estimate,
+    DIV_CORRECT: _AgentChecker.div_correct,
+    DIV_RESULT: _AgentChecker.div_result,
+    EXPR_NODE: _AgentChecker.expr_node,
+    EXPR_VALUE: _AgentChecker.expr_value,
+    FINAL_RESULT: _AgentChecker.final_result,
+    MUL_FINAL_RESULT: _AgentChecker.final_result,
+}
+
+_ROW_CHECKS = {
+    ADD_ROWS: _AgentChecker.add_rows,
+    SUB_ROWS: _AgentChecker.sub_rows,
+    MUL_ROWS: _AgentChecker.mul_rows,
+}
+
+
+def verify_agent_trace(trace: Any) -> Optional[Issue]:
+    """
+    Check an AIAgent trace: a Trace, Step records, (kind, args) records,
+    text lines or one text. Returns the first bad step, or None.
+    """
+    checker = _AgentChecker()
+    number = 0
+    for kind, args, size, source in _items(trace):
+        if kind in _ROW_CHECKS:
+            if checker.check_rows(kind, args):
+                number += size
+                continue
+            steps = _expand(source)
+        else:
+            steps = ((kind, args, source),)
+        for kind, args, item in steps:
+            try:
+                checker.check(kind, args)
+            except _Bad as bad:
+                return Issue(number, item if isinstance(item, str) else Step(kind, args).text, str(bad))
+            except (TypeError, ValueError) as e:
+                return Issue(number, item if isinstance(item, str) else Step(kind, args).text,
+                             f"step can't be read ({e})")
+            number += 1
+    return None
+
+
+# Batches of plain digit traces - one addition, subtraction or digit by digit
+# multiplication of numbers that fit in 64 bits, like the training data -
+# are checked with NumPy, every line of every trace at once. Each line is
+# matched to its template by its shape (the line with every number replaced
+# by one marker byte), the numbers are read in bulk, and each rule of the
+# step checker becomes one array comparison. Traces that break a rule, or
+# that have anything else in them, go to verify_agent_trace, which has the
+# last word and says what is wrong.
+
+BATCH_SIZE = 10_000
+_NUMBER_MARK = 0xFF   # Never part of UTF-8 text
+_SHAPE_WIDTH = 48     # Longest line shape matched, in bytes (a multiple of 8)
+_MAX_DIGITS = 18      # Numbers this long still fit in 64 bits
+_START, _END, _UNKNOWN = 64, 65, 66  # Above every step kind
+_OPERATIONS = "+-*"
+
+# Which step may follow which (the order the digit engines write them in)
+_FOLLOWS = {
+    _START: (INPUT,),
+    INPUT: (ADD_DIGIT, NEED_BORROW, SUB_DIGIT, MUL_ROW),
+    ADD_DIGIT: (ADD_DIGIT, SET_CARRY, FINAL_CARRY, FINAL_RESULT),
+    SET_CARRY: (ADD_DIGIT, FINAL_CARRY, FINAL_RESULT),
+    FINAL_CARRY: (FINAL_RESULT,),
+    APPLY_BORROW: (NEED_BORROW, SUB_DIGIT),
+    NEED_BORROW: (SUB_DIGIT,),
+    SUB_DIGIT: (APPLY_BORROW, NEED_BORROW, SUB_DIGIT, FINAL_RESULT),
+    MUL_ROW: (MUL_DIGIT,),
+    MUL_DIGIT: (MUL_DIGIT, MUL_FINAL_CARRY, PARTIAL_RESULT),
+    MUL_FINAL_CARRY: (PARTIAL_RESULT,),
+    PARTIAL_RESULT: (MUL_ROW, FINAL_RESULT),
+    FINAL_RESULT: (_END,),
+}
+# The steps each operation is worked out with
+_OPERATION_KINDS = {
+    "+": (INPUT, ADD_DIGIT, SET_CARRY, FINAL_CARRY, FINAL_RESULT),
+    "-": (INPUT, APPLY_BORROW, NEED_BORROW, SUB_DIGIT, FINAL_RESULT),
+    "*": (INPUT, MUL_ROW, MUL_DIGIT, MUL_FINAL_CARRY, PARTIAL_RESULT, FINAL_RESULT),
+}
+
+
+def _build_shapes() -> Optional[Dict[str, Any]]:
+    """The shape of every line a plain digit trace can have, as lookup tables"""
+    if np is None:
+        return None
+    shapes: Dict[bytes, Tuple[int, int, bool, int]] = {}
+
+    def add(template: str, kind: int, units: bool = False, operation: int = 0) -> None:
+        parts = re.split(r"\{\d+\}", template.lstrip("\n"))
+        shape = bytes([_NUMBER_MARK]).join(part.encode("utf-8") for part in parts)
+        shapes.setdefault(shape, (kind, len(parts) - 1, units, operation))
+
+    for kinds in _OPERATION_KINDS.values():
+        for kind in kinds:
+            if kind == INPUT:
+                continue
+            if kind in POSITION_KINDS:
+                add(TEMPLATES[kind].replace("{0}", "units", 1), kind, units=True)
+                add(TEMPLATES[kind].replace("{0}", "position {0}", 1), kind)
+            else:
+                add(TEMPLATES[kind], kind)
+    for operation, symbol in enumerate(_OPERATIONS, 1):
+        add(TEMPLATES[INPUT].replace("{0}", "{0}" + symbol + "{1}"), INPUT, operation=operation)
+
+    table = np.zeros((len(shapes), _SHAPE_WIDTH), np.uint8)
+    for row, shape in enumerate(shapes):
+        table[row, :len(shape)] = np.frombuffer(shape, np.uint8)
+    mix = np.random.default_rng(0).integers(1, 2 ** 63, _SHAPE_WIDTH // 8, dtype=np.uint64) | np.uint64(1)
+    table = table.view(np.uint64)
+    keys = (table * mix).sum(axis=1)
+    order = np.argsort(keys)
+    line_masks = (np.arange(_SHAPE_WIDTH) < np.arange(_SHAPE_WIDTH + 1)[:, None]) * np.uint8(255)
+    info = list(shapes.values())
+
+    follows = np.zeros((_UNKNOWN + 1, _UNKNOWN + 1), bool)
+    for kind, nexts in _FOLLOWS.items():
+        follows[kind, list(nexts)] = True
+    operation_kinds = np.zeros((len(_OPERATIONS) + 1, _UNKNOWN + 1), bool)
+    for operation, symbol in enumerate(_OPERATIONS, 1):
+        operation_kinds[operation, list(_OPERATION_KINDS[symbol])] = True
+    return {
+        "table": table[order], "mix": mix, "keys": keys[order],
+        "line_masks": line_masks.astype(np.uint8).view(np.uint64),
+        "kind": np.array([info[i][0] for i in order], np.int64),
+        "numbers": np.array([info[i][1] for i in order], np.int64),
+        "units": np.array([info[i][2] for i in order], bool),
+        "operation": np.array([info[i][3] for i in order], np.int64),
+        "follows": follows, "operation_kinds": operation_kinds,
+        "pow10": 10 ** np.arange(_MAX_DIGITS + 1, dtype=np.int64),
+    }
+
+
+_SHAPES = _build_shapes()
+
+
+def _group_index(groups: "np.ndarray") -> "np.ndarray":
+    """0, 1, 2, ... within each run of equal values"""
+    count = len(groups)
+    starts = np.ones(count, bool)
+    starts[1:] = groups[1:] != groups[:-1]
+    return np.arange(count) - np.maximum.accumulate(np.where(starts, np.arange(count), 0))
+
+
+def _group_last(groups: "np.ndarray") -> "np.ndarray":
+    """True for the last element of each run of equal values"""
+    last = np.ones(len(groups), bool)
+    last[:-1] = groups[1:] != groups[:-1]
+    return last
+
+
+def _clean_digit_traces(texts: Sequence[str]) -> "np.ndarray":
+    """
+    For each trace text: True if it is a plain digit trace that passes every
+    check, False if it needs a closer look (a mistake, or anything unusual).
+    """
+    tables = _SHAPES
+    pow10 = tables["pow10"]
+    count = len(texts)
+    buffer = np.frombuffer("\n".join(texts).encode("utf-8"), np.uint8)
+    line_trace = np.repeat(np.arange(count), [text.count("\n") + 1 for text in texts])
+    unusual = np.zeros(count, bool)
+
+    # The numbers (runs of digits)
+    digit = (buffer - 48) < 10
+    first_digit = digit.copy()
+    first_digit[1:] &= ~digit[:-1]
+    number_start = np.flatnonzero(first_digit)
+    last_digit = digit.copy()
+    last_digit[:-1] &= ~digit[1:]
+    number_length = np.flatnonzero(last_digit) + 1 - number_start
+    values = buffer[number_start].astype(np.int64) - 48
+    reading = np.flatnonzero(number_length > 1)
+    for index in range(1, _MAX_DIGITS):  # A digit of every number long enough at a time
+        reading = reading[number_length[reading] > index]
+        if not len(reading):
+            break
+        values[reading] = values[reading] * 10 + buffer[number_start[reading] + index] - 48
+
+    # Line shapes: the bytes of each line with every number made one marker
+    marked = buffer.copy()
+    marked[number_start] = _NUMBER_MARK
+    text = marked[~digit | first_digit]
+    newlines = np.flatnonzero(text == 10)
+    line_start = np.concatenate(([0], newlines + 1))
+    line_length = np.concatenate((newlines, [len(text)])) - line_start
+    padded = np.concatenate((text, np.zeros(_SHAPE_WIDTH, np.uint8)))
+    shapes = np.lib.stride_tricks.sliding_window_view(padded, _SHAPE_WIDTH)[line_start].view(np.uint64)
+    shapes &= tables["line_masks"][np.minimum(line_length, _SHAPE_WIDTH)]
+    first_number = np.searchsorted(np.flatnonzero(text == _NUMBER_MARK), line_start)
+    long_numbers = np.flatnonzero(number_length > _MAX_DIGITS)
+    unusual[line_trace[np.searchsorted(first_number, long_numbers, "right") - 1]] = True
+
+    lines = np.flatnonzero(line_length)  # Blank lines don't count as steps
+    shapes, line_trace, first_number = shapes[lines], line_trace[lines], first_number[lines]
+    keys = (shapes * tables["mix"]).sum(axis=1)
+    slot = np.minimum(np.searchsorted(tables["keys"], keys), len(tables["keys"]) - 1)
+    known = ((tables["keys"][slot] == keys) & (line_length[lines] <= _SHAPE_WIDTH)
+             & (shapes == tables["table"][slot]).all(axis=1))
+    kind = np.where(known, tables["kind"][slot], _UNKNOWN)
+    unusual |= np.bincount(line_trace, minlength=count) == 0
+
+    # Arguments of each step, in the order the step records have them: the
+    # numbers of the line, after the position 1 of a "units" line
+    numbers = np.where(known, tables["numbers"][slot], 0)
+    units = known & tables["units"][slot]
+    index = np.arange(5) - units[:, None]
+    args = np.where(index < numbers[:, None],
+                    np.append(values, 0)[np.minimum(first_number[:, None] + index, len(values))], 0)
+    args[units, 0] = 1
+
+    # Steps must come in the order the digit engines write them in
+    first_line = np.ones(len(lines), bool)
+    first_line[1:] = line_trace[1:] != line_trace[:-1]
+    previous = np.concatenate(([_START], kind[:-1]))
+    previous[first_line] = _START
+    bad = ~tables["follows"][previous, kind]
+    bad |= _group_last(line_trace) & ~tables["follows"][kind, _END]
+
+    # The problem: the two numbers and the operation
+    inputs = np.flatnonzero(kind == INPUT)
+    operation = np.zeros(count, np.int64)
+    num1 = np.zeros(count, np.int64)
+    num2 = np.zeros(count, np.int64)
+    operation[line_trace[inputs]] = tables["operation"][slot[inputs]]
+    num1[line_trace[inputs]] = args[inputs, 0]
+    num2[line_trace[inputs]] = args[inputs, 1]
+    length1 = np.maximum(np.searchsorted(pow10, num1, "right"), 1)
+    length2 = np.maximum(np.searchsorted(pow10, num2, "right"), 1)
+    bad |= ~tables["operation_kinds"][operation[line_trace], kind]
+    unusual |= np.select([operation == 1, operation == 2, operation == 3],
+                         [np.maximum(length1, length2) >= _MAX_DIGITS, length1 > _MAX_DIGITS,
+                          length1 + length2 > _MAX_DIGITS], True)
+
+    def digit_of(number: "np.ndarray", position: "np.ndarray") -> "np.ndarray":
+        return number // pow10[np.clip(position - 1, 0, _MAX_DIGITS)] % 10 * (position <= _MAX_DIGITS + 1)
+
+    def power(exponent: "np.ndarray") -> "np.ndarray":
+        return pow10[np.clip(exponent, 0, _MAX_DIGITS)]
+
+    expected = np.zeros(count, np.int64)  # The answer the steps add up to
+    columns = np.zeros(count, np.int64)
+
+    # Addition columns
+    adds = np.flatnonzero(kind == ADD_DIGIT)
+    trace = line_trace[adds]
+    index = _group_index(trace)
+    position, digit1, digit2, carry, total = args[adds].T
+    carry_in = np.concatenate(([0], carry[:-1])) * (index > 0)
+    bad[adds] |= ~((position == index + 1) & (digit1 == digit_of(num1[trace], index + 1))
+                   & (digit2 == digit_of(num2[trace], index + 1))
+                   & (total == digit1 + digit2 + carry_in) & (carry == (total >= 10)))
+    np.add.at(expected, trace, total % 10 * power(index))
+    columns += np.bincount(trace, minlength=count)
+    last_carry = np.zeros(count, np.int64)
+    last = _group_last(trace)
+    last_carry[trace[last]] = carry[last]
+    sets = np.flatnonzero(kind == SET_CARRY)
+    bad[sets] |= ~((args[sets, 0] == 1) & (args[sets - 1, 3] == 1))
+    final_carries = np.flatnonzero(kind == FINAL_CARRY)
+    trace = line_trace[final_carries]
+    bad[final_carries] |= args[final_carries, 0] != last_carry[trace]
+    np.add.at(expected, trace, args[final_carries, 0] * power(columns[trace]))
+
+    # Subtraction columns, with the borrows written down before them
+    subs = np.flatnonzero(kind == SUB_DIGIT)
+    trace = line_trace[subs]
+    index = _group_index(trace)
+    position, digit1, digit2, difference = args[subs, :4].T
+    needed = kind[subs - 1] == NEED_BORROW
+    applied_line = np.where(needed, subs - 2, subs - 1)
+    applied = kind[applied_line] == APPLY_BORROW
+    owed = np.concatenate(([False], needed[:-1])) & (index > 0)
+    top = digit_of(num1[trace], index + 1)
+    bottom = digit_of(num2[trace], index + 1)
+    current = top - owed
+    bad[subs] |= ~((position == index + 1) & (applied == owed)
+                   & (~applied | ((args[applied_line, 0] == top) & (args[applied_line, 1] == top - 1)))
+                   & np.where(needed, (args[subs - 1, 0] == current) & (current < bottom)
+                              & (args[subs - 1, 1] == current + 10), current >= bottom)
+                   & (digit1 == current + 10 * needed) & (digit2 == bottom)
+                   & (difference == digit1 - digit2))
+    np.add.at(expected, trace, difference * power(index))
+    columns += np.bincount(trace, minlength=count)
+    last = _group_last(trace)
+    unusual[trace[last & needed]] = True  # A borrow still owed at the end
+
+    # Multiplication rows
+    rows = np.flatnonzero(kind == MUL_ROW)
+    row_trace = line_trace[rows]
+    row_index = _group_index(row_trace)
+    bad[rows] |= ~((args[rows, 1] == row_index)
+                   & (args[rows, 0] == digit_of(num2[row_trace], row_index + 1)))
+    if len(rows):
+        row_of_line = np.maximum(np.cumsum(kind == MUL_ROW) - 1, 0)
+        products = np.flatnonzero(kind == MUL_DIGIT)
+        row = row_of_line[products]
+        index = _group_index(row)
+        digit1, digit2, carry, product = args[products, :4].T
+        trace = line_trace[products]
+        carry_in = np.concatenate(([0], carry[:-1])) * (index > 0)
+        bad[products] |= ~((digit1 == digit_of(num1[trace], index + 1)) & (digit2 == args[rows[row], 0])
+                           & (product == digit1 * digit2 + carry_in) & (carry == product // 10))
+        row_value = np.zeros(len(rows), np.int64)
+        np.add.at(row_value, row, product % 10 * power(index))
+        row_digits = np.bincount(row, minlength=len(rows))
+        final_carries = np.flatnonzero(kind == MUL_FINAL_CARRY)
+        row = row_of_line[final_carries]
+        bad[final_carries] |= ~((args[final_carries, 0] == args[final_carries - 1, 2]) & (args[final_carries, 0] != 0))
+        np.add.at(row_value, row, args[final_carries, 0] * power(row_digits[row]))
+        partials = np.flatnonzero(kind == PARTIAL_RESULT)
+        row = row_of_line[partials]
+        trace = line_trace[partials]
+        bad[partials] |= ~((row_digits[row] == length1[trace])
+                           & (args[partials, 0] == row_value[row] * power(row_index[row])))
+        np.add.at(expected, trace, args[partials, 0])
+    else:  # Row steps without any row to be in
+        bad |= np.isin(kind, (MUL_DIGIT, MUL_FINAL_CARRY, PARTIAL_RESULT))
+    rows_done = np.bincount(row_trace, minlength=count)
+
+    # Every column (or row) worked out, and the answer they add up to
+    unusual |= np.select([operation == 1, operation == 2, operation == 3],
+                         [columns != np.maximum(length1, length2), columns != length1, rows_done != length2],
+                         True)
+    finals = np.flatnonzero(kind == FINAL_RESULT)
+    bad[finals] |= args[finals, 0] != expected[line_trace[finals]]
+    unusual[line_trace[bad]] = True
+    return ~unusual
+
+
+def _verify_chunk(traces: Sequence[Any]) -> List[Optional[Issue]]:
+    """verify_trace for a list of traces, the plain digit ones checked together"""
+    texts = {}
+    if _SHAPES is not None:
+        for i, trace in enumerate(traces):
+            if isinstance(trace, str):
+                texts[i] = trace
+            elif isinstance(trace, list) and trace and isinstance(trace[0], str):
+                texts[i] = "\n".join(trace)
+    clean = set()
+    if texts:
+        passed = _clean_digit_traces(list(texts.values()))
+        clean = {i for i, ok in zip(texts, passed) if ok}
+    return [None if i in clean else verify_trace(trace) for i, trace in enumerate(traces)]
+
+
+# MathProblemSolver steps: "description: work => result"
+_FLOAT = r"(-?(?:\d+\.?\d*(?:e[-+]?\d+)?|inf|nan))"
+_COEFFICIENTS = re.compile(rf"a={_FLOAT}, b={_FLOAT}, c={_FLOAT}")
+_DISCRIMINANT = re.compile(rf"b² - 4ac = \({_FLOAT}\)² - 4\({_FLOAT}\)\({_FLOAT}\)")
+_FORMULA = re.compile(rf"x = \(-\({_FLOAT}\) ± √{_FLOAT}\) / \(2\*{_FLOAT}\)")
+_ROOTS = re.compile(rf"x₁ = {_FLOAT}, x₂ = {_FLOAT}")
+_LIKE_TERMS = re.compile(r"x terms: (\[.*\]), numbers: (\[.*\])")
+_LINEAR = re.compile(rf"{_FLOAT}x = {_FLOAT}")
+_GEOMETRY = re.compile(r"Type: (\w+), Values: (\{.*\})")
+# The terms of an equation, read the way math_solver reads them
+_LINEAR_TERM = re.compile(r"=|(?P<sign>[+-]?)(?P<digits>\d*)(?P<x>x?)")
+_QUADRATIC_TERM = re.compile(r"(?P<sign>[+-]?)(?:(?P<digits>\d*)(?P<power>x\^2|x)|(?P<number>\d+))")
+
+_SHAPE_STEPS = {shape.description: shape for shape in SHAPES.values()}
+# Steps of a linear equation that read one term each, and whether they are x terms
+_TERM_STEPS = {"Found an x term": True, "Moving x term to left side": True,
+               "Moving number to right side": False, "Found a number on right side": False}
+# The step each step has to follow (shape steps follow their [START])
+_AFTER = {
+    "Making equation easier to read": ("[START] Solving equation", "[START] Solving quadratic equation"),
+    "Breaking equation into two parts": ("Making equation easier to read",),
+    **{step: ("Breaking equation into two parts", *_TERM_STEPS) for step in _TERM_STEPS},
+    "Adding like terms": ("Breaking equation into two parts", *_TERM_STEPS),
+    "Solving for x": ("Adding like terms",),
+    "Found the important numbers": ("Making equation easier to read",),
+    "Calculating discriminant": ("Found the important numbers",),
+    "Using the quadratic formula": ("Calculating discriminant",),
+    **{shape.description: ("[START] Solving geometry problem",) for shape in SHAPES.values()},
+}
+
+
+def _close(a: float, b: float) -> bool:
+    return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+
+
+def _split_note(note: str) -> Tuple[str, str, str]:
+    description, _, rest = note.partition(": ")
+    if rest.endswith(" =>"):  # A step with no result, its trailing space trimmed
+        rest += " "
+    work, _, result = rest.rpartition(" => ")
+    return description, work, result
+
+
+def _coefficient(sign: str, digits: str) -> float:
+    return float(("-" if sign == "-" else "") + (digits or "1"))
+
+
+class _MathChecker:
+    """
+    Follows a MathProblemSolver trace. Every problem starts with a [START]
+    step, and the steps after it are checked against what that problem
+    says: the terms, coefficients and values each step works on must come
+    from the equation (or shape values), and every sum, discriminant,
+    root and formula must add up.
+    """
+
+    def __init__(self):
+        self.kind: Optional[str] = None  # "equation", "quadratic" or "geometry"
+        self.equation = ""
+        self.terms: List[Tuple[bool, bool, str, float]] = []  # Linear terms still to come: (x, on right, term, value)
+        self.x_terms: List[float] = []
+        self.numbers: List[float] = []
+        self.linear: Optional[Tuple[float, float]] = None
+        self.coefficients: Optional[Tuple[float, float, float]] = None
+        self.discriminant: Optional[float] = None
+        self.shape: Optional[Shape] = None
+        self.values: Optional[Dict[str, Any]] = None
+        self.last = ""  # The step before this one
+
+    def check(self, description: str, work: str, result: str) -> None:
+        if description.startswith("[START] "):
+            self.start(description, work)
+            self.last = description
+            return
+        _expect(self.kind is not None, "no [START] step before it")
+        after = _AFTER.get(description)
+        _expect(after is None or self.last in after, f"should come after: {' or '.join(after or ())}")
+        self.last = description
+        if description in _TERM_STEPS:
+            self.term(description, work, result)
+        elif description in _MATH_CHECKS:
+            _MATH_CHECKS[description](self, work, result)
+        elif description in _SHAPE_STEPS:
+            self.geometry(description, work, result)
+
+    def start(self, description: str, work: str) -> None:
+        self.__init__()
+        if description == "[START] Solving equation":
+            self.kind, self.equation = "equation", work.replace(" ", "")
+            self._read_linear_terms()
+        elif description == "[START] Solving quadratic equation":
+            self.kind, self.equation = "quadratic", work.replace(" ", "").replace("²", "^2")
+            self._read_quadratic_terms()
+        elif description == "[START] Solving geometry problem":
+            match = _GEOMETRY.fullmatch(work)
+            _expect(match is not None, "problem can't be read")
+            self.kind, self.shape = "geometry", SHAPES.get(match.group(1))
+            self.values = ast.literal_eval(match.group(2))
+        else:
+            raise _Bad("unknown kind of problem")
+
+    def _read_linear_terms(self) -> None:
+        on_right = False
+        for match in _LINEAR_TERM.finditer(self.equation):
+            term = match.group()
+            if term == "=":
+                on_right = True
+            elif term and (match.group("digits") or match.group("x")):
+                sign, digits, x = match.group("sign", "digits", "x")
+                self.terms.append((bool(x), on_right, term, _coefficient(sign, digits)))
+        self.terms.reverse()  # Popped from the end, in order
+
+    def _read_quadratic_terms(self) -> None:
+        if not self.equation.endswith("=0"):
+            return
+        a = b = c = 0.0
+        for match in _QUADRATIC_TERM.finditer(self.equation[:-2]):
+            sign, digits, power, number = match.group("sign", "digits", "power", "number")
+            if power == "x^2":
+                a += _coefficient(sign, digits)
+            elif power == "x":
+                b += _coefficient(sign, digits)
+            else:
+                c += float(sign + number)
+        self.coefficients = (a, b, c)
+
+    def easier_to_read(self, work: str, result: str) -> None:
+        expected = f"Original: {self.equation}" if self.kind == "equation" else self.equation
+        _expect(work == expected, f"equation should read {self.equation}")
+
+    def two_parts(self, work: str, result: str) -> None:
+        left, _, right = self.equation.partition("=")
+        _expect(work == f"Left: {left}, Right: {right}", f"sides are {left} and {right}")
+
+    def term(self, description: str, work: str, result: str) -> None:
+        _expect(self.kind == "equation" and self.terms, "no term left to read")
+        x, on_right, term, value = self.terms.pop()
+        if not x:
+            kind = "Found a number on right side" if on_right else "Moving number to right side"
+        else:
+            kind = "Moving x term to left side" if on_right else "Found an x term"
+        _expect(description == kind, f"{term} should be: {kind}")
+        if description == "Found an x term":
+            _expect(work == f"Term: {term}", f"next term is {term}")
+            _expect(result.startswith("Coefficient: ") and float(result[13:]) == value,
+                    f"coefficient of {term} is {value:g}")
+            self.x_terms.append(value)
+        elif description == "Found a number on right side":
+            _expect(work == term, f"next term is {term}")
+            self.numbers.append(value)
+        else:
+            unit = "x" if x else ""
+            side = "left" if x else "right"
+            _expect(work == term, f"next term is {term}")
+            _expect(result == f"Added {-value}{unit} to {side} side", f"moving {term} adds {-value}{unit}")
+            (self.x_terms if x else self.numbers).append(-value)
+
+    def like_terms(self, work: str, result: str) -> None:
+        match = _LIKE_TERMS.fullmatch(work)
+        total = _LINEAR.fullmatch(result)
+        _expect(match is not None and total is not None, "terms can't be read")
+        _expect(not self.terms, f"term {self.terms[-1][2] if self.terms else ''} was never read")
+        x_terms, numbers = (ast.literal_eval(group) for group in match.groups())
+        _expect(x_terms == self.x_terms, f"x terms are {self.x_terms}")
+        _expect(numbers == self.numbers, f"numbers are {self.numbers}")
+        self.linear = (float(total.group(1)), float(total.group(2)))
+        _expect(_close(sum(x_terms), self.linear[0]), f"x terms add up to {sum(x_terms)}")
+        _expect(_close(sum(numbers), self.linear[1]), f"numbers add up to {sum(numbers)}")
+
+    def solve_for_x(self, work: str, result: str) -> None:
+        match = _LINEAR.fullmatch(work)
+        _expect(match is not None and result.startswith("x = "), "solution can't be read")
+        coef, const = map(float, match.groups())
+        _expect(self.linear == (coef, const), "doesn't match the added terms")
+        _expect(_close(coef * float(result[4:]), const), f"x should be {const / coef}")
+
+    def important_numbers(self, work: str, result: str) -> None:
+        match = _COEFFICIENTS.fullmatch(result)
+        _expect(match is not None, "coefficients can't be read")
+        _expect(work == f"From: {self.equation[:-2]}", f"should be from {self.equation[:-2]}")
+        a, b, c = self.coefficients or (None, None, None)
+        _expect(tuple(map(float, match.groups())) == self.coefficients, f"a={a}, b={b}, c={c} in the equation")
+
+    def discriminant_step(self, work: str, result: str) -> None:
+        match = _DISCRIMINANT.fullmatch(work)
+        _expect(match is not None, "discriminant can't be read")
+        b, a, c = map(float, match.groups())
+        _expect((a, b, c) == self.coefficients, "coefficients don't match the ones found")
+        self.discriminant = float(result)
+        _expect(_close(self.discriminant, b ** 2 - 4 * a * c), f"b² - 4ac is {b ** 2 - 4 * a * c}")
+
+    def quadratic_formula(self, work: str, result: str) -> None:
+        formula = _FORMULA.fullmatch(work)
+        roots = _ROOTS.fullmatch(result)
+        _expect(formula is not None and roots is not None, "roots can't be read")
+        _expect(self.coefficients is not None and self.discriminant is not None, "roots can't be checked")
+        b, discriminant, a = map(float, formula.groups())
+        _expect((a, b) == self.coefficients[:2], "coefficients don't match the ones found")
+        _expect(discriminant == self.discriminant, "discriminant doesn't match the one worked out")
+        root = math.sqrt(discriminant)
+        for found, expected, name in zip(map(float, roots.groups()), ((-b + root) / (2 * a), (-b - root) / (2 * a)),
+                                         ("x₁", "x₂")):
+            _expect(_close(found, expected), f"{name} is {expected}")
+
+    def geometry(self, description: str, work: str, result: str) -> None:
+        shape = _SHAPE_STEPS[description]
+        name = shape.rule.split(" = ")[0].lower()
+        _expect(self.kind == "geometry" and shape is self.shape, "not the shape of the problem")
+        _expect(shape.check(self.values) is None, "values can't be used")
+        _expect(work == shape.show(self.values), f"should be {shape.show(self.values)}")
+        expected = shape.formula(*(self.values[param] for param in shape.params))
+        _expect(_close(float(result), expected), f"{name} is {expected}")
+
+
+_MATH_CHECKS = {
+    "Making equation easier to read": _MathChecker.easier_to_read,
+    "Breaking equation into two parts": _MathChecker.two_parts,
+    "Adding like terms": _MathChecker.like_terms,
+    "Solving for x": _MathChecker.solve_for_x,
+    "Found the important numbers": _MathChecker.important_numbers,
+    "Calculating discriminant": _MathChecker.discriminant_step,
+    "Using the quadratic formula": _MathChecker.quadratic_formula,
+}
+
+
+def verify_math_trace(trace: Any) -> Optional[Issue]:
+    """
+    Check a MathProblemSolver trace: its steps (dictionaries), its
+    scratchpad lines, or one text. Returns the first bad step, or None.
+    """
+    if isinstance(trace, str):
+        trace = _lines(trace)
+    checker = _MathChecker()
+    for number, step in enumerate(trace):
+        if isinstance(step, dict):
+            description, work, result = step["description"], step["work"], step["result"]
+            text = f"{description}: {work} => {result}"
+        else:
+            text = step
+            description, work, result = _split_note(step)
+        try:
+            checker.check(description, work, result)
+        except _Bad as bad:
+            return Issue(number, text, str(bad))
+        except (ValueError, SyntaxError) as e:
+            return Issue(number, text, f"step can't be read ({e})")
+    return None
+
+
+def _is_math_trace(trace: Any) -> bool:
+    if isinstance(trace, Trace):
+        return False
+    if isinstance(trace, str):
+        return " => " in trace.split("\n", 1)[0]
+    first = next(iter(trace), None) if hasattr(trace, "__len__") else None  # Lists, StepLog
+    return isinstance(first, dict) or (isinstance(first, str) and " => " in first)
+
+
+def verify_trace(trace: Any) -> Optional[Issue]:
+    """Check any trace (AIAgent or MathProblemSolver); returns the first bad step, or None"""
+    if _is_math_trace(trace):
+        return verify_math_trace(trace)
+    return verify_agent_trace(trace)
+
+
+def verify_batch(traces: Iterable[Any], workers: int = 1, chunk_size: int = BATCH_SIZE) -> List[Optional[Issue]]:
+    """Check many traces, optionally on several processes; one result per trace, in order"""
+    traces = [list(t.steps()) if isinstance(t, Trace) and workers > 1 else t for t in traces]
+    chunks = [traces[i:i + chunk_size] for i in range(0, len(traces), chunk_size)]
+    if workers <= 1 or len(chunks) <= 1:
+        return [issue for chunk in chunks for issue in _verify_chunk(chunk)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [issue for issues in pool.map(_verify_chunk, chunks) for issue in issues]
+
+
+def _open(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def verify_file(path: str, max_issues: int = 100) -> Dict[str, Any]:
+    """
+    Check every trace in a JSONL file: dataset shards ("scratchpad" text)
+    or pipeline output ("trace" lines). Reports counts and the first issues.
+    """
+    start = time.perf_counter()
+    traces = bad = 0
+    issues = []
+    chunk = []
+
+    def check(chunk):
+        nonlocal bad
+        for (line_number, record, _), issue in zip(chunk, _verify_chunk([trace for _, _, trace in chunk])):
+            if issue is not None:
+                bad += 1
+                if len(issues) < max_issues:
+                    issues.append({"line": line_number, "problem": record.get("problem"), **issue._asdict()})
+
+    with _open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            trace = record.get("trace", record.get("scratchpad"))
+            if trace is None:
+                continue
+            traces += 1
+            chunk.append((line_number, record, trace))
+            if len(chunk) == BATCH_SIZE:
+                check(chunk)
+                chunk = []
+    check(chunk)
+    return {"path": path, "traces": traces, "bad": bad, "issues": issues,
+            "seconds": time.perf_counter() - start}
+
+
+def verify_files(paths: Sequence[str], workers: int = 1, max_issues: int = 100) -> List[Dict[str, Any]]:
+    """verify_file for many files, one process per file at a time"""
+    if workers <= 1:
+        return [verify_file(path, max_issues) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(verify_file, paths, [max_issues] * len(paths)))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Check scratchpads for arithmetic mistakes")
+    parser.add_argument("paths", nargs="+", help="JSONL files (.gz too) with scratchpad or trace fields")
+    parser.add_argument("--workers", type=int, default=1, help="Files checked at once")
+    parser.add_argument("--max-issues", type=int, default=100, help="Issues listed per file")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    reports = verify_files(args.paths, args.workers, args.max_issues)
+    seconds = time.perf_counter() - start
+    for report in reports:
+        for issue in report["issues"]:
+            print(json.dumps({"path": report["path"], **issue}, ensure_ascii=False))
+    traces = sum(r["traces"] for r in reports)
+    bad = sum(r["bad"] for r in reports)
+    print(f"Checked {traces} traces in {seconds:.2f}s ({traces / seconds if seconds else 0:.0f} traces/s), "
+          f"{bad} with mistakes", file=sys.stderr)
+    return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
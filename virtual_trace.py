@@ -0,0 +1,314 @@
+"""
+Virtual Traces
+Scratchpads that are never written down. Every step of a digit addition
+is fixed by the two digits of its column and the carry coming in, so
+instead of keeping millions of steps a VirtualTrace keeps the operands and
+a sparse index of checkpoints, and works out any step when it is read:
+- addition and subtraction: the carry (borrow) into every group of
+  CHECKPOINT columns, and the step that group starts at
+- multiplication (digit or limb schoolbook): the step every partial
+  product starts at; the carry into any digit of a row follows from the
+  first number's lower digits, so a row can be entered anywhere
+
+Reading step i costs a binary search over the checkpoints and at most one
+group of columns, whatever the size of the trace, so a UI can page
+through a million-step scratchpad without ever holding it. The steps are
+exactly the ones AIAgent writes for the same problem.
+"""
+
+from array import array
+from bisect import bisect_right
+from typing import Iterator, List, Optional, Tuple
+
+from digit_engine import from_digits
+from multiplication import LIMB_DIGITS, choose_strategy
+from scratchpad import (
+    ADD_DIGIT, SET_CARRY, FINAL_CARRY, APPLY_BORROW, NEED_BORROW, SUB_DIGIT, MUL_ROW, LIMB_ROW,
+    MUL_DIGIT, MUL_FINAL_CARRY, PARTIAL_RESULT, MUL_STRATEGY, INPUT, FINAL_RESULT, MUL_FINAL_RESULT,
+    CHECKPOINT, LEVELS, TraceReader, Verbosity,
+)
+
+# Translation tables between ASCII digits and digit values (0-9)
+_TO_VALUES = bytes.maketrans(b"0123456789", bytes(range(10)))
+_TO_ASCII = bytes.maketrans(bytes(range(10)), b"0123456789")
+
+
+def _digit_values(digits: str, width: int) -> bytes:
+    """Right-aligned, zero-padded digit values"""
+    return digits.rjust(width, "0").encode("ascii").translate(_TO_VALUES)
+
+
+class VirtualTrace(TraceReader):
+    """
+    A read-only scratchpad that works its steps out when they are read.
+    The steps come in blocks (the input, groups of columns or rows, the
+    final steps); _starts has the first step of every block, and
+    subclasses yield a block's records with _block(number, offset).
+    """
+
+    def __init__(self, problem: str, verbosity: int = Verbosity.DIGITS):
+        self.problem = problem
+        self.verbosity = Verbosity(verbosity)
+        self._starts = array("q")  # First step of every block
+        self._length = 0
+
+    def _add_block(self, size: int) -> None:
+        if size:
+            self._starts.append(self._length)
+            self._length += size
+
+    def _shown(self, kind: int) -> bool:
+        return LEVELS[kind] <= self.verbosity
+
+    def _block(self, number: int, offset: int) -> Iterator[Tuple[int, tuple]]:
+        """The records of block `number`, from its step `offset` on"""
+        raise NotImplementedError
+
+    def _records(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Tuple[int, tuple]]:
+        stop = len(self) if stop is None else min(stop, len(self))
+        left = stop - start
+        if left <= 0:
+            return
+        number = bisect_right(self._starts, start) - 1
+        offset = start - self._starts[number]
+        while True:
+            for record in self._block(number, offset):
+                yield record
+                left -= 1
+                if not left:
+                    return
+            number += 1
+            offset = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({len(self)} steps, verbosity={self.verbosity.name})"
+
+    @property
+    def nbytes(self) -> int:
+        """Memory taken by the checkpoints (the operands not counted)"""
+        return len(self._starts) * self._starts.itemsize
+
+
+class _VirtualColumns(VirtualTrace):
+    """
+    Addition or subtraction: block 0 is the input, then a block per group
+    of CHECKPOINT columns (right to left), then the final steps. The digits
+    of the answer are worked out once, while the checkpoints are made.
+    """
+
+    def __init__(self, problem: str, num1: str, num2: str, width: int, verbosity: int):
+        super().__init__(problem, verbosity)
+        self.width = width
+        self._digits1 = _digit_values(num1, width)
+        self._digits2 = _digit_values(num2, width)
+        self._carries = bytearray()  # Carry (borrow) into every group of columns
+        self._answer = bytearray(width + 1)
+        self._tail: List[int] = []  # Kinds of the final steps
+        self._result: Optional[int] = None
+        self._add_block(self._shown(INPUT))
+
+    def _input(self, offset: int) -> Iterator[Tuple[int, tuple]]:
+        if offset == 0:
+            yield INPUT, (self.problem,)
+
+    def _block(self, number: int, offset: int) -> Iterator[Tuple[int, tuple]]:
+        if number == 0 and self._shown(INPUT):
+            return self._input(offset)
+        group = number - self._shown(INPUT)
+        if group == len(self._carries):
+            return self._final(offset)
+        return self._skip(self._columns(group), offset)
+
+    @staticmethod
+    def _skip(records: Iterator[Tuple[int, tuple]], offset: int) -> Iterator[Tuple[int, tuple]]:
+        for _ in range(offset):
+            next(records)
+        return records
+
+    def _final(self, offset: int) -> Iterator[Tuple[int, tuple]]:
+        for kind in self._tail[offset:]:
+            yield kind, ((self.result,) if kind == FINAL_RESULT else (1,))
+
+    @property
+    def result(self) -> int:
+        """The answer (made into an int the first time it is asked for)"""
+        if self._result is None:
+            self._result = from_digits(self._answer.translate(_TO_ASCII).decode("ascii").lstrip("0") or "0")
+        return self._result
+
+    @property
+    def nbytes(self) -> int:
+        return super().nbytes + len(self._carries)
+
+
+class VirtualAddition(_VirtualColumns):
+    """The scratchpad of num1 + num2 (digit strings), the steps of iter_add_digits"""
+
+    def __init__(self, problem: str, num1: str, num2: str, verbosity: int = Verbosity.DIGITS):
+        super().__init__(problem, num1, num2, max(len(num1), len(num2)), verbosity)
+        digits1, digits2, answer, width = self._digits1, self._digits2, self._answer, self.width
+        carry = 0
+        for group_end in range(width, 0, -CHECKPOINT):
+            self._carries.append(carry)
+            carries = 0
+            for i in range(group_end - 1, max(group_end - CHECKPOINT, 0) - 1, -1):
+                current_sum = digits1[i] + digits2[i] + carry
+                carry = 1 if current_sum >= 10 else 0
+                answer[i + 1] = current_sum - 10 * carry
+                carries += carry
+            if self.verbosity >= Verbosity.DIGITS:
+                self._add_block(group_end - max(group_end - CHECKPOINT, 0) + carries)
+        answer[0] = carry
+        if carry and self.verbosity >= Verbosity.DIGITS:
+            self._tail.append(FINAL_CARRY)
+        if self._shown(FINAL_RESULT):
+            self._tail.append(FINAL_RESULT)
+        self._add_block(len(self._tail))
+        if self.verbosity < Verbosity.DIGITS:
+            del self._carries[:]  # No digit blocks: the final steps come right after the input
+
+    def _columns(self, group: int) -> Iterator[Tuple[int, tuple]]:
+        digits1, digits2, width = self._digits1, self._digits2, self.width
+        carry = self._carries[group]
+        group_end = width - group * CHECKPOINT
+        for i in range(group_end - 1, max(group_end - CHECKPOINT, 0) - 1, -1):
+            digit1 = digits1[i]
+            digit2 = digits2[i]
+            current_sum = digit1 + digit2 + carry
+            carry = 1 if current_sum >= 10 else 0
+            yield ADD_DIGIT, (width - i, digit1, digit2, carry, current_sum)
+            if carry:
+                yield SET_CARRY, (carry,)
+
+
+class VirtualSubtraction(_VirtualColumns):
+    """The scratchpad of num1 - num2 (digit strings, num1 not smaller), the steps of iter_subtract_digits"""
+
+    def __init__(self, problem: str, num1: str, num2: str, verbosity: int = Verbosity.DIGITS):
+        if len(num2) > len(num1) or (len(num2) == len(num1) and num2 > num1):
+            raise ValueError("First number must be greater than or equal to second number")
+        super().__init__(problem, num1, num2, len(num1), verbosity)
+        digits1, digits2, answer, width = self._digits1, self._digits2, self._answer, self.width
+        borrow = 0
+        for group_end in range(width, 0, -CHECKPOINT):
+            self._carries.append(borrow)
+            steps = 0
+            for i in range(group_end - 1, max(group_end - CHECKPOINT, 0) - 1, -1):
+                current_diff = digits1[i] - digits2[i] - borrow
+                steps += borrow  # Applying the borrow that came in
+                borrow = 1 if current_diff < 0 else 0
+                answer[i + 1] = current_diff + 10 * borrow
+                steps += 1 + borrow  # Needing a borrow, and the difference
+            if self.verbosity >= Verbosity.DIGITS:
+                self._add_block(steps)
+        if self._shown(FINAL_RESULT):
+            self._tail.append(FINAL_RESULT)
+        self._add_block(len(self._tail))
+        if self.verbosity < Verbosity.DIGITS:
+            del self._carries[:]
+
+    def _columns(self, group: int) -> Iterator[Tuple[int, tuple]]:
+        digits1, digits2, width = self._digits1, self._digits2, self.width
+        borrow = self._carries[group]
+        group_end = width - group * CHECKPOINT
+        for i in range(group_end - 1, max(group_end - CHECKPOINT, 0) - 1, -1):
+            digit1 = digits1[i]
+            digit2 = digits2[i]
+            if borrow:
+                digit1 -= 1
+                yield APPLY_BORROW, (digit1 + 1, digit1)
+            if digit1 < digit2:
+                digit1 += 10
+                borrow = 1
+                yield NEED_BORROW, (digit1 - 10, digit1)
+            else:
+                borrow = 0
+            yield SUB_DIGIT, (width - i, digit1, digit2, digit1 - digit2)
+
+
+class VirtualMultiplication(VirtualTrace):
+    """
+    The scratchpad of num1 × num2 (digit strings) with the schoolbook
+    "digits" or "limbs" strategy ("auto" picks one as multiply does), a
+    block per partial product. Within a row, the carry into limb j is
+    (the first number's lower j limbs × this limb) // base^j, so any step
+    is reached without the ones before it.
+    """
+
+    def __init__(self, problem: str, num1: str, num2: str, strategy: str = "auto",
+                 verbosity: int = Verbosity.DIGITS):
+        super().__init__(problem, verbosity)
+        if strategy == "auto":
+            strategy = choose_strategy(len(num1), len(num2))
+        if strategy not in ("digits", "limbs"):
+            raise ValueError(f"Multiplication strategy '{strategy}' has no virtual trace")
+        self.strategy = strategy
+        self.limb_digits = 1 if strategy == "digits" else LIMB_DIGITS
+        self.base = 10 ** self.limb_digits
+        self._lengths = (len(num1), len(num2))
+        self._num1, self._num2 = from_digits(num1), from_digits(num2)
+        self._limbs1 = self._to_limbs(self._num1)
+        self._limbs2 = self._to_limbs(self._num2)
+
+        self._head = [kind for kind in (INPUT, MUL_STRATEGY) if self._shown(kind)]
+        if strategy == "digits" and MUL_STRATEGY in self._head:
+            self._head.remove(MUL_STRATEGY)
+        self._add_block(len(self._head))
+        self._rows = 0
+        if self.verbosity >= Verbosity.DIGITS:
+            top = self.base ** len(self._limbs1)
+            for limb2 in self._limbs2:
+                # The row's head, a step per limb, its final carry and its partial product
+                self._add_block(len(self._limbs1) + 2 + (self._num1 * limb2 >= top))
+            self._rows = len(self._limbs2)
+        self._add_block(self._shown(MUL_FINAL_RESULT))
+
+    def _to_limbs(self, number: int) -> List[int]:
+        """Limbs, least significant first (at least one)"""
+        limbs = []
+        while True:
+            number, limb = divmod(number, self.base)
+            limbs.append(limb)
+            if not number:
+                return limbs
+
+    @property
+    def result(self) -> int:
+        return self._num1 * self._num2
+
+    def _block(self, number: int, offset: int) -> Iterator[Tuple[int, tuple]]:
+        if number == 0 and self._head:
+            return self._header(offset)
+        row = number - bool(self._head)
+        if row == self._rows:
+            return iter([(MUL_FINAL_RESULT, (self.result,))])
+        return self._row(row, offset)
+
+    def _header(self, offset: int) -> Iterator[Tuple[int, tuple]]:
+        for kind in self._head[offset:]:
+            if kind == INPUT:
+                yield INPUT, (self.problem,)
+            else:
+                yield MUL_STRATEGY, (*self._lengths, self.strategy)
+
+    def _row(self, row: int, offset: int) -> Iterator[Tuple[int, tuple]]:
+        limbs1, base = self._limbs1, self.base
+        limb2 = self._limbs2[row]
+        if offset == 0:
+            if self.strategy == "digits":
+                yield MUL_ROW, (limb2, row)
+            else:
+                yield LIMB_ROW, (limb2, row, self.limb_digits)
+            offset = 1
+        first = min(offset - 1, len(limbs1))  # The first limb of num1 to show
+        carry = (self._num1 % base ** first) * limb2 // base ** first if first else 0
+        for limb1 in limbs1[first:]:
+            product = limb1 * limb2 + carry
+            carry = product // base
+            yield MUL_DIGIT, (limb1, limb2, carry, product)
+        if carry and offset <= len(limbs1) + 1:
+            yield MUL_FINAL_CARRY, (carry,)
+        yield PARTIAL_RESULT, (self._num1 * limb2 * base ** row,)